@@ -0,0 +1,39 @@
+"""add username trigram index
+
+Revision ID: 110cfe1acf96
+Revises: 9150a3ec7c98
+Create Date: 2026-10-17 23:12:40.518207
+
+Needs the pg_trgm extension, which ships with the standard Postgres packages
+(contrib) and the official Docker image.
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "110cfe1acf96"
+down_revision: Union[str, Sequence[str], None] = "9150a3ec7c98"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_users_username_trgm",
+        "users",
+        ["username"],
+        postgresql_using="gin",
+        postgresql_ops={"username": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The extension is left in place — other objects may depend on it
+    op.drop_index("ix_users_username_trgm", table_name="users")
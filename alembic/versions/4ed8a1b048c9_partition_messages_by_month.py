@@ -0,0 +1,131 @@
+"""partition messages by month
+
+Revision ID: 4ed8a1b048c9
+Revises: 6d9a65f0386d
+Create Date: 2026-10-17 21:05:12.418306
+
+Rebuilds messages as a table partitioned by RANGE (created_at), one partition
+per month from the oldest message up to three months ahead; later months are
+created by app/tasks/partitions.py. Rows are copied, so this takes a while and
+holds messages locked on a large table — run it in a maintenance window.
+
+The primary key becomes (id, created_at): a unique constraint on a partitioned
+table must include the partition key. Ids still come from messages_id_seq.
+
+"""
+
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4ed8a1b048c9"
+down_revision: Union[str, Sequence[str], None] = "6d9a65f0386d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+COLUMNS = "id, text, sender_id, receiver_id, is_read, created_at, updated_at"
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_messages_table(name: str, partitioned: bool) -> None:
+    op.execute(
+        f"""
+        CREATE TABLE {name} (
+            id integer NOT NULL DEFAULT nextval('messages_id_seq'),
+            text text NOT NULL,
+            sender_id uuid NOT NULL,
+            receiver_id uuid NOT NULL,
+            is_read boolean NOT NULL,
+            created_at timestamp with time zone NOT NULL DEFAULT now(),
+            updated_at timestamp with time zone NOT NULL DEFAULT now()
+        ) {"PARTITION BY RANGE (created_at)" if partitioned else ""}
+        """
+    )
+
+
+def _swap_in(name: str, primary_key: list[str]) -> None:
+    # The old table owns the sequence — release it so DROP TABLE keeps it
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY NONE")
+    op.drop_table("messages")
+    op.rename_table(name, "messages")
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages.id")
+
+    # Constraints and indexes are built once, after the copy
+    op.create_primary_key("messages_pkey", "messages", primary_key)
+    op.create_foreign_key(
+        "messages_sender_id_fkey", "messages", "users", ["sender_id"], ["id"]
+    )
+    op.create_foreign_key(
+        "messages_receiver_id_fkey", "messages", "users", ["receiver_id"], ["id"]
+    )
+    op.create_index(
+        "ix_messages_receiver_id_is_read_id",
+        "messages",
+        ["receiver_id", "is_read", "id"],
+    )
+    op.create_index("ix_messages_receiver_id_id", "messages", ["receiver_id", "id"])
+    op.create_index("ix_messages_sender_id_id", "messages", ["sender_id", "id"])
+    op.create_index(
+        "ix_messages_pair_id",
+        "messages",
+        [
+            sa.text("least(sender_id, receiver_id)"),
+            sa.text("greatest(sender_id, receiver_id)"),
+            "id",
+        ],
+    )
+    op.execute("ANALYZE messages")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("LOCK TABLE messages IN EXCLUSIVE MODE")
+    _create_messages_table("messages_partitioned", partitioned=True)
+
+    bounds = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT date_trunc('month', coalesce(min(created_at), now())"
+                " AT TIME ZONE 'UTC')::date, (now() AT TIME ZONE 'UTC')::date "
+                "FROM messages"
+            )
+        )
+        .one()
+    )
+    month = bounds[0]
+    last = _add_months(bounds[1].replace(day=1), MONTHS_AHEAD)
+    while month <= last:
+        op.execute(
+            f"CREATE TABLE messages_p{month:%Y_%m} "
+            "PARTITION OF messages_partitioned "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') "
+            f"TO ('{_add_months(month, 1):%Y-%m-%d} 00:00:00+00')"
+        )
+        month = _add_months(month, 1)
+
+    op.execute(
+        f"INSERT INTO messages_partitioned ({COLUMNS}) SELECT {COLUMNS} FROM messages"
+    )
+    _swap_in("messages_partitioned", ["id", "created_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Detached partitions are not part of messages and are not copied back
+    op.execute("LOCK TABLE messages IN EXCLUSIVE MODE")
+    _create_messages_table("messages_unpartitioned", partitioned=False)
+    op.execute(
+        f"INSERT INTO messages_unpartitioned ({COLUMNS}) SELECT {COLUMNS} FROM messages"
+    )
+    # Dropping the partitioned table drops its partitions with it
+    _swap_in("messages_unpartitioned", ["id"])
@@ -0,0 +1,58 @@
+"""add user_message_stats
+
+Revision ID: 53bd5497c300
+Revises: 6257e00b1822
+Create Date: 2026-10-17 18:48:12.730519
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "53bd5497c300"
+down_revision: Union[str, Sequence[str], None] = "6257e00b1822"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "user_message_stats",
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("inbox_total", sa.Integer(), nullable=False),
+        sa.Column("inbox_unread", sa.Integer(), nullable=False),
+        sa.Column("sent_total", sa.Integer(), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    # Backfill counters for existing messages
+    op.execute(
+        """
+        INSERT INTO user_message_stats (user_id, inbox_total, inbox_unread, sent_total)
+        SELECT
+            u.id,
+            (SELECT count(*) FROM messages m WHERE m.receiver_id = u.id),
+            (SELECT count(*) FROM messages m WHERE m.receiver_id = u.id AND NOT m.is_read),
+            (SELECT count(*) FROM messages m WHERE m.sender_id = u.id)
+        FROM users u
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("user_message_stats")
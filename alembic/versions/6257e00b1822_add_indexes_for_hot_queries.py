@@ -0,0 +1,42 @@
+"""add indexes for hot queries
+
+Revision ID: 6257e00b1822
+Revises: 6ff7f5711f3f
+Create Date: 2026-10-17 18:20:41.512208
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "6257e00b1822"
+down_revision: Union[str, Sequence[str], None] = "6ff7f5711f3f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # inbox with unread_only=true/false — equality on both columns, ordered by id
+    op.create_index(
+        "ix_messages_receiver_id_is_read_id",
+        "messages",
+        ["receiver_id", "is_read", "id"],
+    )
+    # inbox without the unread filter — (receiver_id, is_read, id) can't return it
+    # in id order, so every page would sort the whole inbox
+    op.create_index("ix_messages_receiver_id_id", "messages", ["receiver_id", "id"])
+    op.create_index("ix_messages_sender_id_id", "messages", ["sender_id", "id"])
+    # No extra index for login: users_username_key (the unique constraint) already
+    # turns get_by_username into a single-row index scan, and a partial copy of it
+    # would only add write cost — see docs/benchmarks.md
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_messages_sender_id_id", table_name="messages")
+    op.drop_index("ix_messages_receiver_id_id", table_name="messages")
+    op.drop_index("ix_messages_receiver_id_is_read_id", table_name="messages")
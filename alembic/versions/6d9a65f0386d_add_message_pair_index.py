@@ -0,0 +1,37 @@
+"""add message pair index
+
+Revision ID: 6d9a65f0386d
+Revises: b22aeed9ed8f
+Create Date: 2026-10-17 19:41:55.902317
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "6d9a65f0386d"
+down_revision: Union[str, Sequence[str], None] = "b22aeed9ed8f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_messages_pair_id",
+        "messages",
+        [
+            sa.text("least(sender_id, receiver_id)"),
+            sa.text("greatest(sender_id, receiver_id)"),
+            "id",
+        ],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_messages_pair_id", table_name="messages")
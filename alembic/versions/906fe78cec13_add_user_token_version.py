@@ -0,0 +1,34 @@
+"""add user token version
+
+Revision ID: 906fe78cec13
+Revises: 110cfe1acf96
+Create Date: 2026-10-17 23:41:07.302915
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "906fe78cec13"
+down_revision: Union[str, Sequence[str], None] = "110cfe1acf96"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "users",
+        sa.Column("token_version", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.create_index("ix_users_updated_at", "users", ["updated_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_users_updated_at", table_name="users")
+    op.drop_column("users", "token_version")
@@ -0,0 +1,52 @@
+"""add message search vector
+
+Revision ID: 9150a3ec7c98
+Revises: e123e4a59a2f
+Create Date: 2026-10-17 22:31:06.190843
+
+Adding a stored generated column rewrites every partition of messages.
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9150a3ec7c98"
+down_revision: Union[str, Sequence[str], None] = "e123e4a59a2f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "messages",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "to_tsvector('simple', text) || array_to_tsvector(ARRAY["
+                "'u' || replace(sender_id::text, '-', ''), "
+                "'u' || replace(receiver_id::text, '-', '')])",
+                persisted=True,
+            ),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        "ix_messages_search_vector",
+        "messages",
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_messages_search_vector", table_name="messages")
+    op.drop_column("messages", "search_vector")
@@ -0,0 +1,86 @@
+"""add conversations
+
+Revision ID: b22aeed9ed8f
+Revises: 53bd5497c300
+Create Date: 2026-10-17 19:12:37.208114
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b22aeed9ed8f"
+down_revision: Union[str, Sequence[str], None] = "53bd5497c300"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "conversations",
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("peer_id", sa.UUID(), nullable=False),
+        sa.Column("last_message_id", sa.Integer(), nullable=False),
+        sa.Column("last_message_preview", sa.String(length=100), nullable=False),
+        sa.Column("last_message_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_sender_id", sa.UUID(), nullable=False),
+        sa.Column("unread_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["peer_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("user_id", "peer_id"),
+    )
+    op.create_index(
+        "ix_conversations_user_id_last_message_at",
+        "conversations",
+        ["user_id", "last_message_at", "peer_id"],
+    )
+    # Backfill from existing messages: every message appears once per side, and
+    # only the receiver's side counts it as unread
+    op.execute(
+        """
+        INSERT INTO conversations (
+            user_id, peer_id, last_message_id, last_message_preview,
+            last_message_at, last_sender_id, unread_count
+        )
+        SELECT DISTINCT ON (side.user_id, side.peer_id)
+            side.user_id,
+            side.peer_id,
+            side.id,
+            left(side.text, 100),
+            side.created_at,
+            side.sender_id,
+            count(*) FILTER (WHERE side.unread)
+                OVER (PARTITION BY side.user_id, side.peer_id)
+        FROM (
+            SELECT sender_id AS user_id, receiver_id AS peer_id, id, text,
+                   created_at, sender_id,
+                   sender_id = receiver_id AND NOT is_read AS unread
+            FROM messages
+            UNION ALL
+            SELECT receiver_id, sender_id, id, text, created_at, sender_id,
+                   NOT is_read
+            FROM messages
+            WHERE sender_id <> receiver_id
+        ) AS side
+        ORDER BY side.user_id, side.peer_id, side.id DESC
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_conversations_user_id_last_message_at", table_name="conversations"
+    )
+    op.drop_table("conversations")
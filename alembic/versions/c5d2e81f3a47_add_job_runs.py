@@ -0,0 +1,35 @@
+"""add job runs
+
+Revision ID: c5d2e81f3a47
+Revises: 6b7f40604c36
+Create Date: 2026-10-17 14:05:31.402917
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5d2e81f3a47"
+down_revision: Union[str, Sequence[str], None] = "6b7f40604c36"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "job_runs",
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("job_runs")
@@ -0,0 +1,76 @@
+"""add messages archive
+
+Revision ID: e123e4a59a2f
+Revises: 4ed8a1b048c9
+Create Date: 2026-10-17 21:48:30.774512
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e123e4a59a2f"
+down_revision: Union[str, Sequence[str], None] = "4ed8a1b048c9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "messages_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("text", sa.Text(), nullable=False),
+        sa.Column("sender_id", sa.UUID(), nullable=False),
+        sa.Column("receiver_id", sa.UUID(), nullable=False),
+        sa.Column("is_read", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column(
+            "archived_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(
+            ["receiver_id"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["sender_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_messages_archive_receiver_id_id",
+        "messages_archive",
+        ["receiver_id", "id"],
+    )
+    op.create_index(
+        "ix_messages_archive_sender_id_id",
+        "messages_archive",
+        ["sender_id", "id"],
+    )
+    op.create_index(
+        "ix_messages_archive_pair_id",
+        "messages_archive",
+        [
+            sa.text("least(sender_id, receiver_id)"),
+            sa.text("greatest(sender_id, receiver_id)"),
+            "id",
+        ],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Archived messages are dropped with the table — they are not moved back
+    op.drop_index("ix_messages_archive_pair_id", table_name="messages_archive")
+    op.drop_index("ix_messages_archive_sender_id_id", table_name="messages_archive")
+    op.drop_index("ix_messages_archive_receiver_id_id", table_name="messages_archive")
+    op.drop_table("messages_archive")
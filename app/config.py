@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -5,6 +7,129 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     SECRET_KEY: str
 
+    # Serve the users and messages routes from async handlers on asyncpg
+    # instead of sync handlers in the threadpool
+    ASYNC_DB: bool = False
+
+    # Prometheus metrics at /metrics: request latency per route, SQL statement
+    # and bcrypt timings, message counters. For totals across uvicorn workers
+    # set PROMETHEUS_MULTIPROC_DIR to an empty directory before starting them.
+    METRICS: bool = True
+
+    # Per-request SQL accounting: every response gets a Server-Timing header
+    # with its statement count and database time. Statements slower than
+    # SLOW_QUERY_MS are logged with their route, and a statement run
+    # N_PLUS_ONE_THRESHOLD or more times in one request is logged as a likely
+    # N+1; 0 turns either log off.
+    QUERY_STATS: bool = True
+    SLOW_QUERY_MS: int = 200
+    N_PLUS_ONE_THRESHOLD: int = 5
+
+    # Connection pool of each engine (sync, and async with ASYNC_DB). A request
+    # waits up to DB_POOL_TIMEOUT_SECONDS for a connection, then fails with 503.
+    # Recycling (-1 = never) and pre-ping guard against connections closed by
+    # the server or a proxy while idle. Pool usage is at /health/pool.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    DB_POOL_RECYCLE_SECONDS: int = -1
+    DB_POOL_PRE_PING: bool = False
+    # DATABASE_URL points at PgBouncer in transaction pooling mode: no startup
+    # options and no cached prepared statements, which a pooled server
+    # connection can't keep. The realtime bridge's LISTEN still needs a
+    # session, so leave REALTIME_BRIDGE off.
+    DB_PGBOUNCER: bool = False
+
+    # Streaming replicas for GET requests (JSON list of URLs). A request reads
+    # from one until it writes, then stays on the primary. Replicas are checked
+    # this often, and one lagging by more than REPLICA_MAX_LAG_SECONDS or
+    # unreachable is skipped until it recovers.
+    DATABASE_REPLICA_URLS: list[str] = []
+    REPLICA_MAX_LAG_SECONDS: float = 5
+    REPLICA_CHECK_INTERVAL_SECONDS: int = 5
+
+    # Queue single sends and write them in batches, one transaction per batch
+    INGEST_GROUP_COMMIT: bool = False
+    # Sends waiting for the writer before new ones are rejected with 503
+    INGEST_QUEUE_SIZE: int = 1000
+    INGEST_MAX_BATCH: int = 200
+    # How long the writer waits for more sends to fill a batch
+    INGEST_MAX_DELAY_MS: int = 2
+
+    # Authenticated users resolved from a token are cached per worker for this
+    # long, so most requests skip the user lookup. A deactivation made through
+    # another worker takes effect there after at most the TTL; 0 disables.
+    CURRENT_USER_CACHE_SIZE: int = 10_000
+    CURRENT_USER_CACHE_TTL_SECONDS: int = 30
+
+    # bcrypt runs on its own pool of this many threads, off the request
+    # threadpool; beyond PASSWORD_HASH_MAX_PENDING waiting hashes, register
+    # and login answer 503
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
+    # bcrypt cost for new passwords; stored hashes of a lower cost are
+    # rehashed at the next successful login. With BCRYPT_TARGET_MS set, each
+    # worker instead measures at startup the cost that takes about that long
+    # per hash (python -m scripts.calibrate_bcrypt does the same by hand).
+    BCRYPT_ROUNDS: int = 12
+    BCRYPT_TARGET_MS: int = 0
+
+    # Hits allowed per RATE_LIMIT_WINDOW_SECONDS (sliding) before the route
+    # answers 429 with Retry-After; 0 turns a limit off. Logins are limited per
+    # client IP and (failed logins only) per username, single and batch sends
+    # per sender. "memory" limits each worker on its own; "postgres" shares
+    # the counters through the rate_limit_hits table, at one upsert per check.
+    RATE_LIMIT_BACKEND: Literal["memory", "postgres"] = "memory"
+    RATE_LIMIT_WINDOW_SECONDS: int = 60
+    LOGIN_RATE_LIMIT_PER_IP: int = 30
+    LOGIN_RATE_LIMIT_PER_USERNAME: int = 10
+    MESSAGE_RATE_LIMIT_PER_SENDER: int = 120
+    MESSAGE_BATCH_RATE_LIMIT_PER_SENDER: int = 10
+
+    # Put the user's profile and token version into access tokens, so most
+    # requests are authorized without a query. Users whose token version was
+    # bumped (rename, deactivation) are tracked in memory, refreshed from the
+    # database this often; their older tokens are checked against the database.
+    STATELESS_AUTH: bool = False
+    TOKEN_REVOCATION_REFRESH_SECONDS: int = 5
+
+    # Keep every active username in memory in each worker to serve
+    # /users/autocomplete without a query. Above USERNAME_INDEX_MAX_USERS the
+    # index stays empty and autocomplete queries the database. Changes made
+    # through other workers show up after the next resync.
+    USERNAME_INDEX: bool = False
+    USERNAME_INDEX_MAX_USERS: int = 1_000_000
+    USERNAME_INDEX_RESYNC_SECONDS: int = 300
+
+    # How often each worker re-derives user_message_stats from messages; 0
+    # disables. Users are recounted this many at a time, each batch with its
+    # counter rows locked so concurrent sends wait instead of being lost.
+    STATS_RECONCILE_INTERVAL_SECONDS: int = 3600
+    STATS_RECONCILE_BATCH_SIZE: int = 500
+
+    # messages is partitioned by month: how often each worker checks that the
+    # next PARTITION_MONTHS_AHEAD months exist (0 disables), and how many past
+    # months stay attached (0 keeps everything)
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS: int = 86400
+    PARTITION_MONTHS_AHEAD: int = 3
+    PARTITION_RETENTION_MONTHS: int = 0
+
+    # Read messages older than this many days leave messages: moved to
+    # messages_archive ("archive") or deleted ("delete"); 0 disables. The job
+    # works in small batches with a pause between them.
+    MESSAGE_RETENTION_DAYS: int = 0
+    MESSAGE_RETENTION_POLICY: Literal["archive", "delete"] = "archive"
+    MESSAGE_RETENTION_INTERVAL_SECONDS: int = 3600
+    MESSAGE_RETENTION_BATCH_SIZE: int = 1000
+    MESSAGE_RETENTION_BATCH_PAUSE_MS: int = 100
+
+    # Fan realtime events out through Postgres LISTEN/NOTIFY so every worker
+    # sees them; off means delivery only to sockets held by the same process
+    REALTIME_BRIDGE: bool = False
+    # Undelivered events kept per socket before a slow client is disconnected
+    REALTIME_QUEUE_SIZE: int = 100
+
     model_config = {"env_file": ".env", "extra": "ignore"}
 
 
@@ -1,22 +1,293 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
+import itertools
+import threading
+import time
+import uuid
+from typing import Any, Optional
+
+from fastapi import Request
+from sqlalchemy import Engine, Select, create_engine, text
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
 
 from app.config import settings
+from app.logger import get_logger
+
+logger = get_logger(__name__)
 
 DATABASE_URL = settings.DATABASE_URL
 
-# Force UTC timezone for all DB connections — prevents timezone mismatch between app and DB
-engine = create_engine(DATABASE_URL, connect_args={"options": "-c timezone=utc"})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class _CheckoutStats:
+    """Counts checkouts, how long they take and how many time out.
+
+    A checkout's time is the wait for a free connection, or for a new one to
+    be opened — both are time a request spends before its first query.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_seconds_total = 0.0
+        self.checkout_seconds_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.checkout_seconds_total += elapsed
+                self.checkout_seconds_max = max(self.checkout_seconds_max, elapsed)
+
+
+class InstrumentedQueuePool(_CheckoutStats, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_CheckoutStats, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_stats(pool: Pool) -> dict[str, Any]:
+    """Current usage of an instrumented pool and its counters since startup."""
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        # Connections open beyond `size` (SQLAlchemy counts up from -size)
+        "overflow": max(pool.overflow(), 0),
+        "checkouts": pool.checkouts,
+        "checkout_ms_total": round(pool.checkout_seconds_total * 1000, 3),
+        "checkout_ms_max": round(pool.checkout_seconds_max * 1000, 3),
+        "timeouts": pool.timeouts,
+    }
+
+
+_pool_options = dict(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+)
+
+
+def _create_sync_engine(url: str, **connect_args: Any) -> Engine:
+    # Force UTC timezone for all DB connections — prevents timezone mismatch between app and DB.
+    # PgBouncer rejects startup options: set the timezone on the database or role instead.
+    if not settings.DB_PGBOUNCER:
+        connect_args["options"] = "-c timezone=utc"
+    return create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        connect_args=connect_args,
+        **_pool_options,
+    )
+
+
+def _create_async_engine(url: str, **connect_args: Any) -> AsyncEngine:
+    if settings.DB_PGBOUNCER:
+        # asyncpg prepares every statement; behind PgBouncer the next one may
+        # run on another server connection, so don't cache them, and give them
+        # unique names so two clients never collide on one connection
+        connect_args.update(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid.uuid4()}__",
+        )
+    else:
+        connect_args["server_settings"] = {"timezone": "utc"}
+    return create_async_engine(
+        make_url(url).set(drivername="postgresql+asyncpg"),
+        poolclass=InstrumentedAsyncQueuePool,
+        connect_args=connect_args,
+        **_pool_options,
+    )
+
+
+class RoutingSession(Session):
+    """Session that sends plain SELECTs to a read replica until it writes.
+
+    Anything else — a flush, INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE, a
+    text() statement — goes to the primary, and so does every statement after
+    it: a request that has written reads its own writes. Without a replica it
+    is an ordinary Session on the primary. `used_replica` tells whether any
+    read so far may have been up to REPLICA_MAX_LAG_SECONDS behind.
+    """
+
+    def __init__(self, *args: Any, replica: Optional[Engine] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.replica = replica
+        self.used_replica = False
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        if self.replica is not None:
+            if isinstance(clause, Select) and clause._for_update_arg is None:
+                self.used_replica = True
+                return self.replica
+            self.replica = None
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+# Seconds the replica's data is behind the primary. Caught up while it is
+# streaming and has replayed everything it received; otherwise the age of the
+# last replayed transaction, which keeps growing if it lost the primary.
+REPLICA_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+            AND EXISTS (
+                SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming'
+            )
+            THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+
+class ReplicaSet:
+    """Read replicas and which of them are fit to serve reads.
+
+    check() measures every replica's lag; pick() hands out the ones within
+    max_lag in turn. A replica that can't be reached or falls behind is left
+    out until a later check finds it healthy again. With none healthy — also
+    before the first check — reads go to the primary.
+    """
+
+    def __init__(
+        self,
+        engines: list[Engine],
+        async_engines: list[AsyncEngine],
+        max_lag: float,
+    ):
+        self.engines = engines
+        self.async_engines = async_engines
+        self.max_lag = max_lag
+        # Per replica; None when the last check couldn't reach it
+        self.lag: list[Optional[float]] = [None] * len(engines)
+        self._healthy: list[int] = []
+        self._turn = itertools.count()
+
+    def check(self) -> None:
+        healthy = []
+        for index, replica in enumerate(self.engines):
+            try:
+                with replica.connect() as conn:
+                    lag = conn.execute(REPLICA_LAG_SQL).scalar()
+            except sa_exc.SQLAlchemyError:
+                lag = None
+            # NULL too when it has replayed nothing yet and isn't streaming
+            lag = None if lag is None else float(lag)
+            self.lag[index] = lag
+            if lag is not None and lag <= self.max_lag:
+                healthy.append(index)
+        if healthy != self._healthy:
+            log = logger.info if len(healthy) == len(self.engines) else logger.warning
+            log(
+                "Replicas serving reads: %s of %s (lag: %s)",
+                len(healthy),
+                len(self.engines),
+                self.lag,
+            )
+        self._healthy = healthy
+
+    def _pick_index(self) -> Optional[int]:
+        healthy = self._healthy
+        if not healthy:
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+    def pick(self) -> Optional[Engine]:
+        index = self._pick_index()
+        return None if index is None else self.engines[index]
+
+    def pick_async(self) -> Optional[Engine]:
+        # An AsyncSession binds its sync Session to the async engine's sync_engine
+        index = self._pick_index()
+        return None if index is None else self.async_engines[index].sync_engine
+
+    def status(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "replica": replica.url.render_as_string(hide_password=True),
+                "lag_seconds": lag,
+                "healthy": index in self._healthy,
+            }
+            for index, (replica, lag) in enumerate(zip(self.engines, self.lag))
+        ]
+
+
+engine = _create_sync_engine(DATABASE_URL)
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine, class_=RoutingSession
+)
+
+# Async stack for ASYNC_DB — created only when enabled, so asyncpg is needed only then
+async_engine: AsyncEngine | None = None
+AsyncSessionLocal: async_sessionmaker[AsyncSession] | None = None
+if settings.ASYNC_DB:
+    async_engine = _create_async_engine(DATABASE_URL)
+    # No expiry on commit — an expired attribute can't be lazy-loaded once the
+    # handler is back in plain async code
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine,
+        autoflush=False,
+        expire_on_commit=False,
+        sync_session_class=RoutingSession,
+    )
+
+# A dead replica must fail its health check quickly, not hang it
+replicas = ReplicaSet(
+    [
+        _create_sync_engine(url, connect_timeout=2)
+        for url in settings.DATABASE_REPLICA_URLS
+    ],
+    [
+        _create_async_engine(url, timeout=2)
+        for url in settings.DATABASE_REPLICA_URLS
+        if settings.ASYNC_DB
+    ],
+    settings.REPLICA_MAX_LAG_SECONDS,
+)
 
 
 class Base(DeclarativeBase):
     pass
 
 
-def get_db():
-    db = SessionLocal()
+def _reads_only(request: Request) -> bool:
+    # Only GET requests read from replicas: a write request keeps its reads on
+    # the primary, so it decides on current data
+    return request.method in ("GET", "HEAD")
+
+
+def get_db(request: Request):
+    db = SessionLocal(replica=replicas.pick() if _reads_only(request) else None)
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db(request: Request):
+    replica = replicas.pick_async() if _reads_only(request) else None
+    async with AsyncSessionLocal(replica=replica) as db:
+        yield db
@@ -1,36 +1,177 @@
-from fastapi import Depends, HTTPException
+import uuid
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, WebSocket
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db import get_db
+from app.config import settings
+from app.db import SessionLocal, get_async_db, get_db
 from app.schemas import UserResponse
-from app.services.message_service import MessageService
-from app.services.user_service import UserService
-from app.repositories.user_repository import UserRepository
-from app.utils.security import decode_access_token
+from app.services.conversation_service import ConversationService
+from app.services.message_ingest import message_ingest
+from app.services.message_service import AsyncMessageService, MessageService
+from app.services.user_service import (
+    AsyncUserService,
+    UserService,
+    current_user_cache,
+)
+from app.services.username_index import username_index
+from app.repositories.user_repository import AsyncUserRepository, UserRepository
+from app.services.token_revocations import token_revocations
+from app.utils.security import decode_access_token_claims
 
 # HTTPBearer shows a simple token input in Swagger UI (unlike OAuth2PasswordBearer which shows username/password form)
 oauth2_scheme = HTTPBearer()
 
 
+def get_client_ip(request: Request) -> str:
+    # The proxy's address behind a reverse proxy, unless uvicorn runs with
+    # --proxy-headers and trusts its X-Forwarded-For
+    return request.client.host if request.client else "unknown"
+
+
+def _known_user(claims: dict) -> Optional[UserResponse]:
+    """The user a valid token belongs to, if that is known without a query."""
+    user_id = uuid.UUID(claims["sub"])
+    # Tokens issued without STATELESS_AUTH carry no "ver" claim
+    if (
+        settings.STATELESS_AUTH
+        and "ver" in claims
+        and token_revocations.is_current(user_id, claims["ver"])
+    ):
+        return UserResponse(
+            id=user_id,
+            username=claims["username"],
+            is_active=True,
+            created_at=claims["created_at"],
+            updated_at=claims["updated_at"],
+        )
+    return current_user_cache.get(user_id)
+
+
+def _remember(user, db: Session, generation: int) -> UserResponse:
+    # Only active users are cached — a miss always goes back to the database.
+    # `generation` is the cache's from before the lookup: a rename or
+    # deactivation that invalidated the user since then wins over this load
+    response = UserResponse.model_validate(user)
+    # A replica may not have a deactivation or rename yet: good enough for this
+    # request, but caching it would bring the old user back for the whole TTL
+    if not getattr(db, "used_replica", False):
+        current_user_cache.set(user.id, response, generation=generation)
+    return response
+
+
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(oauth2_scheme),
     db: Session = Depends(get_db),
 ) -> UserResponse:
-    user_id = decode_access_token(credentials.credentials)
-    if not user_id:
+    claims = decode_access_token_claims(credentials.credentials)
+    if not claims:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-    user = UserRepository(db).get_active_by_id(user_id)
+    known = _known_user(claims)
+    if known is not None:
+        return known
+
+    generation = current_user_cache.generation
+    user = UserRepository(db).get_active_by_id(claims["sub"])
     if not user:
         raise HTTPException(status_code=401, detail="User not found or inactive")
 
-    return UserResponse.model_validate(user)
+    return _remember(user, db, generation)
+
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> UserResponse:
+    claims = decode_access_token_claims(credentials.credentials)
+    if not claims:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    known = _known_user(claims)
+    if known is not None:
+        return known
+
+    generation = current_user_cache.generation
+    # asyncpg binds UUID columns from uuid.UUID only, not from str
+    user = await AsyncUserRepository(db).get_active_by_id(uuid.UUID(claims["sub"]))
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found or inactive")
+
+    return _remember(user, db.sync_session, generation)
+
+
+def _authenticate_token(token: str) -> Optional[UserResponse]:
+    claims = decode_access_token_claims(token)
+    if not claims:
+        return None
+    known = _known_user(claims)
+    if known is not None:
+        return known
+    # Own short-lived session — a get_db session would keep a pooled connection
+    # checked out for as long as the socket stays open
+    generation = current_user_cache.generation
+    with SessionLocal() as db:
+        user = UserRepository(db).get_active_by_id(claims["sub"])
+        return _remember(user, db, generation) if user else None
+
+
+async def get_current_user_detached(
+    credentials: HTTPAuthorizationCredentials = Depends(oauth2_scheme),
+) -> UserResponse:
+    # For long-lived requests: no request-scoped session is kept open while they wait
+    user = await run_in_threadpool(_authenticate_token, credentials.credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    return user
+
+
+async def get_websocket_user(websocket: WebSocket) -> Optional[UserResponse]:
+    # Browsers can't set headers on a WebSocket handshake, so the token may
+    # also come as ?token=
+    token = websocket.query_params.get("token")
+    if token is None:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(
+            " "
+        )
+        if scheme.lower() == "bearer":
+            token = credentials
+    if not token:
+        return None
+    return await run_in_threadpool(_authenticate_token, token)
+
+
+def _usernames():
+    return username_index if settings.USERNAME_INDEX else None
 
 
 def get_user_service(db: Session = Depends(get_db)) -> UserService:
-    return UserService(db)
+    return UserService(db, usernames=_usernames())
+
+
+def _ingest():
+    return message_ingest if settings.INGEST_GROUP_COMMIT else None
 
 
 def get_message_service(db: Session = Depends(get_db)) -> MessageService:
-    return MessageService(db)
+    return MessageService(db, ingest=_ingest())
+
+
+def get_conversation_service(db: Session = Depends(get_db)) -> ConversationService:
+    return ConversationService(db)
+
+
+def get_async_user_service(
+    db: AsyncSession = Depends(get_async_db),
+) -> AsyncUserService:
+    return AsyncUserService(db, usernames=_usernames())
+
+
+def get_async_message_service(
+    db: AsyncSession = Depends(get_async_db),
+) -> AsyncMessageService:
+    return AsyncMessageService(db, ingest=_ingest())
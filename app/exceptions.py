@@ -12,3 +12,17 @@ class ConflictError(Exception):
 
 class UnauthorizedError(Exception):
     pass
+
+
+class BadRequestError(Exception):
+    pass
+
+
+class ServiceUnavailableError(Exception):
+    pass
+
+
+class TooManyRequestsError(Exception):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
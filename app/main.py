@@ -1,22 +1,175 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Depends, Request
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
 from sqlalchemy import text
 
-from app.db import get_db
+from app.config import settings
+from app.db import async_engine, engine, get_db, pool_stats, replicas
+from app import metrics, query_stats
 from app.exceptions import (
     NotFoundError,
     ForbiddenError,
     ConflictError,
     UnauthorizedError,
+    BadRequestError,
+    ServiceUnavailableError,
+    TooManyRequestsError,
+)
+from app.realtime.bridge import NotifyListener
+from app.realtime.hub import hub
+from app.routers import (
+    users,
+    users_async,
+    messages,
+    messages_async,
+    conversations,
+    realtime,
 )
-from app.routers import users, messages
+from app.services.message_ingest import message_ingest
+from app.services.rate_limiter import rate_limiter
+from app.services.token_revocations import token_revocations
+from app.services.username_index import username_index
+from app.tasks import run_periodically
+from app.utils.security import (
+    calibrate_bcrypt_rounds,
+    configure_bcrypt_rounds,
+    password_hasher,
+)
+from app.tasks.partitions import maintain_message_partitions
+from app.tasks.reconcile_stats import reconcile_message_stats
+from app.tasks.retention import retire_old_messages
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Events are published from threadpool threads and delivered on this loop
+    hub.attach(asyncio.get_running_loop())
+    if settings.BCRYPT_TARGET_MS > 0:
+        # A few cheap hashes, before any request can hash at the old cost
+        configure_bcrypt_rounds(
+            await asyncio.to_thread(calibrate_bcrypt_rounds, settings.BCRYPT_TARGET_MS)
+        )
+    listener = None
+    if settings.REALTIME_BRIDGE:
+        listener = NotifyListener(hub)
+        listener.start()
+    if settings.INGEST_GROUP_COMMIT:
+        message_ingest.start()
+
+    tasks = []
+    if settings.STATELESS_AUTH:
+        # Until the first refresh every token is checked against the database
+        tasks.append(
+            asyncio.create_task(
+                run_periodically(
+                    token_revocations.refresh,
+                    settings.TOKEN_REVOCATION_REFRESH_SECONDS,
+                    run_first=True,
+                )
+            )
+        )
+    if replicas.engines:
+        # Reads stay on the primary until the first check passes
+        tasks.append(
+            asyncio.create_task(
+                run_periodically(
+                    replicas.check,
+                    settings.REPLICA_CHECK_INTERVAL_SECONDS,
+                    run_first=True,
+                )
+            )
+        )
+    if rate_limiter.shared:
+        # Counters older than the previous window are never read again
+        tasks.append(
+            asyncio.create_task(
+                run_periodically(rate_limiter.prune, rate_limiter.window)
+            )
+        )
+    if settings.USERNAME_INDEX:
+        # Loaded in the background — autocomplete queries the database until then
+        tasks.append(
+            asyncio.create_task(
+                run_periodically(
+                    username_index.resync,
+                    settings.USERNAME_INDEX_RESYNC_SECONDS,
+                    run_first=True,
+                )
+            )
+        )
+    if settings.STATS_RECONCILE_INTERVAL_SECONDS > 0:
+        tasks.append(
+            asyncio.create_task(
+                run_periodically(
+                    reconcile_message_stats, settings.STATS_RECONCILE_INTERVAL_SECONDS
+                )
+            )
+        )
+    if settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS > 0:
+        tasks.append(
+            asyncio.create_task(
+                run_periodically(
+                    maintain_message_partitions,
+                    settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS,
+                )
+            )
+        )
+    if (
+        settings.MESSAGE_RETENTION_DAYS > 0
+        and settings.MESSAGE_RETENTION_INTERVAL_SECONDS > 0
+    ):
+        tasks.append(
+            asyncio.create_task(
+                run_periodically(
+                    retire_old_messages, settings.MESSAGE_RETENTION_INTERVAL_SECONDS
+                )
+            )
+        )
+    yield
+    if settings.INGEST_GROUP_COMMIT:
+        # Requests are finished by now — write out whatever is still queued
+        await asyncio.to_thread(message_ingest.stop)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if listener is not None:
+        await asyncio.to_thread(listener.stop)
+    await asyncio.to_thread(password_hasher.shutdown)
+    metrics.mark_process_dead()
+    if async_engine is not None:
+        await async_engine.dispose()
+    for replica in replicas.async_engines:
+        await replica.dispose()
+
 
-app = FastAPI(title="Messenger")
+app = FastAPI(title="Messenger", lifespan=lifespan)
 
-app.include_router(users.router)
-app.include_router(messages.router)
+if settings.METRICS:
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.add_api_route("/metrics", metrics.metrics_endpoint, include_in_schema=False)
+    # Statement durations come from the same timing as the per-request counts
+    query_stats.time_statements(metrics.observe_statement)
+
+if settings.QUERY_STATS:
+    app.add_middleware(
+        query_stats.QueryStatsMiddleware,
+        slow_query_ms=settings.SLOW_QUERY_MS,
+        repeat_threshold=settings.N_PLUS_ONE_THRESHOLD,
+    )
+    query_stats.time_statements()
+
+if settings.ASYNC_DB:
+    app.include_router(users_async.router)
+    app.include_router(messages_async.router)
+else:
+    app.include_router(users.router)
+    app.include_router(messages.router)
+app.include_router(conversations.router)
+app.include_router(realtime.router)
 
 
 @app.exception_handler(NotFoundError)
@@ -39,6 +192,37 @@ def conflict_handler(request: Request, exc: ConflictError):
     return JSONResponse(status_code=400, content={"detail": str(exc)})
 
 
+@app.exception_handler(BadRequestError)
+def bad_request_handler(request: Request, exc: BadRequestError):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
+@app.exception_handler(ServiceUnavailableError)
+def service_unavailable_handler(request: Request, exc: ServiceUnavailableError):
+    return JSONResponse(
+        status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"}
+    )
+
+
+@app.exception_handler(TooManyRequestsError)
+def too_many_requests_handler(request: Request, exc: TooManyRequestsError):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(PoolTimeoutError)
+def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    # Every connection stayed busy for DB_POOL_TIMEOUT_SECONDS
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database busy, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
 @app.get("/health")
 # @app.get("/health", response_model=HealthResponse)
 def health(db: Session = Depends(get_db)):
@@ -49,3 +233,23 @@ def health(db: Session = Depends(get_db)):
         return JSONResponse(
             status_code=503, content={"status": "error", "db": "unavailable"}
         )
+
+
+# async and query-free, so it answers even when every threadpool thread is
+# stuck waiting for a connection. Per worker: each process has its own pools.
+@app.get("/health/pool")
+async def health_pool():
+    pools = {"sync": pool_stats(engine.pool)}
+    if async_engine is not None:
+        pools["async"] = pool_stats(async_engine.pool)
+    for index, replica in enumerate(replicas.engines):
+        pools[f"replica-{index}"] = pool_stats(replica.pool)
+    for index, replica in enumerate(replicas.async_engines):
+        pools[f"replica-{index}-async"] = pool_stats(replica.pool)
+    return pools
+
+
+# As of the last check, every REPLICA_CHECK_INTERVAL_SECONDS
+@app.get("/health/replicas")
+async def health_replicas():
+    return replicas.status()
@@ -0,0 +1,156 @@
+"""Prometheus metrics, served at /metrics.
+
+With PROMETHEUS_MULTIPROC_DIR pointing at an empty directory when the workers
+start, every uvicorn worker writes its values to files there and /metrics adds
+them up across workers. Without it, each worker reports only its own numbers.
+"""
+
+import os
+import time
+from typing import Any, Callable
+
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to answer an HTTP request, by route template",
+    ["method", "route"],
+)
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests answered, by route template and status code",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests being answered right now",
+    multiprocess_mode="livesum",
+)
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds",
+    "Time to run one SQL statement, by its first keyword",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "CPU time of one bcrypt call, without the wait for a hashing thread",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+MESSAGES_CREATED = Counter("messages_created_total", "Messages sent")
+MESSAGES_READ = Counter("messages_read_total", "Messages marked as read")
+MESSAGES_DELETED = Counter("messages_deleted_total", "Messages deleted by the sender")
+
+# First keywords reported as themselves; anything else (WITH, SET, ...) is OTHER.
+# Children created up front: labels() takes a lock on every call.
+_STATEMENT_DURATIONS = {
+    operation: DB_STATEMENT_DURATION.labels(operation)
+    for operation in ("SELECT", "INSERT", "UPDATE", "DELETE", "OTHER")
+}
+
+
+def metrics_endpoint() -> Response:
+    if MULTIPROCESS:
+        # A fresh registry per scrape — it reads every worker's files
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead() -> None:
+    # Drops this worker's share of the in-flight gauge; its counters stay
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def timed(histogram: Histogram, label: str, fn: Callable[..., Any], *args: Any) -> Any:
+    """Call fn(*args) and observe its duration under `label`."""
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        histogram.labels(label).observe(time.perf_counter() - started)
+
+
+def observe_statement(statement: str, elapsed: float) -> None:
+    # Fed by the statement timing in app.query_stats
+    duration = _STATEMENT_DURATIONS.get(
+        statement.lstrip()[:6].upper(), _STATEMENT_DURATIONS["OTHER"]
+    )
+    duration.observe(elapsed)
+
+
+# --- HTTP requests ---
+
+
+class MetricsMiddleware:
+    """Times every HTTP request and counts it by route template and status.
+
+    A plain ASGI middleware: BaseHTTPMiddleware would add a task and a stream
+    per request, several times the cost of the metrics themselves. Labelled
+    children are cached here, skipping prometheus_client's locked lookup.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._durations: dict[tuple[str, str], Any] = {}
+        self._counts: dict[tuple[str, str, int], Any] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_FLIGHT.dec()
+            # The template (/messages/{message_id}/read), never the raw path —
+            # ids in labels would make a new series per message
+            route = scope.get("route")
+            self._observe(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status,
+                elapsed,
+            )
+
+    def _observe(self, method: str, route: str, status: int, elapsed: float) -> None:
+        duration = self._durations.get((method, route))
+        if duration is None:
+            duration = self._durations[(method, route)] = REQUEST_DURATION.labels(
+                method, route
+            )
+        count = self._counts.get((method, route, status))
+        if count is None:
+            count = self._counts[(method, route, status)] = REQUESTS.labels(
+                method, route, str(status)
+            )
+        duration.observe(elapsed)
+        count.inc()
@@ -1,8 +1,19 @@
 import uuid
 from datetime import datetime
+from typing import Optional
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, Text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Computed,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
@@ -11,6 +22,17 @@ from app.db import Base
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Trigram index (pg_trgm) — serves username ILIKE '%q%' in /users/search
+        Index(
+            "ix_users_username_trgm",
+            "username",
+            postgresql_using="gin",
+            postgresql_ops={"username": "gin_trgm_ops"},
+        ),
+        # Token revocation refresh reads users changed since its last run
+        Index("ix_users_updated_at", "updated_at"),
+    )
 
     # UUID generated on Python side (not DB side) — ensures we know the ID before DB insert
     id: Mapped[uuid.UUID] = mapped_column(
@@ -21,6 +43,11 @@ class User(Base):
     username: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     password_hash: Mapped[str] = mapped_column(String(255), nullable=False)
+    # Bumped on rename and deactivation — access tokens carrying an older
+    # version are no longer trusted without a database check (STATELESS_AUTH)
+    token_version: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False
+    )
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now(),
@@ -44,6 +71,19 @@ class User(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    # Match the repository queries: filter by owner, order/seek by id.
+    # Partitioned by month of created_at (see app/tasks/partitions.py); indexes
+    # are defined on the parent and exist on every partition.
+    __table_args__ = (
+        Index("ix_messages_receiver_id_is_read_id", "receiver_id", "is_read", "id"),
+        Index("ix_messages_receiver_id_id", "receiver_id", "id"),
+        Index("ix_messages_sender_id_id", "sender_id", "id"),
+        Index("ix_messages_search_vector", "search_vector", postgresql_using="gin"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+    # Fetch created_at/updated_at with RETURNING on insert — conversation previews
+    # need them before commit
+    __mapper_args__ = {"eager_defaults": True}
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     text: Mapped[str] = mapped_column(Text, nullable=False)
@@ -58,8 +98,11 @@ class Message(Base):
         nullable=False,
     )
     is_read: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    # Part of the primary key because it is the partition key — ids still come
+    # from one sequence and are unique on their own
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
+        primary_key=True,
         server_default=func.now(),
         nullable=False,
     )
@@ -69,6 +112,19 @@ class Message(Base):
         onupdate=func.now(),
         nullable=False,
     )
+    # Words of the text plus a "u<hex uuid>" lexeme for each participant, so a
+    # search ANDs the owner's lexeme into the query and the GIN index itself
+    # keeps it to that user's messages. Deferred — only search reads it.
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "to_tsvector('simple', text) || array_to_tsvector(ARRAY["
+            "'u' || replace(sender_id::text, '-', ''), "
+            "'u' || replace(receiver_id::text, '-', '')])",
+            persisted=True,
+        ),
+        deferred=True,
+    )
 
     sender: Mapped["User"] = relationship(
         "User", foreign_keys=[sender_id], back_populates="sent_messages"
@@ -76,3 +132,143 @@ class Message(Base):
     receiver: Mapped["User"] = relationship(
         "User", foreign_keys=[receiver_id], back_populates="received_messages"
     )
+
+
+# Two-party thread: the same key for both directions of a conversation
+Index(
+    "ix_messages_pair_id",
+    func.least(Message.sender_id, Message.receiver_id),
+    func.greatest(Message.sender_id, Message.receiver_id),
+    Message.id,
+)
+
+
+# Read messages past MESSAGE_RETENTION_DAYS, moved out of messages by
+# app/tasks/retention.py. Same columns, so history reads can UNION ALL both tables.
+class MessageArchive(Base):
+    __tablename__ = "messages_archive"
+    __table_args__ = (
+        Index("ix_messages_archive_receiver_id_id", "receiver_id", "id"),
+        Index("ix_messages_archive_sender_id_id", "sender_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    text: Mapped[str] = mapped_column(Text, nullable=False)
+    sender_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id"),
+        nullable=False,
+    )
+    receiver_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id"),
+        nullable=False,
+    )
+    is_read: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+
+
+Index(
+    "ix_messages_archive_pair_id",
+    func.least(MessageArchive.sender_id, MessageArchive.receiver_id),
+    func.greatest(MessageArchive.sender_id, MessageArchive.receiver_id),
+    MessageArchive.id,
+)
+
+
+# Denormalized counters — kept in step with messages by MessageService, so inbox
+# totals and the unread badge don't need count(*) over the user's messages
+class UserMessageStats(Base):
+    __tablename__ = "user_message_stats"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id"),
+        primary_key=True,
+    )
+    inbox_total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    inbox_unread: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    sent_total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
+
+
+# One row per participant: (user_id, peer_id) and (peer_id, user_id) both exist,
+# so a user's chat list is a single range scan on user_id and each side keeps its
+# own unread count. Maintained by MessageService alongside the messages.
+class Conversation(Base):
+    __tablename__ = "conversations"
+    __table_args__ = (
+        Index(
+            "ix_conversations_user_id_last_message_at",
+            "user_id",
+            "last_message_at",
+            "peer_id",
+        ),
+    )
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id"),
+        primary_key=True,
+    )
+    peer_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id"),
+        primary_key=True,
+    )
+    last_message_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    last_message_preview: Mapped[str] = mapped_column(String(100), nullable=False)
+    last_message_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+    last_sender_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), nullable=False
+    )
+    unread_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    peer: Mapped["User"] = relationship("User", foreign_keys=[peer_id], lazy="joined")
+
+    @property
+    def peer_username(self) -> str:
+        return self.peer.username
+
+
+# Last run of each periodic job that should run once per interval across all
+# workers, not once per worker
+class JobRun(Base):
+    __tablename__ = "job_runs"
+
+    name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    started_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+    # NULL while the run is in progress, or if it never finished
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+
+# Request counts per key and fixed window for RATE_LIMIT_BACKEND=postgres. Only
+# the current and previous windows are ever read, so the table stays small.
+class RateLimitHit(Base):
+    __tablename__ = "rate_limit_hits"
+    # Losing counters in a crash only resets the limits — skip the WAL
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key: Mapped[str] = mapped_column(String(200), primary_key=True)
+    # Epoch seconds the window starts at, a multiple of RATE_LIMIT_WINDOW_SECONDS
+    window_start: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    hits: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -0,0 +1,159 @@
+"""SQL statement timing and per-request SQL accounting.
+
+One pair of engine hooks times every statement once. The duration goes to the
+Prometheus histogram (when metrics are on) and to the request running it.
+Per request, the statements and the time spent in them are counted and
+reported in a Server-Timing header. Slow statements are logged with their
+route, and a statement repeated within one request is flagged as a likely N+1.
+
+The hooks find the request through a context variable: it follows the
+request into threadpool threads (sync handlers and dependencies) and into
+SQLAlchemy's greenlets (async sessions). Statements run outside a request —
+background tasks, the ingest writer — are not counted.
+"""
+
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from sqlalchemy import Engine, event
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Logged statements are cut to this many characters
+STATEMENT_LOG_LENGTH = 500
+
+
+class RequestQueries:
+    """Statements run by one request so far."""
+
+    __slots__ = ("scope", "slow_seconds", "count", "seconds", "repeats")
+
+    def __init__(self, scope: dict, slow_seconds: float):
+        self.scope = scope
+        self.slow_seconds = slow_seconds
+        self.count = 0
+        self.seconds = 0.0
+        # statement text -> times run; ORM statements with different
+        # parameters share one text, which is what gives an N+1 away
+        self.repeats: dict[str, int] = {}
+
+    def add(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.seconds += elapsed
+        self.repeats[statement] = self.repeats.get(statement, 0) + 1
+        if self.slow_seconds and elapsed >= self.slow_seconds:
+            logger.warning(
+                "Slow query: %.1f ms on %s: %s",
+                elapsed * 1000,
+                self.route,
+                _shorten(statement),
+            )
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        path = route.path if route is not None else self.scope["path"]
+        return f"{self.scope['method']} {path}"
+
+    def server_timing(self) -> bytes:
+        noun = "statement" if self.count == 1 else "statements"
+        return f'db;desc="{self.count} {noun}";dur={self.seconds * 1000:.1f}'.encode()
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar(
+    "request_queries", default=None
+)
+# Also given every statement's duration — metrics.observe_statement with METRICS
+_observe: Optional[Callable[[str, float], None]] = None
+
+
+def _shorten(statement: str) -> str:
+    return " ".join(statement.split())[:STATEMENT_LOG_LENGTH]
+
+
+# --- SQL statements ---
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _observe is not None or _current.get() is not None:
+        context._started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = _current.get()
+    if _observe is None and queries is None:
+        return
+    elapsed = time.perf_counter() - context._started
+    if _observe is not None:
+        _observe(statement, elapsed)
+    if queries is not None:
+        queries.add(statement, elapsed)
+
+
+def time_statements(observe: Optional[Callable[[str, float], None]] = None) -> None:
+    """Time every statement of every engine: primary, async and replicas.
+
+    Statements are counted for the request they run in; `observe`, if given,
+    is also called with each statement and its duration in seconds.
+    """
+    global _observe
+    if observe is not None:
+        _observe = observe
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- HTTP requests ---
+
+
+class QueryStatsMiddleware:
+    """Accounts each HTTP request's statements and adds a Server-Timing header.
+
+    Statements slower than `slow_query_ms` are logged as they finish (0
+    disables). When the request ends, a statement run `repeat_threshold` or
+    more times is logged once as a likely N+1 (0 disables).
+    """
+
+    def __init__(self, app, slow_query_ms: float = 0, repeat_threshold: int = 0):
+        self.app = app
+        self.slow_seconds = slow_query_ms / 1000
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries(scope, self.slow_seconds)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                # Statements run after this point (a streamed body) are still
+                # logged, but miss the header
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", queries.server_timing()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current.set(queries)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if self.repeat_threshold:
+                self._report_repeats(queries)
+
+    def _report_repeats(self, queries: RequestQueries) -> None:
+        for statement, times in queries.repeats.items():
+            if times >= self.repeat_threshold:
+                logger.warning(
+                    "Likely N+1: statement run %s times (%s in total) on %s: %s",
+                    times,
+                    queries.count,
+                    queries.route,
+                    _shorten(statement),
+                )
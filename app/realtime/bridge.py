@@ -0,0 +1,65 @@
+import json
+import select
+import threading
+
+from app.db import engine
+from app.logger import get_logger
+from app.realtime.events import CHANNEL
+from app.realtime.hub import Hub
+
+logger = get_logger(__name__)
+
+# How often the listener wakes up to check for shutdown
+POLL_INTERVAL_SECONDS = 1.0
+RECONNECT_DELAY_SECONDS = 2.0
+
+
+class NotifyListener:
+    """LISTENs on the events channel and feeds every notification to the hub.
+
+    Each worker runs one listener on its own connection, so an event committed
+    by any worker or node reaches sockets held by all of them.
+    """
+
+    def __init__(self, hub: Hub):
+        self.hub = hub
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="realtime-listener", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=POLL_INTERVAL_SECONDS * 2)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("Realtime listener lost its connection, reconnecting")
+                self._stop.wait(RECONNECT_DELAY_SECONDS)
+
+    def _listen(self) -> None:
+        # Taken out of the pool for good — a LISTEN connection is never shared
+        raw = engine.raw_connection()
+        conn = raw.driver_connection
+        raw.detach()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            logger.info("Realtime listener started")
+            while not self._stop.is_set():
+                ready, _, _ = select.select([conn], [], [], POLL_INTERVAL_SECONDS)
+                if not ready:
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    self.hub.dispatch_threadsafe(json.loads(notify.payload))
+        finally:
+            raw.close()
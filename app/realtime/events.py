@@ -0,0 +1,132 @@
+import json
+import uuid
+from typing import Iterable
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Message
+from app.realtime.hub import hub
+from app.schemas import MessageResponse
+
+CHANNEL = "messenger_events"
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_NOTIFY_PAYLOAD = 7900
+PENDING_KEY = "realtime_events"
+
+MESSAGE_CREATED = "message.created"
+MESSAGES_READ = "messages.read"
+MESSAGE_DELETED = "message.deleted"
+
+
+def publish(
+    db: Session, event_type: str, user_ids: Iterable[uuid.UUID], data: dict
+) -> None:
+    """Queue an event for delivery once the session's transaction commits.
+
+    Nothing is sent on rollback, so sockets never see changes that didn't happen.
+    """
+    pending = db.info.setdefault(PENDING_KEY, [])
+    pending.append(
+        {
+            "type": event_type,
+            "user_ids": sorted({str(user_id) for user_id in user_ids}),
+            "data": data,
+        }
+    )
+
+
+class EventPublisher:
+    """Builds the realtime events for message changes made through a session."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def message_created(self, messages: list[Message]) -> None:
+        for message in messages:
+            publish(
+                self.db,
+                MESSAGE_CREATED,
+                (message.sender_id, message.receiver_id),
+                MessageResponse.model_validate(message).model_dump(mode="json"),
+            )
+
+    def messages_read(
+        self, reader_id: uuid.UUID, rows: list[tuple[int, uuid.UUID]]
+    ) -> None:
+        # One event per sender — nobody learns about messages they didn't send
+        by_sender: dict[uuid.UUID, list[int]] = {}
+        for message_id, sender_id in rows:
+            by_sender.setdefault(sender_id, []).append(message_id)
+        for sender_id, ids in by_sender.items():
+            publish(
+                self.db,
+                MESSAGES_READ,
+                (sender_id, reader_id),
+                {
+                    "reader_id": str(reader_id),
+                    "sender_id": str(sender_id),
+                    "ids": sorted(ids),
+                },
+            )
+
+    def message_deleted(self, message: Message) -> None:
+        publish(
+            self.db,
+            MESSAGE_DELETED,
+            (message.sender_id, message.receiver_id),
+            {
+                "id": message.id,
+                "sender_id": str(message.sender_id),
+                "receiver_id": str(message.receiver_id),
+            },
+        )
+
+
+def encode(event_data: dict) -> str:
+    payload = json.dumps(event_data, separators=(",", ":"), default=str)
+    if len(payload.encode()) <= MAX_NOTIFY_PAYLOAD:
+        return payload
+    # Too big for NOTIFY (long texts, large bulk reads) — tell the clients what
+    # changed and let them refetch it
+    return json.dumps(
+        {
+            "type": event_data["type"],
+            "user_ids": event_data["user_ids"],
+            "data": None,
+            "resync": True,
+        },
+        separators=(",", ":"),
+    )
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_before_commit(session: Session) -> None:
+    # With the bridge on, events go out through NOTIFY inside the transaction:
+    # Postgres delivers them to every listening worker only if the commit succeeds
+    if not settings.REALTIME_BRIDGE:
+        return
+    events = session.info.pop(PENDING_KEY, None)
+    if not events:
+        return
+    session.execute(
+        text(
+            "SELECT pg_notify(:channel, payload) "
+            "FROM unnest(CAST(:payloads AS text[])) AS payload"
+        ),
+        {"channel": CHANNEL, "payloads": [encode(e) for e in events]},
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_after_commit(session: Session) -> None:
+    events = session.info.pop(PENDING_KEY, None)
+    for event_data in events or ():
+        # Same shape as events that came back through NOTIFY
+        hub.dispatch_threadsafe(json.loads(encode(event_data)))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
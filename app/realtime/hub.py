@@ -0,0 +1,71 @@
+import asyncio
+import uuid
+from collections import defaultdict
+from typing import Optional
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class Subscription:
+    def __init__(self, user_id: uuid.UUID, max_queue: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        # Set when the client can't keep up — the socket is closed so the
+        # client resyncs over REST instead of silently missing events
+        self.overflowed = False
+
+
+class Hub:
+    """In-process fan-out of events to the sockets connected to this worker.
+
+    All subscription state lives on the event loop thread. Services publish
+    from threadpool threads, so they go through dispatch_threadsafe.
+    """
+
+    def __init__(self):
+        self._subscriptions: dict[uuid.UUID, set[Subscription]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def subscribe(self, user_id: uuid.UUID, max_queue: int) -> Subscription:
+        subscription = Subscription(user_id, max_queue)
+        self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.user_id]
+
+    def connection_count(self) -> int:
+        return sum(len(s) for s in self._subscriptions.values())
+
+    def dispatch(self, event: dict) -> None:
+        for user_id in event["user_ids"]:
+            for subscription in self._subscriptions.get(uuid.UUID(user_id), ()):
+                if subscription.overflowed:
+                    continue
+                try:
+                    subscription.queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    subscription.overflowed = True
+                    # Wake the socket loop so it notices and closes
+                    subscription.queue.get_nowait()
+                    subscription.queue.put_nowait(None)
+                    logger.warning("Realtime queue overflow: user=%s", user_id)
+
+    def dispatch_threadsafe(self, event: dict) -> None:
+        # No loop yet (CLI scripts, tests without lifespan) — nobody is listening
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self.dispatch, event)
+
+
+hub = Hub()
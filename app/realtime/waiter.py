@@ -0,0 +1,59 @@
+import uuid
+
+import anyio
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.db import SessionLocal
+from app.realtime.events import MESSAGE_CREATED
+from app.realtime.hub import hub
+from app.schemas import MessageResponse
+from app.services.message_service import MessageService
+
+
+def _fetch_inbox_after(
+    receiver_id: uuid.UUID, after_id: int, size: int
+) -> list[MessageResponse]:
+    # Short-lived session — a waiting request must not keep a connection checked out
+    with SessionLocal() as db:
+        messages = MessageService(db).get_inbox_after(receiver_id, after_id, size)
+        return [MessageResponse.model_validate(m) for m in messages]
+
+
+def _is_wake_up(event: dict | None, receiver_id: uuid.UUID) -> bool:
+    # None means the queue overflowed — something happened, go and look
+    if event is None:
+        return True
+    if event["type"] != MESSAGE_CREATED:
+        return False
+    if event.get("resync"):
+        return True
+    return event["data"]["receiver_id"] == str(receiver_id)
+
+
+async def wait_for_inbox(
+    receiver_id: uuid.UUID, after_id: int, size: int, timeout: float
+) -> list[MessageResponse]:
+    """Return inbox messages newer than after_id, waiting up to `timeout` for one.
+
+    While parked the request is just a hub subscription on the event loop: no
+    database connection and no threadpool thread.
+    """
+    # Subscribe before checking, so a message committed in between isn't missed
+    subscription = hub.subscribe(receiver_id, settings.REALTIME_QUEUE_SIZE)
+    try:
+        messages = await run_in_threadpool(
+            _fetch_inbox_after, receiver_id, after_id, size
+        )
+        if messages:
+            return messages
+
+        with anyio.move_on_after(timeout) as scope:
+            while not _is_wake_up(await subscription.queue.get(), receiver_id):
+                pass
+        if scope.cancelled_caught:
+            return []
+    finally:
+        hub.unsubscribe(subscription)
+
+    return await run_in_threadpool(_fetch_inbox_after, receiver_id, after_id, size)
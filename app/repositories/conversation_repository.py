@@ -0,0 +1,172 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import (
+    Integer,
+    and_,
+    case,
+    column,
+    delete,
+    func,
+    or_,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import UUID, insert
+from sqlalchemy.orm import Session
+
+from app.models import Conversation, Message
+
+PREVIEW_LENGTH = 100
+
+# A keyset position in the chat list: (last_message_at, peer_id)
+ConversationKey = tuple[datetime, uuid.UUID]
+
+
+class ConversationRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, user_id: uuid.UUID, peer_id: uuid.UUID) -> Optional[Conversation]:
+        return (
+            self.db.query(Conversation)
+            .filter(Conversation.user_id == user_id, Conversation.peer_id == peer_id)
+            .first()
+        )
+
+    def on_messages_created(self, messages: list[Message]) -> None:
+        """Upsert both sides of every conversation the messages belong to.
+
+        Runs in the current transaction — the caller commits.
+        """
+        rows: dict[tuple[uuid.UUID, uuid.UUID], dict] = {}
+        for message in messages:
+            sides = (
+                (message.sender_id, message.receiver_id, 0),
+                (message.receiver_id, message.sender_id, 1),
+            )
+            for user_id, peer_id, unread in sides:
+                # Sending to yourself maps both sides onto the same row
+                row = rows.get((user_id, peer_id))
+                if row is None or row["last_message_id"] < message.id:
+                    row = {
+                        "user_id": user_id,
+                        "peer_id": peer_id,
+                        "last_message_id": message.id,
+                        "last_message_preview": message.text[:PREVIEW_LENGTH],
+                        "last_message_at": message.created_at,
+                        "last_sender_id": message.sender_id,
+                        "unread_count": row["unread_count"] if row else 0,
+                    }
+                    rows[(user_id, peer_id)] = row
+                row["unread_count"] += unread
+
+        # Sorted so concurrent senders lock rows in the same order
+        ordered = [rows[key] for key in sorted(rows)]
+        stmt = insert(Conversation).values(ordered)
+        excluded = stmt.excluded
+        # Commits can land out of id order — never replace a newer last message
+        is_newer = excluded.last_message_id > Conversation.last_message_id
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Conversation.user_id, Conversation.peer_id],
+            set_={
+                "last_message_id": func.greatest(
+                    Conversation.last_message_id, excluded.last_message_id
+                ),
+                "last_message_preview": case(
+                    (is_newer, excluded.last_message_preview),
+                    else_=Conversation.last_message_preview,
+                ),
+                "last_message_at": case(
+                    (is_newer, excluded.last_message_at),
+                    else_=Conversation.last_message_at,
+                ),
+                "last_sender_id": case(
+                    (is_newer, excluded.last_sender_id),
+                    else_=Conversation.last_sender_id,
+                ),
+                "unread_count": Conversation.unread_count + excluded.unread_count,
+            },
+        )
+        self.db.execute(stmt)
+
+    def decrement_unread(
+        self, user_id: uuid.UUID, counts: dict[uuid.UUID, int]
+    ) -> None:
+        """Subtract per-peer read counts from user_id's side, in one UPDATE."""
+        if not counts:
+            return
+        read = values(
+            column("peer_id", UUID(as_uuid=True)),
+            column("count", Integer),
+            name="read",
+        ).data(sorted(counts.items()))
+        self.db.execute(
+            update(Conversation)
+            .where(
+                Conversation.user_id == user_id, Conversation.peer_id == read.c.peer_id
+            )
+            .values(
+                unread_count=func.greatest(Conversation.unread_count - read.c.count, 0)
+            )
+        )
+
+    def replace_last_message(
+        self,
+        user_a: uuid.UUID,
+        user_b: uuid.UUID,
+        deleted_message_id: int,
+        last: Optional[Message],
+    ) -> None:
+        """Point both sides at `last` after their last message was deleted.
+
+        With no messages left between the two users the conversation goes away.
+        """
+        pair = or_(
+            and_(Conversation.user_id == user_a, Conversation.peer_id == user_b),
+            and_(Conversation.user_id == user_b, Conversation.peer_id == user_a),
+        )
+        condition = and_(pair, Conversation.last_message_id == deleted_message_id)
+        if last is None:
+            self.db.execute(delete(Conversation).where(condition))
+            return
+        self.db.execute(
+            update(Conversation)
+            .where(condition)
+            .values(
+                last_message_id=last.id,
+                last_message_preview=last.text[:PREVIEW_LENGTH],
+                last_message_at=last.created_at,
+                last_sender_id=last.sender_id,
+            )
+        )
+
+    def list_keyset(
+        self,
+        user_id: uuid.UUID,
+        after: Optional[ConversationKey],
+        before: Optional[ConversationKey],
+        limit: int,
+    ) -> list[Conversation]:
+        # Most recent activity first. `before` walks back towards newer
+        # conversations, so its rows come back in ascending order.
+        position = tuple_(Conversation.last_message_at, Conversation.peer_id)
+        query = self.db.query(Conversation).filter(Conversation.user_id == user_id)
+        if before is not None:
+            return (
+                query.filter(position > tuple_(*before))
+                .order_by(Conversation.last_message_at, Conversation.peer_id)
+                .limit(limit)
+                .all()
+            )
+        if after is not None:
+            query = query.filter(position < tuple_(*after))
+        return (
+            query.order_by(
+                Conversation.last_message_at.desc(), Conversation.peer_id.desc()
+            )
+            .limit(limit)
+            .all()
+        )
@@ -0,0 +1,32 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Claims a run unless one started less than :min_gap seconds ago. Concurrent
+# claims serialize on the job's row, so only one of them gets it.
+CLAIM_SQL = text(
+    """
+    INSERT INTO job_runs (name, started_at)
+    VALUES (:name, now())
+    ON CONFLICT (name) DO UPDATE
+        SET started_at = now(), finished_at = NULL
+        WHERE job_runs.started_at < now() - make_interval(secs => :min_gap)
+    RETURNING name
+    """
+)
+
+FINISH_SQL = text("UPDATE job_runs SET finished_at = now() WHERE name = :name")
+
+
+class JobRunRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def claim(self, name: str, min_gap: float) -> bool:
+        """Record a run of `name` as started, unless another one started less
+        than `min_gap` seconds ago. Runs in the current transaction."""
+        claimed = self.db.execute(CLAIM_SQL, {"name": name, "min_gap": min_gap})
+        return claimed.scalar() is not None
+
+    def finish(self, name: str) -> None:
+        self.db.execute(FINISH_SQL, {"name": name})
+        self.db.commit()
@@ -1,9 +1,129 @@
 import uuid
+from datetime import datetime, timedelta
 from typing import Optional
 
-from sqlalchemy.orm import Session, Query
+from sqlalchemy import (
+    Double,
+    cast,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import TSQUERY
+from sqlalchemy.orm import Session, Query, aliased
 
-from app.models import Message
+from app.models import Message, MessageArchive
+
+# messages is partitioned by created_at, but cursors seek by id. A message is
+# inserted right after its transaction starts (created_at is now()), so a larger
+# id never has a created_at more than a transaction's length older than a smaller
+# one. Cursor queries bound created_at by the cursor row's, widened by this much,
+# and Postgres skips partitions outside the bound.
+PARTITION_PRUNE_SLACK = timedelta(days=1)
+
+
+def _created_at_of(message_id: int):
+    return select(Message.created_at).where(Message.id == message_id).scalar_subquery()
+
+
+def _with_archive() -> type[Message]:
+    # messages UNION ALL messages_archive, mapped as Message. Filters and the
+    # ORDER BY id ... LIMIT are pushed into both branches, so each is read through
+    # its own index. Rows loaded through it are for reading only.
+    archive = MessageArchive.__table__
+    # The archive has no search_vector — the union is built from shared columns
+    columns = [c for c in Message.__table__.c if c.name in archive.c]
+    union = (
+        select(*columns)
+        .union_all(select(*(archive.c[c.name] for c in columns)))
+        .subquery("messages_with_archive")
+    )
+    return aliased(Message, union)
+
+
+# Moves (or, with archive=False, deletes) one batch of old read messages. SKIP
+# LOCKED leaves rows that a request is updating to a later run instead of
+# waiting for them; the id keyset keeps each batch a short index range scan.
+RETIRE_SQL = """
+    WITH batch AS (
+        SELECT id, created_at
+        FROM messages
+        WHERE id > :after_id AND is_read AND created_at < :cutoff
+        ORDER BY id
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    ), retired AS (
+        DELETE FROM messages m
+        USING batch
+        WHERE m.id = batch.id AND m.created_at = batch.created_at
+        RETURNING m.*
+    )
+"""
+ARCHIVE_SQL = text(
+    RETIRE_SQL
+    + """
+    INSERT INTO messages_archive
+        (id, text, sender_id, receiver_id, is_read, created_at, updated_at)
+    SELECT id, text, sender_id, receiver_id, is_read, created_at, updated_at
+    FROM retired
+    RETURNING id, sender_id, receiver_id
+    """
+)
+DELETE_SQL = text(RETIRE_SQL + "SELECT id, sender_id, receiver_id FROM retired")
+
+
+# Text search config for Message.search_vector — no stemming or stop words, so
+# it treats every language the same
+SEARCH_CONFIG = "simple"
+
+# (rank, id) of the last search hit on a page
+SearchKey = tuple[float, int]
+
+
+def _owner_lexeme(user_id: uuid.UUID) -> str:
+    # Matches the participant lexemes in the Message.search_vector expression
+    return f"u{user_id.hex}"
+
+
+def _keyset(
+    query: Query,
+    after_id: Optional[int],
+    before_id: Optional[int],
+    limit: int,
+    from_end: bool = False,
+    entity: type[Message] = Message,
+) -> list[Message]:
+    # Seek by id instead of OFFSET — cost doesn't depend on how deep the page is.
+    # `before` (and `from_end` without a cursor) walks backwards, so rows come
+    # back in descending order.
+    # A cursor row that is gone (deleted, archived) leaves the bound open
+    # (NULL -> infinity): slower, never wrong.
+    if before_id is not None or (from_end and after_id is None):
+        if before_id is not None:
+            query = query.filter(
+                entity.id < before_id,
+                entity.created_at
+                <= func.coalesce(
+                    _created_at_of(before_id) + PARTITION_PRUNE_SLACK,
+                    literal("infinity"),
+                ),
+            )
+        return query.order_by(entity.id.desc()).limit(limit).all()
+    if after_id is not None:
+        query = query.filter(
+            entity.id > after_id,
+            entity.created_at
+            >= func.coalesce(
+                _created_at_of(after_id) - PARTITION_PRUNE_SLACK,
+                literal("-infinity"),
+            ),
+        )
+    return query.order_by(entity.id).limit(limit).all()
 
 
 class MessageRepository:
@@ -15,19 +135,38 @@ class MessageRepository:
     ) -> Message:
         message = Message(text=text, sender_id=sender_id, receiver_id=receiver_id)
         self.db.add(message)
-        self.db.commit()
-        self.db.refresh(message)
+        # Flush only — MessageService commits once counters and conversations
+        # are updated in the same transaction
+        self.db.flush()
         return message
 
+    def create_many(
+        self, text: str, sender_id: uuid.UUID, receiver_ids: list[uuid.UUID]
+    ) -> list[Message]:
+        rows = [
+            {"text": text, "sender_id": sender_id, "receiver_id": receiver_id}
+            for receiver_id in receiver_ids
+        ]
+        return self.insert_rows(rows)
+
+    def insert_rows(self, rows: list[dict]) -> list[Message]:
+        # ORM bulk INSERT ... RETURNING — sent as multi-row statements. Objects come
+        # back fully loaded and in the order of `rows`, so nothing is re-read
+        stmt = insert(Message).returning(Message, sort_by_parameter_order=True)
+        return list(self.db.scalars(stmt, rows))
+
     def _inbox_query(
-        self, receiver_id: uuid.UUID, unread_only: Optional[bool]
+        self,
+        receiver_id: uuid.UUID,
+        unread_only: Optional[bool],
+        entity: type[Message] = Message,
     ) -> Query:
-        query = self.db.query(Message).filter(Message.receiver_id == receiver_id)
+        query = self.db.query(entity).filter(entity.receiver_id == receiver_id)
         if unread_only is not None:
             if unread_only:
-                query = query.filter(Message.is_read.is_(False))
+                query = query.filter(entity.is_read.is_(False))
             else:
-                query = query.filter(Message.is_read.is_(True))
+                query = query.filter(entity.is_read.is_(True))
         return query
 
     def get_inbox(
@@ -45,6 +184,24 @@ class MessageRepository:
             .all()
         )
 
+    def get_inbox_keyset(
+        self,
+        receiver_id: uuid.UUID,
+        unread_only: Optional[bool],
+        after_id: Optional[int],
+        before_id: Optional[int],
+        limit: int,
+        include_archived: bool = False,
+    ) -> list[Message]:
+        entity = _with_archive() if include_archived else Message
+        return _keyset(
+            self._inbox_query(receiver_id, unread_only, entity),
+            after_id,
+            before_id,
+            limit,
+            entity=entity,
+        )
+
     def count_inbox(self, receiver_id: uuid.UUID, unread_only: Optional[bool]) -> int:
         return self._inbox_query(receiver_id, unread_only).count()
 
@@ -60,27 +217,159 @@ class MessageRepository:
             .all()
         )
 
+    def get_outbox_keyset(
+        self,
+        sender_id: uuid.UUID,
+        after_id: Optional[int],
+        before_id: Optional[int],
+        limit: int,
+        include_archived: bool = False,
+    ) -> list[Message]:
+        entity = _with_archive() if include_archived else Message
+        query = self.db.query(entity).filter(entity.sender_id == sender_id)
+        return _keyset(query, after_id, before_id, limit, entity=entity)
+
     def count_outbox(self, sender_id: uuid.UUID) -> int:
         return self.db.query(Message).filter(Message.sender_id == sender_id).count()
 
-    def get_by_id(self, message_id: int) -> Optional[Message]:
-        return self.db.query(Message).filter(Message.id == message_id).first()
+    # for_update locks the row until commit — used before a state change that
+    # also updates counters, so two concurrent requests can't both apply it
+    def get_by_id(self, message_id: int, for_update: bool = False) -> Optional[Message]:
+        query = self.db.query(Message).filter(Message.id == message_id)
+        if for_update:
+            query = query.with_for_update()
+        return query.first()
 
     def get_by_id_and_receiver(
-        self, message_id: int, receiver_id: uuid.UUID
+        self, message_id: int, receiver_id: uuid.UUID, for_update: bool = False
     ) -> Optional[Message]:
-        return (
-            self.db.query(Message)
-            .filter(Message.id == message_id, Message.receiver_id == receiver_id)
-            .first()
+        query = self.db.query(Message).filter(
+            Message.id == message_id, Message.receiver_id == receiver_id
+        )
+        if for_update:
+            query = query.with_for_update()
+        return query.first()
+
+    def _thread_query(
+        self, user_a: uuid.UUID, user_b: uuid.UUID, entity: type[Message] = Message
+    ) -> Query:
+        # Matches ix_messages_pair_id — both directions of the conversation are
+        # one contiguous range in the index, whoever sent the message
+        low, high = sorted((user_a, user_b))
+        return self.db.query(entity).filter(
+            func.least(entity.sender_id, entity.receiver_id) == low,
+            func.greatest(entity.sender_id, entity.receiver_id) == high,
+        )
+
+    def get_thread_keyset(
+        self,
+        user_a: uuid.UUID,
+        user_b: uuid.UUID,
+        after_id: Optional[int],
+        before_id: Optional[int],
+        limit: int,
+        include_archived: bool = False,
+    ) -> list[Message]:
+        entity = _with_archive() if include_archived else Message
+        # Without a cursor a chat opens at its latest messages
+        return _keyset(
+            self._thread_query(user_a, user_b, entity),
+            after_id,
+            before_id,
+            limit,
+            from_end=True,
+            entity=entity,
+        )
+
+    def get_last_between(
+        self, user_a: uuid.UUID, user_b: uuid.UUID
+    ) -> Optional[Message]:
+        return self._thread_query(user_a, user_b).order_by(Message.id.desc()).first()
+
+    def search(
+        self,
+        user_id: uuid.UUID,
+        q: str,
+        after: Optional[SearchKey],
+        before: Optional[SearchKey],
+        limit: int,
+    ) -> list[tuple[Message, float]]:
+        """Messages sent or received by user_id that match `q`, best first.
+
+        `q` uses web search syntax ("quoted phrase", or, -word). The owner's
+        lexeme is ANDed into the tsquery, so the GIN index scan only returns
+        this user's messages; the sender/receiver filter just rechecks them.
+        Ordered by (rank, id) descending; `before` walks back towards better
+        hits, so its rows come back in ascending order.
+        """
+        text_query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+        owner = cast(literal(_owner_lexeme(user_id)), TSQUERY)
+        rank = cast(func.ts_rank(Message.search_vector, text_query), Double)
+        position = tuple_(rank, Message.id)
+        query = self.db.query(Message, rank).filter(
+            # A query without words would leave just the owner lexeme and match
+            # every message the user has
+            func.numnode(text_query) > 0,
+            Message.search_vector.op("@@")(text_query.op("&&")(owner)),
+            or_(Message.sender_id == user_id, Message.receiver_id == user_id),
         )
+        if before is not None:
+            return (
+                query.filter(position > tuple_(*before))
+                .order_by(rank, Message.id)
+                .limit(limit)
+                .all()
+            )
+        if after is not None:
+            query = query.filter(position < tuple_(*after))
+        return query.order_by(rank.desc(), Message.id.desc()).limit(limit).all()
 
     def mark_as_read(self, message: Message) -> Message:
         message.is_read = True
-        self.db.commit()
-        self.db.refresh(message)
+        self.db.flush()
         return message
 
+    def mark_many_as_read(
+        self,
+        receiver_id: uuid.UUID,
+        ids: Optional[list[int]] = None,
+        up_to_id: Optional[int] = None,
+        sender_id: Optional[uuid.UUID] = None,
+    ) -> list[tuple[int, uuid.UUID]]:
+        """Mark the receiver's unread messages as read in a single UPDATE.
+
+        Returns (id, sender_id) of every row that changed, so callers can adjust
+        counters and notify senders without re-reading the messages.
+        """
+        stmt = update(Message).where(
+            Message.receiver_id == receiver_id, Message.is_read.is_(False)
+        )
+        if ids is not None:
+            stmt = stmt.where(Message.id.in_(ids))
+        if up_to_id is not None:
+            stmt = stmt.where(Message.id <= up_to_id)
+        if sender_id is not None:
+            stmt = stmt.where(Message.sender_id == sender_id)
+        stmt = stmt.values(is_read=True).returning(Message.id, Message.sender_id)
+        # Core UPDATE — don't try to sync the change into loaded objects
+        result = self.db.execute(stmt, execution_options={"synchronize_session": False})
+        return [tuple(row) for row in result]
+
     def delete(self, message: Message) -> None:
         self.db.delete(message)
-        self.db.commit()
+        self.db.flush()
+
+    def retire_read_before(
+        self, cutoff: datetime, after_id: int, limit: int, archive: bool
+    ) -> list[tuple[int, uuid.UUID, uuid.UUID]]:
+        """Move up to `limit` read messages older than `cutoff` to the archive.
+
+        With archive=False they are deleted instead. Only ids above `after_id`
+        are considered. Returns (id, sender_id, receiver_id) of every row removed
+        from messages; the caller adjusts counters and commits.
+        """
+        result = self.db.execute(
+            ARCHIVE_SQL if archive else DELETE_SQL,
+            {"after_id": after_id, "cutoff": cutoff, "limit": limit},
+        )
+        return [tuple(row) for row in result]
@@ -0,0 +1,122 @@
+import re
+import uuid
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Monthly partitions of messages are named messages_pYYYY_MM and cover
+# [first day of the month, first day of the next month) in UTC
+PARTITION_NAME = re.compile(r"^messages_p(\d{4})_(\d{2})$")
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"messages_p{month:%Y_%m}"
+
+
+class PartitionRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def is_partitioned(self) -> bool:
+        return bool(
+            self.db.execute(
+                text("SELECT relkind = 'p' FROM pg_class WHERE relname = 'messages'")
+            ).scalar()
+        )
+
+    def list_months(self) -> dict[date, str]:
+        """Attached monthly partitions of messages, by the month they cover."""
+        names = self.db.execute(
+            text(
+                """
+                SELECT child.relname
+                FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = 'messages'
+                """
+            )
+        ).scalars()
+        months = {}
+        for name in names:
+            match = PARTITION_NAME.match(name)
+            if match:
+                months[date(int(match[1]), int(match[2]), 1)] = name
+        return months
+
+    def create(self, month: date) -> str:
+        # DDL can't take bind parameters — the name and bounds are generated here,
+        # never taken from input
+        name = partition_name(month)
+        self.db.execute(
+            text(
+                f"CREATE TABLE {name} PARTITION OF messages "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') "
+                f"TO ('{add_months(month, 1):%Y-%m-%d} 00:00:00+00')"
+            )
+        )
+        return name
+
+    def create_missing(self, first: date, last: date) -> list[str]:
+        """Create the partitions for months first..last that don't exist yet."""
+        existing = self.list_months()
+        created = []
+        month = month_start(first)
+        while month <= last:
+            if month not in existing:
+                created.append(self.create(month))
+            month = add_months(month, 1)
+        return created
+
+    def detach(self, name: str) -> None:
+        _check_name(name)
+        # The table stays in place with its rows, outside of what the app queries
+        self.db.execute(text(f"ALTER TABLE messages DETACH PARTITION {name}"))
+
+    def message_counts(self, name: str) -> list[tuple[uuid.UUID, uuid.UUID, int, int]]:
+        """(sender_id, receiver_id, messages, unread) for every pair in a partition."""
+        _check_name(name)
+        return self.db.execute(
+            text(
+                f"""
+                SELECT sender_id, receiver_id, count(*),
+                       count(*) FILTER (WHERE NOT is_read)
+                FROM {name}
+                GROUP BY sender_id, receiver_id
+                ORDER BY sender_id, receiver_id
+                """
+            )
+        ).all()
+
+    def conversations_ending_in(
+        self, name: str
+    ) -> list[tuple[uuid.UUID, uuid.UUID, int]]:
+        """(user_a, user_b, last_message_id) of every chat whose last message
+        is in a partition — once per pair, not once per side."""
+        _check_name(name)
+        return self.db.execute(
+            text(
+                f"""
+                SELECT DISTINCT least(c.user_id, c.peer_id),
+                       greatest(c.user_id, c.peer_id), c.last_message_id
+                FROM conversations c
+                WHERE c.last_message_id IN (SELECT id FROM {name})
+                """
+            )
+        ).all()
+
+
+def _check_name(name: str) -> None:
+    # Partition names end up in SQL text — only ever accept the generated form
+    if not PARTITION_NAME.match(name):
+        raise ValueError(f"Not a messages partition: {name}")
@@ -0,0 +1,76 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models import RateLimitHit
+
+# Adds a hit to the current window and reads the previous one, in one round
+# trip. Concurrent hits on a key serialize on its row, so no count is lost.
+HIT_SQL = text(
+    """
+    WITH bumped AS (
+        INSERT INTO rate_limit_hits (key, window_start, hits)
+        VALUES (:key, :window_start, 1)
+        ON CONFLICT (key, window_start) DO UPDATE
+            SET hits = rate_limit_hits.hits + 1
+        RETURNING hits
+    )
+    SELECT
+        (SELECT hits FROM bumped),
+        coalesce(
+            (
+                SELECT hits FROM rate_limit_hits
+                WHERE key = :key AND window_start = :previous_start
+            ),
+            0
+        )
+    """
+)
+
+# Hits in the current and the previous window, counting nothing
+COUNTS_SQL = text(
+    """
+    SELECT
+        coalesce(sum(hits) FILTER (WHERE window_start = :window_start), 0),
+        coalesce(sum(hits) FILTER (WHERE window_start = :previous_start), 0)
+    FROM rate_limit_hits
+    WHERE key = :key AND window_start IN (:window_start, :previous_start)
+    """
+)
+
+
+class RateLimitRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def hit(self, key: str, window_start: int, window_seconds: int) -> tuple[int, int]:
+        """Hits in the current window, this one included, and in the previous one."""
+        current, previous = self.db.execute(
+            HIT_SQL,
+            {
+                "key": key,
+                "window_start": window_start,
+                "previous_start": window_start - window_seconds,
+            },
+        ).one()
+        return current, previous
+
+    def counts(
+        self, key: str, window_start: int, window_seconds: int
+    ) -> tuple[int, int]:
+        """Hits in the current window and in the previous one."""
+        current, previous = self.db.execute(
+            COUNTS_SQL,
+            {
+                "key": key,
+                "window_start": window_start,
+                "previous_start": window_start - window_seconds,
+            },
+        ).one()
+        return current, previous
+
+    def delete_before(self, window_start: int) -> int:
+        return (
+            self.db.query(RateLimitHit)
+            .filter(RateLimitHit.window_start < window_start)
+            .delete(synchronize_session=False)
+        )
@@ -0,0 +1,139 @@
+import uuid
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app.models import User, UserMessageStats
+
+COUNTERS = ("inbox_total", "inbox_unread", "sent_total")
+
+# Reconciliation works on one batch of users at a time, in three statements of
+# one short transaction. The counter rows are locked before the counts are
+# taken: every send, read and delete updates those rows in the transaction
+# that changes messages, so once the locks are held each of them either has
+# committed (and the next statement's snapshot sees its messages) or is
+# waiting to add its delta on top of the rebuilt value. Recomputing first and
+# overwriting after would lose the increments committed during the scan.
+
+# Rows must exist to be locked; a send inserting one concurrently makes this wait
+RECONCILE_CREATE_ROWS_SQL = text(
+    """
+    INSERT INTO user_message_stats (user_id, inbox_total, inbox_unread, sent_total)
+    SELECT id, 0, 0, 0 FROM unnest(:ids) AS id
+    ON CONFLICT (user_id) DO NOTHING
+    RETURNING user_id
+    """
+).bindparams(bindparam("ids", type_=ARRAY(UUID(as_uuid=True))))
+
+# In user_id order, like apply(), so the two can't deadlock
+RECONCILE_LOCK_SQL = text(
+    """
+    SELECT user_id FROM user_message_stats
+    WHERE user_id = ANY(:ids)
+    ORDER BY user_id
+    FOR UPDATE
+    """
+).bindparams(bindparam("ids", type_=ARRAY(UUID(as_uuid=True))))
+
+# Only rows that drifted are written, so a run on a consistent table touches nothing
+RECONCILE_UPDATE_SQL = text(
+    """
+    UPDATE user_message_stats AS stats SET
+        inbox_total = counts.inbox_total,
+        inbox_unread = counts.inbox_unread,
+        sent_total = counts.sent_total,
+        updated_at = now()
+    FROM (
+        SELECT
+            u.id AS user_id,
+            coalesce(r.inbox_total, 0) AS inbox_total,
+            coalesce(r.inbox_unread, 0) AS inbox_unread,
+            coalesce(s.sent_total, 0) AS sent_total
+        FROM unnest(:ids) AS u(id)
+        LEFT JOIN (
+            SELECT
+                receiver_id,
+                count(*) AS inbox_total,
+                count(*) FILTER (WHERE NOT is_read) AS inbox_unread
+            FROM messages
+            WHERE receiver_id = ANY(:ids)
+            GROUP BY receiver_id
+        ) r ON r.receiver_id = u.id
+        LEFT JOIN (
+            SELECT sender_id, count(*) AS sent_total
+            FROM messages
+            WHERE sender_id = ANY(:ids)
+            GROUP BY sender_id
+        ) s ON s.sender_id = u.id
+    ) AS counts
+    WHERE stats.user_id = counts.user_id
+      AND (stats.inbox_total, stats.inbox_unread, stats.sent_total)
+          IS DISTINCT FROM (counts.inbox_total, counts.inbox_unread, counts.sent_total)
+    RETURNING stats.user_id
+    """
+).bindparams(bindparam("ids", type_=ARRAY(UUID(as_uuid=True))))
+
+
+class StatsRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, user_id: uuid.UUID) -> Optional[UserMessageStats]:
+        return (
+            self.db.query(UserMessageStats)
+            .filter(UserMessageStats.user_id == user_id)
+            .first()
+        )
+
+    def apply(self, deltas: dict[uuid.UUID, Counter]) -> None:
+        """Add counter deltas in the current transaction — the caller commits.
+
+        Rows are upserted in user_id order, so concurrent transactions touching
+        the same users always lock them in the same order and can't deadlock.
+        """
+        rows = [
+            {"user_id": user_id, **{name: delta[name] for name in COUNTERS}}
+            for user_id, delta in sorted(deltas.items())
+            if any(delta[name] for name in COUNTERS)
+        ]
+        if not rows:
+            return
+        table = UserMessageStats.__table__
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={
+                **{name: table.c[name] + stmt.excluded[name] for name in COUNTERS},
+                "updated_at": func.now(),
+            },
+        )
+        # Executemany on the Core table: compiled once and cached, sent as
+        # multi-row VALUES pages in the same order
+        self.db.execute(stmt, rows)
+
+    def reconcile_batch(
+        self, after_id: Optional[uuid.UUID], limit: int
+    ) -> tuple[int, Optional[uuid.UUID]]:
+        """Rebuild the counters of the next `limit` users after `after_id`.
+
+        One short transaction, committed here. Returns how many users' counters
+        were created or changed and the id to continue after; None when no
+        users are left.
+        """
+        query = self.db.query(User.id)
+        if after_id is not None:
+            query = query.filter(User.id > after_id)
+        ids = [user_id for (user_id,) in query.order_by(User.id).limit(limit)]
+        if not ids:
+            self.db.commit()
+            return 0, None
+        created = self.db.execute(RECONCILE_CREATE_ROWS_SQL, {"ids": ids}).scalars()
+        fixed = set(created)
+        self.db.execute(RECONCILE_LOCK_SQL, {"ids": ids})
+        fixed.update(self.db.execute(RECONCILE_UPDATE_SQL, {"ids": ids}).scalars())
+        self.db.commit()
+        return len(fixed), ids[-1]
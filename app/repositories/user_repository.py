@@ -1,11 +1,71 @@
+import re
 import uuid
+from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, or_, exists
+from sqlalchemy import (
+    Select,
+    any_,
+    bindparam,
+    case,
+    exists,
+    func,
+    literal,
+    or_,
+    select,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, Query
 
 from app.models import User
 
+# Hex digits a search must start with before it is also tried as a user id —
+# shorter strings are more likely part of a username
+UUID_PREFIX_MIN_DIGITS = 8
+
+_HEX_DIGITS = re.compile(r"[0-9a-f]{1,32}")
+
+
+def uuid_prefix_range(q: str) -> Optional[tuple[uuid.UUID, uuid.UUID]]:
+    """Lowest and highest UUID that start with `q`, or None if `q` can't be one.
+
+    Postgres orders uuid values byte by byte, the same as their hex digits, so
+    every id starting with `q` lies in this range and the primary key index can
+    seek to it. Dashes are optional but must sit where a UUID has them.
+    """
+    q = q.lower()
+    digits = q.replace("-", "")
+    if len(digits) < UUID_PREFIX_MIN_DIGITS or not _HEX_DIGITS.fullmatch(digits):
+        return None
+    low = uuid.UUID(digits.ljust(32, "0"))
+    if "-" in q and not str(low).startswith(q):
+        return None
+    return low, uuid.UUID(digits.ljust(32, "f"))
+
+
+def _escape_like(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _search_condition(q: str):
+    # Served by the trigram index on username (needs at least 3 characters
+    # to narrow anything down)
+    match = User.username.ilike(f"%{_escape_like(q)}%", escape="\\")
+    id_range = uuid_prefix_range(q)
+    if id_range is not None:
+        match = or_(match, User.id.between(*id_range))
+    return User.is_active.is_(True), match
+
+
+def _search_rank(q: str):
+    rank = func.similarity(User.username, literal(q))
+    id_range = uuid_prefix_range(q)
+    if id_range is not None:
+        # An id match is what the caller was looking for
+        rank = case((User.id.between(*id_range), 1.0), else_=rank)
+    return rank
+
 
 class UserRepository:
     def __init__(self, db: Session):
@@ -29,6 +89,14 @@ class UserRepository:
             .first()
         )
 
+    def get_active_ids(self, user_ids: list[uuid.UUID]) -> set[uuid.UUID]:
+        # = ANY(array) — one bind parameter and one plan whatever the list size
+        ids = bindparam("ids", user_ids, type_=ARRAY(UUID(as_uuid=True)))
+        rows = self.db.query(User.id).filter(
+            User.id == any_(ids), User.is_active.is_(True)
+        )
+        return {user_id for (user_id,) in rows}
+
     def exists_by_username(
         self, username: str, exclude_user_id: uuid.UUID | None = None
     ) -> bool:
@@ -46,25 +114,171 @@ class UserRepository:
 
     def update_username(self, user: User, username: str) -> User:
         user.username = username
+        # Tokens carry the old username — stop trusting them as they are
+        user.token_version = User.token_version + 1
         self.db.commit()
         self.db.refresh(user)
         return user
 
     def deactivate(self, user: User) -> None:
         user.is_active = False
+        user.token_version = User.token_version + 1
         self.db.commit()
 
+    def update_password_hash(self, user: User, password_hash: str) -> None:
+        user.password_hash = password_hash
+        self.db.commit()
+        # The token is issued from this user on the event loop — reload what
+        # commit expired here, in the threadpool, not with a lazy load there
+        self.db.refresh(user)
+
     def _search_query(self, q: str) -> Query:
-        return self.db.query(User).filter(
-            User.is_active.is_(True),
-            or_(
-                User.username.ilike(f"%{q}%"),
-                User.id.cast(String).ilike(f"%{q}%"),
-            ),
-        )
+        return self.db.query(User).filter(*_search_condition(q))
 
-    def search(self, q: str, offset: int, limit: int) -> list[User]:
-        return self._search_query(q).offset(offset).limit(limit).all()
+    def search(self, q: str, offset: int, limit: int) -> tuple[list[User], int]:
+        """One page of matches, best first, and the total number of matches.
+
+        The total comes from count(*) OVER () in the same query, so the
+        matches are found once instead of again for a separate count.
+        """
+        rows = (
+            self._search_query(q)
+            .add_columns(func.count().over())
+            .order_by(_search_rank(q).desc(), User.username)
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+        if rows:
+            return [user for user, _ in rows], rows[0][1]
+        # Past the last page there is no row to carry the total
+        return [], self.count_search(q) if offset else 0
 
     def count_search(self, q: str) -> int:
         return self._search_query(q).count()
+
+    def autocomplete(self, prefix: str, limit: int) -> list[tuple[uuid.UUID, str]]:
+        rows = (
+            self.db.query(User.id, User.username)
+            .filter(
+                User.is_active.is_(True),
+                User.username.like(f"{_escape_like(prefix)}%", escape="\\"),
+            )
+            .order_by(User.username)
+            .limit(limit)
+        )
+        return [(user_id, username) for user_id, username in rows]
+
+    def list_token_versions_since(
+        self, since: datetime
+    ) -> tuple[list[tuple[uuid.UUID, int, datetime]], datetime]:
+        """Users with a bumped token version changed after `since`, and the
+        database time the list is complete up to: now(), the start of this
+        transaction, from the same clock that sets updated_at.
+        """
+        as_of = self.db.query(func.now()).scalar()
+        rows = self.db.query(User.id, User.token_version, User.updated_at).filter(
+            User.updated_at > since, User.token_version > 0
+        )
+        return [
+            (user_id, version, updated_at) for user_id, version, updated_at in rows
+        ], as_of
+
+    def list_active_usernames(self, limit: int) -> list[tuple[str, uuid.UUID]]:
+        rows = (
+            self.db.query(User.username, User.id)
+            .filter(User.is_active.is_(True))
+            .limit(limit)
+        )
+        return [(username, user_id) for username, user_id in rows]
+
+
+class AsyncUserRepository:
+    """UserRepository for AsyncSession — same queries, awaited on asyncpg."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_by_username(self, username: str) -> Optional[User]:
+        return await self.db.scalar(
+            select(User).where(User.username == username, User.is_active.is_(True))
+        )
+
+    async def get_by_id(self, user_id: uuid.UUID) -> Optional[User]:
+        return await self.db.get(User, user_id)
+
+    async def get_active_by_id(self, user_id: uuid.UUID) -> Optional[User]:
+        return await self.db.scalar(
+            select(User).where(User.id == user_id, User.is_active.is_(True))
+        )
+
+    async def exists_by_username(
+        self, username: str, exclude_user_id: uuid.UUID | None = None
+    ) -> bool:
+        condition = User.username == username
+        if exclude_user_id is not None:
+            condition = condition & (User.id != exclude_user_id)
+        return await self.db.scalar(select(exists().where(condition)))
+
+    async def create(self, username: str, password_hash: str) -> User:
+        user = User(username=username, password_hash=password_hash)
+        self.db.add(user)
+        await self.db.commit()
+        await self.db.refresh(user)
+        return user
+
+    async def update_username(self, user: User, username: str) -> User:
+        user.username = username
+        # Tokens carry the old username — stop trusting them as they are
+        user.token_version = User.token_version + 1
+        await self.db.commit()
+        await self.db.refresh(user)
+        return user
+
+    async def deactivate(self, user: User) -> None:
+        user.is_active = False
+        user.token_version = User.token_version + 1
+        await self.db.commit()
+        # Loads the new token_version — lazy loading doesn't work on AsyncSession
+        await self.db.refresh(user)
+
+    async def update_password_hash(self, user: User, password_hash: str) -> None:
+        user.password_hash = password_hash
+        await self.db.commit()
+        # The token is issued from this user — reload what commit expired
+        await self.db.refresh(user)
+
+    def _search_query(self, q: str) -> Select:
+        return select(User).where(*_search_condition(q))
+
+    async def search(self, q: str, offset: int, limit: int) -> tuple[list[User], int]:
+        result = await self.db.execute(
+            self._search_query(q)
+            .add_columns(func.count().over())
+            .order_by(_search_rank(q).desc(), User.username)
+            .offset(offset)
+            .limit(limit)
+        )
+        rows = result.all()
+        if rows:
+            return [user for user, _ in rows], rows[0][1]
+        return [], await self.count_search(q) if offset else 0
+
+    async def autocomplete(
+        self, prefix: str, limit: int
+    ) -> list[tuple[uuid.UUID, str]]:
+        result = await self.db.execute(
+            select(User.id, User.username)
+            .where(
+                User.is_active.is_(True),
+                User.username.like(f"{_escape_like(prefix)}%", escape="\\"),
+            )
+            .order_by(User.username)
+            .limit(limit)
+        )
+        return [(user_id, username) for user_id, username in result]
+
+    async def count_search(self, q: str) -> int:
+        return await self.db.scalar(
+            select(func.count()).select_from(User).where(*_search_condition(q))
+        )
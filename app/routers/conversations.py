@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends, Query
+
+from app.dependencies import get_conversation_service, get_current_user
+from app.schemas import ConversationResponse, CursorPage, UserResponse
+from app.services.conversation_service import ConversationService
+from app.utils.pagination import CursorParams
+
+router = APIRouter(prefix="/conversations", tags=["conversations"])
+
+
+# Most recent activity first; `after` pages towards older conversations
+@router.get("/", response_model=CursorPage[ConversationResponse])
+def list_conversations(
+    cursor: CursorParams = Depends(CursorParams),
+    size: int = Query(default=20, ge=1, le=100, description="Items per page"),
+    service: ConversationService = Depends(get_conversation_service),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    return service.list(current_user.id, cursor.after, cursor.before, size)
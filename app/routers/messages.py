@@ -1,11 +1,30 @@
+import uuid
 from typing import Optional
 
 from fastapi import APIRouter, Depends, Query
 
-from app.dependencies import get_current_user, get_message_service
-from app.schemas import MessageCreate, MessageResponse, UserResponse, PaginatedResponse
+from app.dependencies import (
+    get_current_user,
+    get_current_user_detached,
+    get_message_service,
+)
+from app.realtime.waiter import wait_for_inbox
+from app.schemas import (
+    BulkReadResponse,
+    CursorPage,
+    MessageBatchCreate,
+    MessageBatchResponse,
+    MessageBulkRead,
+    MessageCreate,
+    MessageResponse,
+    MessageSearchHit,
+    UnreadCountResponse,
+    UserResponse,
+    PaginatedResponse,
+)
 from app.services.message_service import MessageService
-from app.utils.pagination import PaginationParams
+from app.services.rate_limiter import limit_sends
+from app.utils.pagination import CursorParams, PaginationParams
 
 router = APIRouter(prefix="/messages", tags=["messages"])
 
@@ -16,32 +35,141 @@ def create_message(
     service: MessageService = Depends(get_message_service),
     current_user: UserResponse = Depends(get_current_user),
 ):
+    limit_sends(current_user.id)
     return service.create(data, current_user.id)
 
 
-@router.get("/inbox", response_model=PaginatedResponse[MessageResponse])
+# One text to many receivers in a single transaction
+@router.post("/batch", response_model=MessageBatchResponse, status_code=201)
+def create_message_batch(
+    data: MessageBatchCreate,
+    service: MessageService = Depends(get_message_service),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    limit_sends(current_user.id, batch=True)
+    return service.create_batch(data, current_user.id)
+
+
+# Passing `after` or `before` switches to cursor mode: no count query and no OFFSET,
+# so every page costs the same. Page mode responses carry cursors to switch over.
+@router.get(
+    "/inbox",
+    response_model=PaginatedResponse[MessageResponse] | CursorPage[MessageResponse],
+)
 def get_inbox(
     pagination: PaginationParams = Depends(PaginationParams),
+    cursor: CursorParams = Depends(CursorParams),
     unread_only: Optional[bool] = Query(
         default=None, description="true — unread only, false — read only, omit — all"
     ),
+    include_archived: bool = Query(
+        default=False, description="Also return archived messages (cursor mode)"
+    ),
     service: MessageService = Depends(get_message_service),
     current_user: UserResponse = Depends(get_current_user),
 ):
+    # The archive is only read in cursor mode — page mode totals come from
+    # counters that cover messages alone
+    if cursor.active or include_archived:
+        return service.get_inbox_cursor(
+            current_user.id,
+            unread_only,
+            cursor.after,
+            cursor.before,
+            pagination.size,
+            include_archived,
+        )
     return service.get_inbox(
         current_user.id, unread_only, pagination.page, pagination.size
     )
 
 
-@router.get("/outbox", response_model=PaginatedResponse[MessageResponse])
+# Long poll for clients that can't keep a WebSocket open. Returns at once if
+# there are messages after `after_id`, otherwise waits for one or the timeout.
+@router.get("/inbox/wait", response_model=list[MessageResponse])
+async def wait_inbox(
+    after_id: int = Query(ge=0, description="Return messages with a greater id"),
+    timeout: int = Query(default=30, ge=0, le=60, description="Seconds to wait"),
+    size: int = Query(default=20, ge=1, le=100, description="Max items"),
+    current_user: UserResponse = Depends(get_current_user_detached),
+):
+    return await wait_for_inbox(current_user.id, after_id, size, timeout)
+
+
+@router.get(
+    "/outbox",
+    response_model=PaginatedResponse[MessageResponse] | CursorPage[MessageResponse],
+)
 def get_outbox(
     pagination: PaginationParams = Depends(PaginationParams),
+    cursor: CursorParams = Depends(CursorParams),
+    include_archived: bool = Query(
+        default=False, description="Also return archived messages (cursor mode)"
+    ),
     service: MessageService = Depends(get_message_service),
     current_user: UserResponse = Depends(get_current_user),
 ):
+    if cursor.active or include_archived:
+        return service.get_outbox_cursor(
+            current_user.id,
+            cursor.after,
+            cursor.before,
+            pagination.size,
+            include_archived,
+        )
     return service.get_outbox(current_user.id, pagination.page, pagination.size)
 
 
+# Both directions of a two-party chat, oldest to newest within a page. Without a
+# cursor it returns the latest messages; `before` pages back through history.
+@router.get("/with/{user_id}", response_model=CursorPage[MessageResponse])
+def get_thread(
+    user_id: uuid.UUID,
+    cursor: CursorParams = Depends(CursorParams),
+    size: int = Query(default=20, ge=1, le=100, description="Items per page"),
+    include_archived: bool = Query(
+        default=False, description="Also return archived messages (cursor mode)"
+    ),
+    service: MessageService = Depends(get_message_service),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    return service.get_thread(
+        current_user.id, user_id, cursor.after, cursor.before, size, include_archived
+    )
+
+
+# Full-text search over the caller's inbox and outbox, best matches first.
+# Always cursor-paginated: `after` is the next page, `before` the previous one.
+@router.get("/search", response_model=CursorPage[MessageSearchHit])
+def search_messages(
+    q: str = Query(min_length=1, max_length=200, description="Search query"),
+    cursor: CursorParams = Depends(CursorParams),
+    size: int = Query(default=20, ge=1, le=100, description="Items per page"),
+    service: MessageService = Depends(get_message_service),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    return service.search(current_user.id, q, cursor.after, cursor.before, size)
+
+
+# Cheap enough to poll for a badge — one primary key lookup, no count(*)
+@router.get("/unread-count", response_model=UnreadCountResponse)
+def get_unread_count(
+    service: MessageService = Depends(get_message_service),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    return UnreadCountResponse(unread=service.get_unread_count(current_user.id))
+
+
+# One UPDATE for many messages — opening a chat shouldn't cost a request per message
+@router.post("/read", response_model=BulkReadResponse)
+def read_messages(
+    data: MessageBulkRead,
+    service: MessageService = Depends(get_message_service),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    return BulkReadResponse(updated=service.read_many(current_user.id, data))
+
+
 @router.post("/{message_id}/read", response_model=MessageResponse)
 def read_message(
     message_id: int,
@@ -0,0 +1,178 @@
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from app.dependencies import get_async_message_service, get_current_user_async
+from app.routers.messages import wait_inbox
+from app.schemas import (
+    BulkReadResponse,
+    CursorPage,
+    MessageBatchCreate,
+    MessageBatchResponse,
+    MessageBulkRead,
+    MessageCreate,
+    MessageResponse,
+    MessageSearchHit,
+    UnreadCountResponse,
+    UserResponse,
+    PaginatedResponse,
+)
+from app.services.message_service import AsyncMessageService
+from app.services.rate_limiter import limit_sends_async
+from app.utils.pagination import CursorParams, PaginationParams
+
+# Same routes as app.routers.messages on the async stack — mounted instead of it
+# when ASYNC_DB is on
+router = APIRouter(prefix="/messages", tags=["messages"])
+
+
+@router.post("/", response_model=MessageResponse, status_code=201)
+async def create_message(
+    data: MessageCreate,
+    service: AsyncMessageService = Depends(get_async_message_service),
+    current_user: UserResponse = Depends(get_current_user_async),
+):
+    await limit_sends_async(current_user.id)
+    return await service.create(data, current_user.id)
+
+
+# One text to many receivers in a single transaction
+@router.post("/batch", response_model=MessageBatchResponse, status_code=201)
+async def create_message_batch(
+    data: MessageBatchCreate,
+    service: AsyncMessageService = Depends(get_async_message_service),
+    current_user: UserResponse = Depends(get_current_user_async),
+):
+    await limit_sends_async(current_user.id, batch=True)
+    return await service.create_batch(data, current_user.id)
+
+
+# Passing `after` or `before` switches to cursor mode: no count query and no OFFSET,
+# so every page costs the same. Page mode responses carry cursors to switch over.
+@router.get(
+    "/inbox",
+    response_model=PaginatedResponse[MessageResponse] | CursorPage[MessageResponse],
+)
+async def get_inbox(
+    pagination: PaginationParams = Depends(PaginationParams),
+    cursor: CursorParams = Depends(CursorParams),
+    unread_only: Optional[bool] = Query(
+        default=None, description="true — unread only, false — read only, omit — all"
+    ),
+    include_archived: bool = Query(
+        default=False, description="Also return archived messages (cursor mode)"
+    ),
+    service: AsyncMessageService = Depends(get_async_message_service),
+    current_user: UserResponse = Depends(get_current_user_async),
+):
+    # The archive is only read in cursor mode — page mode totals come from
+    # counters that cover messages alone
+    if cursor.active or include_archived:
+        return await service.get_inbox_cursor(
+            current_user.id,
+            unread_only,
+            cursor.after,
+            cursor.before,
+            pagination.size,
+            include_archived,
+        )
+    return await service.get_inbox(
+        current_user.id, unread_only, pagination.page, pagination.size
+    )
+
+
+# Already async and off the request session — shared with the sync router
+router.get("/inbox/wait", response_model=list[MessageResponse])(wait_inbox)
+
+
+@router.get(
+    "/outbox",
+    response_model=PaginatedResponse[MessageResponse] | CursorPage[MessageResponse],
+)
+async def get_outbox(
+    pagination: PaginationParams = Depends(PaginationParams),
+    cursor: CursorParams = Depends(CursorParams),
+    include_archived: bool = Query(
+        default=False, description="Also return archived messages (cursor mode)"
+    ),
+    service: AsyncMessageService = Depends(get_async_message_service),
+    current_user: UserResponse = Depends(get_current_user_async),
+):
+    if cursor.active or include_archived:
+        return await service.get_outbox_cursor(
+            current_user.id,
+            cursor.after,
+            cursor.before,
+            pagination.size,
+            include_archived,
+        )
+    return await service.get_outbox(current_user.id, pagination.page, pagination.size)
+
+
+# Both directions of a two-party chat, oldest to newest within a page. Without a
+# cursor it returns the latest messages; `before` pages back through history.
+@router.get("/with/{user_id}", response_model=CursorPage[MessageResponse])
+async def get_thread(
+    user_id: uuid.UUID,
+    cursor: CursorParams = Depends(CursorParams),
+    size: int = Query(default=20, ge=1, le=100, description="Items per page"),
+    include_archived: bool = Query(
+        default=False, description="Also return archived messages (cursor mode)"
+    ),
+    service: AsyncMessageService = Depends(get_async_message_service),
+    current_user: UserResponse = Depends(get_current_user_async),
+):
+    return await service.get_thread(
+        current_user.id, user_id, cursor.after, cursor.before, size, include_archived
+    )
+
+
+# Full-text search over the caller's inbox and outbox, best matches first.
+# Always cursor-paginated: `after` is the next page, `before` the previous one.
+@router.get("/search", response_model=CursorPage[MessageSearchHit])
+async def search_messages(
+    q: str = Query(min_length=1, max_length=200, description="Search query"),
+    cursor: CursorParams = Depends(CursorParams),
+    size: int = Query(default=20, ge=1, le=100, description="Items per page"),
+    service: AsyncMessageService = Depends(get_async_message_service),
+    current_user: UserResponse = Depends(get_current_user_async),
+):
+    return await service.search(current_user.id, q, cursor.after, cursor.before, size)
+
+
+# Cheap enough to poll for a badge — one primary key lookup, no count(*)
+@router.get("/unread-count", response_model=UnreadCountResponse)
+async def get_unread_count(
+    service: AsyncMessageService = Depends(get_async_message_service),
+    current_user: UserResponse = Depends(get_current_user_async),
+):
+    return UnreadCountResponse(unread=await service.get_unread_count(current_user.id))
+
+
+# One UPDATE for many messages — opening a chat shouldn't cost a request per message
+@router.post("/read", response_model=BulkReadResponse)
+async def read_messages(
+    data: MessageBulkRead,
+    service: AsyncMessageService = Depends(get_async_message_service),
+    current_user: UserResponse = Depends(get_current_user_async),
+):
+    return BulkReadResponse(updated=await service.read_many(current_user.id, data))
+
+
+@router.post("/{message_id}/read", response_model=MessageResponse)
+async def read_message(
+    message_id: int,
+    service: AsyncMessageService = Depends(get_async_message_service),
+    current_user: UserResponse = Depends(get_current_user_async),
+):
+    return await service.read_message(message_id, current_user.id)
+
+
+@router.delete("/{message_id}", status_code=204)
+async def delete_message(
+    message_id: int,
+    service: AsyncMessageService = Depends(get_async_message_service),
+    current_user: UserResponse = Depends(get_current_user_async),
+):
+    await service.delete(message_id, current_user.id)
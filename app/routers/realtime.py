@@ -0,0 +1,56 @@
+from typing import Awaitable, Callable, Optional
+
+import anyio
+from fastapi import APIRouter, Depends, WebSocket, status
+
+from app.config import settings
+from app.dependencies import get_websocket_user
+from app.realtime.hub import Subscription, hub
+from app.schemas import UserResponse
+
+router = APIRouter(tags=["realtime"])
+
+
+async def _send_events(websocket: WebSocket, subscription: Subscription) -> None:
+    while True:
+        event = await subscription.queue.get()
+        if event is None:
+            # Queue overflowed — the client has to resync over REST anyway
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return
+        await websocket.send_json(
+            {key: value for key, value in event.items() if key != "user_ids"}
+        )
+
+
+async def _wait_for_disconnect(websocket: WebSocket) -> None:
+    # Clients have nothing to send yet — reading is how a disconnect shows up
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+# Pushes message.created, messages.read and message.deleted events for the user
+@router.websocket("/ws")
+async def websocket_events(
+    websocket: WebSocket,
+    current_user: Optional[UserResponse] = Depends(get_websocket_user),
+):
+    if current_user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscription = hub.subscribe(current_user.id, settings.REALTIME_QUEUE_SIZE)
+    try:
+        async with anyio.create_task_group() as task_group:
+            # Whichever side finishes first ends the session
+            async def run(func: Callable[..., Awaitable[None]], *args) -> None:
+                await func(*args)
+                task_group.cancel_scope.cancel()
+
+            task_group.start_soon(run, _send_events, websocket, subscription)
+            task_group.start_soon(run, _wait_for_disconnect, websocket)
+    finally:
+        hub.unsubscribe(subscription)
@@ -1,14 +1,17 @@
 from fastapi import APIRouter, Depends, Query
 
-from app.dependencies import get_current_user, get_user_service
+from app.dependencies import get_client_ip, get_current_user, get_user_service
+from app.exceptions import UnauthorizedError
 from app.schemas import (
     AuthResponse,
     LoginRequest,
     UserCreate,
     UserResponse,
+    UserSuggestion,
     UserUpdate,
     PaginatedResponse,
 )
+from app.services.rate_limiter import limit_login, note_failed_login
 from app.services.user_service import UserService
 from app.utils.pagination import PaginationParams
 
@@ -16,13 +19,22 @@ router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.post("/register", response_model=AuthResponse, status_code=201)
-def register(data: UserCreate, service: UserService = Depends(get_user_service)):
-    return service.register(data)
+async def register(data: UserCreate, service: UserService = Depends(get_user_service)):
+    return await service.register(data)
 
 
 @router.post("/login", response_model=AuthResponse)
-def login(data: LoginRequest, service: UserService = Depends(get_user_service)):
-    return service.login(data.username, data.password)
+async def login(
+    data: LoginRequest,
+    service: UserService = Depends(get_user_service),
+    client_ip: str = Depends(get_client_ip),
+):
+    await limit_login(client_ip, data.username)
+    try:
+        return await service.login(data.username, data.password)
+    except UnauthorizedError:
+        await note_failed_login(data.username)
+        raise
 
 
 @router.get("/me", response_model=UserResponse)
@@ -32,7 +44,9 @@ def get_me(current_user: UserResponse = Depends(get_current_user)):
 
 @router.get("/search", response_model=PaginatedResponse[UserResponse])
 def search_users(
-    q: str = Query(min_length=1, description="Username (partial match) or user ID"),
+    q: str = Query(
+        min_length=1, description="Username (partial match) or user ID prefix"
+    ),
     pagination: PaginationParams = Depends(PaginationParams),
     service: UserService = Depends(get_user_service),
     _current_user: UserResponse = Depends(get_current_user),
@@ -40,6 +54,16 @@ def search_users(
     return service.search(q, pagination.page, pagination.size)
 
 
+@router.get("/autocomplete", response_model=list[UserSuggestion])
+def autocomplete_users(
+    prefix: str = Query(min_length=1, max_length=50),
+    limit: int = Query(10, ge=1, le=50),
+    service: UserService = Depends(get_user_service),
+    _current_user: UserResponse = Depends(get_current_user),
+):
+    return service.autocomplete(prefix, limit)
+
+
 @router.patch("/me", response_model=UserResponse)
 def update_me(
     data: UserUpdate,
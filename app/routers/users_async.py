@@ -0,0 +1,89 @@
+from fastapi import APIRouter, Depends, Query
+
+from app.dependencies import (
+    get_async_user_service,
+    get_client_ip,
+    get_current_user_async,
+)
+from app.exceptions import UnauthorizedError
+from app.schemas import (
+    AuthResponse,
+    LoginRequest,
+    UserCreate,
+    UserResponse,
+    UserSuggestion,
+    UserUpdate,
+    PaginatedResponse,
+)
+from app.services.rate_limiter import limit_login, note_failed_login
+from app.services.user_service import AsyncUserService
+from app.utils.pagination import PaginationParams
+
+# Same routes as app.routers.users on the async stack — mounted instead of it
+# when ASYNC_DB is on
+router = APIRouter(prefix="/users", tags=["users"])
+
+
+@router.post("/register", response_model=AuthResponse, status_code=201)
+async def register(
+    data: UserCreate, service: AsyncUserService = Depends(get_async_user_service)
+):
+    return await service.register(data)
+
+
+@router.post("/login", response_model=AuthResponse)
+async def login(
+    data: LoginRequest,
+    service: AsyncUserService = Depends(get_async_user_service),
+    client_ip: str = Depends(get_client_ip),
+):
+    await limit_login(client_ip, data.username)
+    try:
+        return await service.login(data.username, data.password)
+    except UnauthorizedError:
+        await note_failed_login(data.username)
+        raise
+
+
+@router.get("/me", response_model=UserResponse)
+async def get_me(current_user: UserResponse = Depends(get_current_user_async)):
+    return current_user
+
+
+@router.get("/search", response_model=PaginatedResponse[UserResponse])
+async def search_users(
+    q: str = Query(
+        min_length=1, description="Username (partial match) or user ID prefix"
+    ),
+    pagination: PaginationParams = Depends(PaginationParams),
+    service: AsyncUserService = Depends(get_async_user_service),
+    _current_user: UserResponse = Depends(get_current_user_async),
+):
+    return await service.search(q, pagination.page, pagination.size)
+
+
+@router.get("/autocomplete", response_model=list[UserSuggestion])
+async def autocomplete_users(
+    prefix: str = Query(min_length=1, max_length=50),
+    limit: int = Query(10, ge=1, le=50),
+    service: AsyncUserService = Depends(get_async_user_service),
+    _current_user: UserResponse = Depends(get_current_user_async),
+):
+    return await service.autocomplete(prefix, limit)
+
+
+@router.patch("/me", response_model=UserResponse)
+async def update_me(
+    data: UserUpdate,
+    service: AsyncUserService = Depends(get_async_user_service),
+    current_user: UserResponse = Depends(get_current_user_async),
+):
+    return await service.update_me(current_user.id, data)
+
+
+@router.delete("/me", status_code=204)
+async def deactivate_me(
+    service: AsyncUserService = Depends(get_async_user_service),
+    current_user: UserResponse = Depends(get_current_user_async),
+):
+    await service.deactivate_me(current_user.id)
@@ -1,8 +1,8 @@
 import uuid
 from datetime import datetime
-from typing import Generic, TypeVar
+from typing import Generic, Optional, TypeVar
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 
 # --- User ---
@@ -38,6 +38,11 @@ class UserResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class UserSuggestion(BaseModel):
+    id: uuid.UUID
+    username: str
+
+
 # --- Auth ---
 
 
@@ -74,6 +79,58 @@ class MessageResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class MessageSearchHit(MessageResponse):
+    # ts_rank of the match — higher is better; results are sorted by it
+    rank: float
+
+
+class MessageBatchCreate(BaseModel):
+    text: str = Field(min_length=1, max_length=4096)
+    receiver_ids: list[uuid.UUID] = Field(min_length=1, max_length=1000)
+
+
+# Receivers that don't exist or are inactive are reported, not fatal
+class MessageBatchResponse(BaseModel):
+    items: list[MessageResponse]
+    rejected: list[uuid.UUID]
+
+
+# Either an explicit id list or a watermark — "everything up to this id"
+class MessageBulkRead(BaseModel):
+    ids: Optional[list[int]] = Field(default=None, min_length=1, max_length=1000)
+    up_to_id: Optional[int] = Field(default=None, ge=1)
+    sender_id: Optional[uuid.UUID] = None
+
+    @model_validator(mode="after")
+    def ids_or_watermark(self):
+        if (self.ids is None) == (self.up_to_id is None):
+            raise ValueError("Provide either ids or up_to_id")
+        return self
+
+
+class BulkReadResponse(BaseModel):
+    updated: int
+
+
+class UnreadCountResponse(BaseModel):
+    unread: int
+
+
+# --- Conversation ---
+
+
+class ConversationResponse(BaseModel):
+    peer_id: uuid.UUID
+    peer_username: str
+    last_message_id: int
+    last_message_preview: str
+    last_message_at: datetime
+    last_sender_id: uuid.UUID
+    unread_count: int
+
+    model_config = {"from_attributes": True}
+
+
 # --- Pagination ---
 
 
@@ -86,6 +143,18 @@ class PaginatedResponse(BaseModel, Generic[T]):
     page: int
     size: int
     pages: int
+    # Filled by endpoints that also support cursor mode, so clients can switch
+    # from page/size to after/before without an extra request
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+# Cursor mode skips the count query, so there is no total/pages
+class CursorPage(BaseModel, Generic[T]):
+    items: list[T]
+    size: int
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 
 # --- HC ---
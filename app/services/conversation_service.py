@@ -0,0 +1,47 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.exceptions import BadRequestError
+from app.repositories.conversation_repository import (
+    ConversationKey,
+    ConversationRepository,
+)
+from app.schemas import CursorPage
+from app.utils.pagination import build_cursor_page, decode_cursor
+
+
+def _decode_key(cursor: Optional[str]) -> Optional[ConversationKey]:
+    if cursor is None:
+        return None
+    values = decode_cursor(cursor)
+    try:
+        last_message_at, peer_id = values
+        return datetime.fromisoformat(last_message_at), uuid.UUID(peer_id)
+    except (TypeError, ValueError):
+        raise BadRequestError("Invalid cursor")
+
+
+class ConversationService:
+    def __init__(self, db: Session):
+        self.repo = ConversationRepository(db)
+
+    def list(
+        self,
+        user_id: uuid.UUID,
+        after: Optional[str],
+        before: Optional[str],
+        size: int,
+    ) -> CursorPage:
+        rows = self.repo.list_keyset(
+            user_id, _decode_key(after), _decode_key(before), size + 1
+        )
+        return build_cursor_page(
+            rows,
+            size,
+            after,
+            before,
+            key=lambda c: (c.last_message_at.isoformat(), str(c.peer_id)),
+        )
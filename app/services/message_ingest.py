@@ -0,0 +1,128 @@
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from app.config import settings
+from app.db import SessionLocal
+from app.exceptions import ServiceUnavailableError
+from app.logger import get_logger
+from app.services.message_service import MessageService
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class QueuedSend:
+    row: dict
+    future: Future
+
+
+# Put on the queue by stop() — everything queued before it is still written
+_STOP = object()
+
+
+class MessageIngest:
+    """Write-behind queue for single sends with group commit.
+
+    Requests queue their send and wait on a future. One writer thread takes
+    whatever has accumulated (up to max_batch, waiting at most max_delay for
+    more) and writes it with MessageService.create_queued: one multi-row INSERT
+    and one commit for the whole batch. Futures resolve only after that commit,
+    so callers still get the assigned id.
+
+    A full queue rejects new sends with ServiceUnavailableError instead of
+    blocking, which is safe to raise from the event loop as well.
+    """
+
+    def __init__(self, queue_size: int, max_batch: int, max_delay: float):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        # Guards `_accepting` so no send lands on the queue after _STOP
+        self._lock = threading.Lock()
+        self._accepting = False
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._accepting = True
+        self._thread = threading.Thread(
+            target=self._run, name="message-ingest", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop taking sends and block until everything queued is written."""
+        with self._lock:
+            if not self._accepting:
+                return
+            self._accepting = False
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def submit(self, text: str, sender_id: uuid.UUID, receiver_id: uuid.UUID) -> Future:
+        future = Future()
+        row = {"text": text, "sender_id": sender_id, "receiver_id": receiver_id}
+        with self._lock:
+            if not self._accepting:
+                raise ServiceUnavailableError("Server is shutting down, retry shortly")
+            try:
+                self._queue.put_nowait(QueuedSend(row, future))
+            except queue.Full:
+                logger.warning("Ingest queue full: send from %s rejected", sender_id)
+                raise ServiceUnavailableError(
+                    "Too many messages in flight, retry shortly"
+                )
+        return future
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stopping = self._collect(first)
+            self._write(batch)
+        logger.info("Message ingest drained")
+
+    def _collect(self, first: QueuedSend) -> tuple[list[QueuedSend], bool]:
+        # Everything already queued goes in; then wait up to max_delay for more
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    item = self._queue.get(timeout=timeout)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _write(self, batch: list[QueuedSend]) -> None:
+        try:
+            with SessionLocal() as db:
+                responses = MessageService(db).create_queued([s.row for s in batch])
+        except Exception as exc:
+            # The whole batch was one transaction — every send in it failed
+            logger.exception("Ingest batch of %s failed", len(batch))
+            for send in batch:
+                send.future.set_exception(exc)
+            return
+
+        for send, response in zip(batch, responses):
+            send.future.set_result(response)
+        logger.info("Ingest batch written: %s messages", len(batch))
+
+
+message_ingest = MessageIngest(
+    settings.INGEST_QUEUE_SIZE,
+    settings.INGEST_MAX_BATCH,
+    settings.INGEST_MAX_DELAY_MS / 1000,
+)
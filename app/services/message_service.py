@@ -1,38 +1,182 @@
+import asyncio
 import math
 import uuid
-from typing import Optional
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Optional, TypeVar
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.exceptions import ConflictError, ForbiddenError, NotFoundError
+from app.exceptions import (
+    BadRequestError,
+    ConflictError,
+    ForbiddenError,
+    NotFoundError,
+)
 from app.logger import get_logger
+from app.metrics import MESSAGES_CREATED, MESSAGES_DELETED, MESSAGES_READ
 from app.models import Message
-from app.repositories.message_repository import MessageRepository
+from app.realtime.events import EventPublisher
+from app.repositories.conversation_repository import ConversationRepository
+from app.repositories.message_repository import MessageRepository, SearchKey
+from app.repositories.partition_repository import PartitionRepository
+from app.repositories.stats_repository import StatsRepository
 from app.repositories.user_repository import UserRepository
-from app.schemas import MessageCreate, PaginatedResponse
+from app.schemas import (
+    CursorPage,
+    MessageBatchCreate,
+    MessageBatchResponse,
+    MessageBulkRead,
+    MessageCreate,
+    MessageResponse,
+    MessageSearchHit,
+    PaginatedResponse,
+)
+from app.utils.pagination import (
+    build_cursor_page,
+    decode_cursor,
+    decode_id_cursor,
+    encode_cursor,
+)
+
+if TYPE_CHECKING:
+    from app.services.message_ingest import MessageIngest
 
 logger = get_logger(__name__)
 
+T = TypeVar("T")
+
+
+def _decode_search_key(cursor: Optional[str]) -> Optional[SearchKey]:
+    if cursor is None:
+        return None
+    values = decode_cursor(cursor)
+    # bool is a subclass of int — reject it explicitly
+    if (
+        len(values) != 2
+        or type(values[0]) not in (int, float)
+        or type(values[1]) is not int
+    ):
+        raise BadRequestError("Invalid cursor")
+    return float(values[0]), values[1]
+
+
+def _page(items: list[Message], total: int, page: int, size: int) -> PaginatedResponse:
+    has_next = page * size < total
+    return PaginatedResponse(
+        items=items,
+        total=total,
+        page=page,
+        size=size,
+        pages=math.ceil(total / size) if total > 0 else 1,
+        next_cursor=encode_cursor(items[-1].id) if items and has_next else None,
+        prev_cursor=encode_cursor(items[0].id) if items and page > 1 else None,
+    )
+
 
 class MessageService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, ingest: Optional["MessageIngest"] = None):
+        self.db = db
+        self.ingest = ingest
         self.repo = MessageRepository(db)
         self.user_repo = UserRepository(db)
+        self.stats_repo = StatsRepository(db)
+        self.conversation_repo = ConversationRepository(db)
+        self.partition_repo = PartitionRepository(db)
+        self.events = EventPublisher(db)
 
-    def create(self, data: MessageCreate, sender_id: uuid.UUID) -> Message:
-        receiver = self.user_repo.get_by_id(data.receiver_id)
+    def check_receiver(self, receiver_id: uuid.UUID) -> None:
+        receiver = self.user_repo.get_by_id(receiver_id)
         if not receiver or not receiver.is_active:
             raise NotFoundError("Receiver not found")
 
+    def create(
+        self, data: MessageCreate, sender_id: uuid.UUID
+    ) -> Message | MessageResponse:
+        self.check_receiver(data.receiver_id)
+
+        if self.ingest is not None:
+            # Hand the pooled connection back while the writer batches this send
+            self.db.rollback()
+            future = self.ingest.submit(data.text, sender_id, data.receiver_id)
+            return future.result()
+
+        # Counters and conversations are committed together with the message
+        deltas = defaultdict(Counter)
+        deltas[sender_id]["sent_total"] += 1
+        deltas[data.receiver_id]["inbox_total"] += 1
+        deltas[data.receiver_id]["inbox_unread"] += 1
+        self.stats_repo.apply(deltas)
+
         message = self.repo.create(
             text=data.text,
             sender_id=sender_id,
             receiver_id=data.receiver_id,
         )
+        self.conversation_repo.on_messages_created([message])
+        self.events.message_created([message])
+        self.db.commit()
+        MESSAGES_CREATED.inc()
 
         logger.info("Message sent: from %s to %s", sender_id, data.receiver_id)
         return message
 
+    def create_batch(
+        self, data: MessageBatchCreate, sender_id: uuid.UUID
+    ) -> MessageBatchResponse:
+        receiver_ids = list(dict.fromkeys(data.receiver_ids))
+        active_ids = self.user_repo.get_active_ids(receiver_ids)
+        accepted = [r for r in receiver_ids if r in active_ids]
+        rejected = [r for r in receiver_ids if r not in active_ids]
+        if not accepted:
+            return MessageBatchResponse(items=[], rejected=rejected)
+
+        deltas = defaultdict(Counter)
+        deltas[sender_id]["sent_total"] += len(accepted)
+        for receiver_id in accepted:
+            deltas[receiver_id]["inbox_total"] += 1
+            deltas[receiver_id]["inbox_unread"] += 1
+        self.stats_repo.apply(deltas)
+
+        messages = self.repo.create_many(data.text, sender_id, accepted)
+        self.conversation_repo.on_messages_created(messages)
+        self.events.message_created(messages)
+        # Build the response while the RETURNING values are loaded — after commit
+        # every object would be expired and re-read one by one
+        response = MessageBatchResponse(items=messages, rejected=rejected)
+        self.db.commit()
+        MESSAGES_CREATED.inc(len(messages))
+
+        logger.info(
+            "Batch sent: from %s to %s receivers, %s rejected",
+            sender_id,
+            len(accepted),
+            len(rejected),
+        )
+        return response
+
+    def create_queued(self, rows: list[dict]) -> list[MessageResponse]:
+        """Write a batch of queued sends (see MessageIngest) in one transaction.
+
+        `rows` hold text, sender_id and receiver_id; receivers were checked when
+        the sends were queued. Responses come back in the order of `rows`.
+        """
+        deltas = defaultdict(Counter)
+        for row in rows:
+            deltas[row["sender_id"]]["sent_total"] += 1
+            deltas[row["receiver_id"]]["inbox_total"] += 1
+            deltas[row["receiver_id"]]["inbox_unread"] += 1
+        self.stats_repo.apply(deltas)
+
+        messages = self.repo.insert_rows(rows)
+        self.conversation_repo.on_messages_created(messages)
+        self.events.message_created(messages)
+        responses = [MessageResponse.model_validate(m) for m in messages]
+        self.db.commit()
+        MESSAGES_CREATED.inc(len(messages))
+        return responses
+
     def get_inbox(
         self,
         receiver_id: uuid.UUID,
@@ -42,37 +186,159 @@ class MessageService:
     ) -> PaginatedResponse:
         offset = (page - 1) * size
         items = self.repo.get_inbox(receiver_id, unread_only, offset, size)
-        total = self.repo.count_inbox(receiver_id, unread_only)
-        return PaginatedResponse(
-            items=items,
-            total=total,
-            page=page,
-            size=size,
-            pages=math.ceil(total / size) if total > 0 else 1,
+        total = self._inbox_total(receiver_id, unread_only)
+        return _page(items, total, page, size)
+
+    def get_inbox_cursor(
+        self,
+        receiver_id: uuid.UUID,
+        unread_only: Optional[bool],
+        after: Optional[str],
+        before: Optional[str],
+        size: int,
+        include_archived: bool = False,
+    ) -> CursorPage:
+        rows = self.repo.get_inbox_keyset(
+            receiver_id,
+            unread_only,
+            decode_id_cursor(after),
+            decode_id_cursor(before),
+            size + 1,
+            include_archived,
         )
+        return build_cursor_page(rows, size, after, before)
+
+    def get_inbox_after(
+        self, receiver_id: uuid.UUID, after_id: int, size: int
+    ) -> list[Message]:
+        # Oldest first, so the last item is the next watermark
+        return self.repo.get_inbox_keyset(receiver_id, None, after_id, None, size)
 
     def get_outbox(
         self, sender_id: uuid.UUID, page: int, size: int
     ) -> PaginatedResponse:
         offset = (page - 1) * size
         items = self.repo.get_outbox(sender_id, offset, size)
-        total = self.repo.count_outbox(sender_id)
-        return PaginatedResponse(
-            items=items,
-            total=total,
-            page=page,
-            size=size,
-            pages=math.ceil(total / size) if total > 0 else 1,
+        total = self._outbox_total(sender_id)
+        return _page(items, total, page, size)
+
+    def get_outbox_cursor(
+        self,
+        sender_id: uuid.UUID,
+        after: Optional[str],
+        before: Optional[str],
+        size: int,
+        include_archived: bool = False,
+    ) -> CursorPage:
+        rows = self.repo.get_outbox_keyset(
+            sender_id,
+            decode_id_cursor(after),
+            decode_id_cursor(before),
+            size + 1,
+            include_archived,
         )
+        return build_cursor_page(rows, size, after, before)
+
+    def get_thread(
+        self,
+        user_id: uuid.UUID,
+        peer_id: uuid.UUID,
+        after: Optional[str],
+        before: Optional[str],
+        size: int,
+        include_archived: bool = False,
+    ) -> CursorPage:
+        rows = self.repo.get_thread_keyset(
+            user_id,
+            peer_id,
+            decode_id_cursor(after),
+            decode_id_cursor(before),
+            size + 1,
+            include_archived,
+        )
+        return build_cursor_page(rows, size, after, before, from_end=True)
+
+    def search(
+        self,
+        user_id: uuid.UUID,
+        q: str,
+        after: Optional[str],
+        before: Optional[str],
+        size: int,
+    ) -> CursorPage:
+        rows = self.repo.search(
+            user_id, q, _decode_search_key(after), _decode_search_key(before), size + 1
+        )
+        hits = [
+            MessageSearchHit.model_validate(
+                {**MessageResponse.model_validate(message).model_dump(), "rank": rank}
+            )
+            for message, rank in rows
+        ]
+        return build_cursor_page(
+            hits, size, after, before, key=lambda hit: (hit.rank, hit.id)
+        )
+
+    def _inbox_total(self, receiver_id: uuid.UUID, unread_only: Optional[bool]) -> int:
+        stats = self.stats_repo.get(receiver_id)
+        # No stats row yet — fall back to counting, the reconcile job will add it
+        if stats is None:
+            return self.repo.count_inbox(receiver_id, unread_only)
+        if unread_only is None:
+            return stats.inbox_total
+        if unread_only:
+            return stats.inbox_unread
+        return stats.inbox_total - stats.inbox_unread
+
+    def _outbox_total(self, sender_id: uuid.UUID) -> int:
+        stats = self.stats_repo.get(sender_id)
+        if stats is None:
+            return self.repo.count_outbox(sender_id)
+        return stats.sent_total
+
+    def get_unread_count(self, user_id: uuid.UUID) -> int:
+        stats = self.stats_repo.get(user_id)
+        return stats.inbox_unread if stats else 0
 
     def read_message(self, message_id: int, user_id: uuid.UUID) -> Message:
-        message = self.repo.get_by_id_and_receiver(message_id, user_id)
+        message = self.repo.get_by_id_and_receiver(message_id, user_id, for_update=True)
         if not message:
             raise NotFoundError("Message not found")
-        return self.repo.mark_as_read(message)
+        if message.is_read:
+            return message
+
+        deltas = defaultdict(Counter)
+        deltas[user_id]["inbox_unread"] -= 1
+        self.stats_repo.apply(deltas)
+        self.conversation_repo.decrement_unread(user_id, {message.sender_id: 1})
+        message = self.repo.mark_as_read(message)
+        self.events.messages_read(user_id, [(message.id, message.sender_id)])
+        self.db.commit()
+        MESSAGES_READ.inc()
+        return message
+
+    def read_many(self, user_id: uuid.UUID, data: MessageBulkRead) -> int:
+        rows = self.repo.mark_many_as_read(
+            user_id, ids=data.ids, up_to_id=data.up_to_id, sender_id=data.sender_id
+        )
+        if not rows:
+            return 0
+
+        deltas = defaultdict(Counter)
+        deltas[user_id]["inbox_unread"] -= len(rows)
+        self.stats_repo.apply(deltas)
+        self.conversation_repo.decrement_unread(
+            user_id, Counter(sender_id for _, sender_id in rows)
+        )
+        self.events.messages_read(user_id, rows)
+        self.db.commit()
+        MESSAGES_READ.inc(len(rows))
+
+        logger.info("Messages read: %s by user=%s", len(rows), user_id)
+        return len(rows)
 
     def delete(self, message_id: int, user_id: uuid.UUID) -> None:
-        message = self.repo.get_by_id(message_id)
+        message = self.repo.get_by_id(message_id, for_update=True)
         if not message:
             raise NotFoundError("Message not found")
 
@@ -87,5 +353,211 @@ class MessageService:
         if message.is_read:
             raise ConflictError("Cannot delete a read message")
 
-        logger.info("Message deleted: id=%s by user=%s", message_id, user_id)
+        # Only unread messages can be deleted, so the unread counter always drops
+        deltas = defaultdict(Counter)
+        deltas[message.sender_id]["sent_total"] -= 1
+        deltas[message.receiver_id]["inbox_total"] -= 1
+        deltas[message.receiver_id]["inbox_unread"] -= 1
+        self.stats_repo.apply(deltas)
+
         self.repo.delete(message)
+        self.conversation_repo.decrement_unread(
+            message.receiver_id, {message.sender_id: 1}
+        )
+        conversation = self.conversation_repo.get(
+            message.sender_id, message.receiver_id
+        )
+        if conversation and conversation.last_message_id == message_id:
+            self.conversation_repo.replace_last_message(
+                message.sender_id,
+                message.receiver_id,
+                message_id,
+                self.repo.get_last_between(message.sender_id, message.receiver_id),
+            )
+        self.events.message_deleted(message)
+        self.db.commit()
+        MESSAGES_DELETED.inc()
+
+        logger.info("Message deleted: id=%s by user=%s", message_id, user_id)
+
+    def retire_read_messages(
+        self, cutoff: datetime, after_id: int, limit: int, archive: bool
+    ) -> tuple[int, int]:
+        """Archive (or delete) one batch of read messages older than `cutoff`.
+
+        One short transaction per batch. Returns how many messages were retired
+        and the id to continue after; fewer than `limit` means nothing is left.
+        """
+        rows = self.repo.retire_read_before(cutoff, after_id, limit, archive)
+        # Retired messages are read, so only the totals change
+        deltas = defaultdict(Counter)
+        for _, sender_id, receiver_id in rows:
+            deltas[sender_id]["sent_total"] -= 1
+            deltas[receiver_id]["inbox_total"] -= 1
+        self.stats_repo.apply(deltas)
+        self.db.commit()
+        return len(rows), max((row[0] for row in rows), default=after_id)
+
+    def detach_partition(self, name: str) -> None:
+        """Detach a month of messages and take it out of counters and chats.
+
+        Runs in the caller's transaction — the caller commits. The detach locks
+        messages until then, so no read, send or delete can change the month's
+        rows between the detach and the counts taken from the detached table.
+        """
+        self.partition_repo.detach(name)
+
+        deltas = defaultdict(Counter)
+        unread = defaultdict(Counter)
+        for (
+            sender_id,
+            receiver_id,
+            total,
+            unread_count,
+        ) in self.partition_repo.message_counts(name):
+            deltas[sender_id]["sent_total"] -= total
+            deltas[receiver_id]["inbox_total"] -= total
+            deltas[receiver_id]["inbox_unread"] -= unread_count
+            if unread_count:
+                unread[receiver_id][sender_id] += unread_count
+        self.stats_repo.apply(deltas)
+        for receiver_id, counts in sorted(unread.items()):
+            self.conversation_repo.decrement_unread(receiver_id, counts)
+
+        # Chats whose last message was detached fall back to the newest one
+        # still in messages, or go away with none left
+        for user_a, user_b, message_id in self.partition_repo.conversations_ending_in(
+            name
+        ):
+            self.conversation_repo.replace_last_message(
+                user_a, user_b, message_id, self.repo.get_last_between(user_a, user_b)
+            )
+
+
+class AsyncMessageService:
+    """MessageService for the async stack (ASYNC_DB).
+
+    The transaction logic is not duplicated: every call runs the sync
+    MessageService through AsyncSession.run_sync. Its ORM code runs in a
+    greenlet on the event loop and each statement awaits asyncpg, so a request
+    waiting on the database holds no thread.
+    """
+
+    def __init__(self, db: AsyncSession, ingest: Optional["MessageIngest"] = None):
+        self.db = db
+        self.ingest = ingest
+
+    async def _run(self, method: Callable[..., T], *args) -> T:
+        return await self.db.run_sync(
+            lambda session: method(MessageService(session), *args)
+        )
+
+    async def create(
+        self, data: MessageCreate, sender_id: uuid.UUID
+    ) -> Message | MessageResponse:
+        if self.ingest is None:
+            return await self._run(MessageService.create, data, sender_id)
+        # Waiting on the writer must not block the event loop, so this path
+        # doesn't go through MessageService.create
+        await self._run(MessageService.check_receiver, data.receiver_id)
+        await self.db.rollback()
+        future = self.ingest.submit(data.text, sender_id, data.receiver_id)
+        return await asyncio.wrap_future(future)
+
+    async def create_batch(
+        self, data: MessageBatchCreate, sender_id: uuid.UUID
+    ) -> MessageBatchResponse:
+        return await self._run(MessageService.create_batch, data, sender_id)
+
+    async def get_inbox(
+        self,
+        receiver_id: uuid.UUID,
+        unread_only: Optional[bool],
+        page: int,
+        size: int,
+    ) -> PaginatedResponse:
+        return await self._run(
+            MessageService.get_inbox, receiver_id, unread_only, page, size
+        )
+
+    async def get_inbox_cursor(
+        self,
+        receiver_id: uuid.UUID,
+        unread_only: Optional[bool],
+        after: Optional[str],
+        before: Optional[str],
+        size: int,
+        include_archived: bool = False,
+    ) -> CursorPage:
+        return await self._run(
+            MessageService.get_inbox_cursor,
+            receiver_id,
+            unread_only,
+            after,
+            before,
+            size,
+            include_archived,
+        )
+
+    async def get_outbox(
+        self, sender_id: uuid.UUID, page: int, size: int
+    ) -> PaginatedResponse:
+        return await self._run(MessageService.get_outbox, sender_id, page, size)
+
+    async def get_outbox_cursor(
+        self,
+        sender_id: uuid.UUID,
+        after: Optional[str],
+        before: Optional[str],
+        size: int,
+        include_archived: bool = False,
+    ) -> CursorPage:
+        return await self._run(
+            MessageService.get_outbox_cursor,
+            sender_id,
+            after,
+            before,
+            size,
+            include_archived,
+        )
+
+    async def get_thread(
+        self,
+        user_id: uuid.UUID,
+        peer_id: uuid.UUID,
+        after: Optional[str],
+        before: Optional[str],
+        size: int,
+        include_archived: bool = False,
+    ) -> CursorPage:
+        return await self._run(
+            MessageService.get_thread,
+            user_id,
+            peer_id,
+            after,
+            before,
+            size,
+            include_archived,
+        )
+
+    async def search(
+        self,
+        user_id: uuid.UUID,
+        q: str,
+        after: Optional[str],
+        before: Optional[str],
+        size: int,
+    ) -> CursorPage:
+        return await self._run(MessageService.search, user_id, q, after, before, size)
+
+    async def get_unread_count(self, user_id: uuid.UUID) -> int:
+        return await self._run(MessageService.get_unread_count, user_id)
+
+    async def read_message(self, message_id: int, user_id: uuid.UUID) -> Message:
+        return await self._run(MessageService.read_message, message_id, user_id)
+
+    async def read_many(self, user_id: uuid.UUID, data: MessageBulkRead) -> int:
+        return await self._run(MessageService.read_many, user_id, data)
+
+    async def delete(self, message_id: int, user_id: uuid.UUID) -> None:
+        await self._run(MessageService.delete, message_id, user_id)
@@ -0,0 +1,188 @@
+import math
+import threading
+import time
+import uuid
+from typing import Callable
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.db import SessionLocal
+from app.exceptions import TooManyRequestsError
+from app.repositories.rate_limit_repository import RateLimitRepository
+
+
+def _seconds_until_room(
+    current: int, previous: int, elapsed: float, window: int, room: int
+) -> float:
+    """How long until the sliding-window estimate drops to `room` hits."""
+    if current <= room:
+        if previous == 0:
+            return 0.0
+        # The previous window's share shrinks linearly as this one goes on
+        return max(window * (1 - (room - current) / previous) - elapsed, 0.0)
+    # Not before the next window, where this window's hits become the previous
+    return window - elapsed + window * (1 - room / current)
+
+
+class RateLimiter:
+    """Sliding-window limits on hits per key, e.g. logins per client IP.
+
+    Each key counts hits in fixed windows of `window` seconds. A hit is allowed
+    while previous * (share of the previous window still covered) + current
+    stays within the limit — a close approximation of a true sliding window
+    that needs two counters per key instead of a timestamp per hit. check()
+    counts rejected hits too, so a client that keeps hammering stays locked
+    out. With hit=False it only checks that one more hit would fit, for keys
+    that count failures recorded afterwards with hit().
+
+    By default the counters live in this worker's memory, so each worker
+    enforces the limit on its own. With `shared` they live in the
+    rate_limit_hits table and hold across all workers, at one upsert per check.
+    """
+
+    def __init__(
+        self,
+        window: int,
+        shared: bool = False,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.window = window
+        self.shared = shared
+        self._clock = clock
+        # Guards `_counters` and `_swept_start`
+        self._lock = threading.Lock()
+        # key -> (window start, hits in it, hits in the window before)
+        self._counters: dict[str, tuple[int, int, int]] = {}
+        self._swept_start = 0
+
+    def check(self, key: str, limit: int, hit: bool = True) -> None:
+        """Count a hit on `key`; raise TooManyRequestsError past `limit`.
+
+        With `hit` False nothing is counted: the check passes while one more
+        hit would stay within `limit`. A limit of 0 or less turns the check off.
+        """
+        if limit <= 0:
+            return
+        now = self._clock()
+        window_start = int(now // self.window) * self.window
+        elapsed = now - window_start
+        current, previous = self._count(key, window_start, int(hit))
+
+        # Without a hit, leave room for the one the caller is about to make
+        if previous * (1 - elapsed / self.window) + current + (not hit) <= limit:
+            return
+        # Room for the retry itself
+        wait = _seconds_until_room(current, previous, elapsed, self.window, limit - 1)
+        raise TooManyRequestsError(
+            "Too many requests, retry later", retry_after=max(math.ceil(wait), 1)
+        )
+
+    def hit(self, key: str) -> None:
+        """Count a hit on `key` without checking any limit."""
+        now = self._clock()
+        self._count(key, int(now // self.window) * self.window, 1)
+
+    async def check_async(self, key: str, limit: int, hit: bool = True) -> None:
+        # Only the shared mode does I/O — keep the local check on the loop
+        if self.shared:
+            await run_in_threadpool(self.check, key, limit, hit)
+        else:
+            self.check(key, limit, hit)
+
+    async def hit_async(self, key: str) -> None:
+        if self.shared:
+            await run_in_threadpool(self.hit, key)
+        else:
+            self.hit(key)
+
+    def prune(self) -> None:
+        """Delete shared counters too old to matter. Run once per window."""
+        window_start = int(self._clock() // self.window) * self.window
+        with SessionLocal() as db:
+            RateLimitRepository(db).delete_before(window_start - self.window)
+            db.commit()
+
+    def _count(self, key: str, window_start: int, hits: int) -> tuple[int, int]:
+        """Add `hits` (0 or 1) to the current window; return it and the previous."""
+        if self.shared:
+            return self._count_shared(key, window_start, hits)
+        return self._count_local(key, window_start, hits)
+
+    def _count_local(self, key: str, window_start: int, hits: int) -> tuple[int, int]:
+        with self._lock:
+            if window_start > self._swept_start:
+                # Once per window: forget keys with no hits in the last two
+                self._counters = {
+                    k: c
+                    for k, c in self._counters.items()
+                    if c[0] >= window_start - self.window
+                }
+                self._swept_start = window_start
+            start, current, previous = self._counters.get(key, (window_start, 0, 0))
+            if start == window_start:
+                counter = (window_start, current + hits, previous)
+            elif start == window_start - self.window:
+                counter = (window_start, hits, current)
+            else:
+                counter = (window_start, hits, 0)
+            if hits:
+                self._counters[key] = counter
+            return counter[1], counter[2]
+
+    def _count_shared(self, key: str, window_start: int, hits: int) -> tuple[int, int]:
+        with SessionLocal() as db:
+            repo = RateLimitRepository(db)
+            if not hits:
+                return repo.counts(key, window_start, self.window)
+            counts = repo.hit(key, window_start, self.window)
+            db.commit()
+        return counts
+
+
+rate_limiter = RateLimiter(
+    settings.RATE_LIMIT_WINDOW_SECONDS,
+    shared=settings.RATE_LIMIT_BACKEND == "postgres",
+)
+
+
+# --- Policies ---
+
+
+def _login_user_key(username: str) -> str:
+    return f"login:user:{username.lower()}"
+
+
+async def limit_login(client_ip: str, username: str) -> None:
+    # Per IP against one client trying many accounts: every attempt counts,
+    # rejected ones included
+    await rate_limiter.check_async(
+        f"login:ip:{client_ip}", settings.LOGIN_RATE_LIMIT_PER_IP
+    )
+    # Per username against many clients trying one account: only failed
+    # passwords count (note_failed_login), so attempts on someone else's
+    # account can't keep its owner locked out once they stop
+    await rate_limiter.check_async(
+        _login_user_key(username), settings.LOGIN_RATE_LIMIT_PER_USERNAME, hit=False
+    )
+
+
+async def note_failed_login(username: str) -> None:
+    if settings.LOGIN_RATE_LIMIT_PER_USERNAME > 0:
+        await rate_limiter.hit_async(_login_user_key(username))
+
+
+def _send_limit(sender_id: uuid.UUID, batch: bool) -> tuple[str, int]:
+    # A batch is one transaction however many receivers it has, but it gets
+    # its own, smaller limit
+    if batch:
+        return f"send-batch:{sender_id}", settings.MESSAGE_BATCH_RATE_LIMIT_PER_SENDER
+    return f"send:{sender_id}", settings.MESSAGE_RATE_LIMIT_PER_SENDER
+
+
+def limit_sends(sender_id: uuid.UUID, batch: bool = False) -> None:
+    rate_limiter.check(*_send_limit(sender_id, batch))
+
+
+async def limit_sends_async(sender_id: uuid.UUID, batch: bool = False) -> None:
+    await rate_limiter.check_async(*_send_limit(sender_id, batch))
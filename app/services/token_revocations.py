@@ -0,0 +1,93 @@
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from app.db import SessionLocal
+from app.logger import get_logger
+from app.repositories.user_repository import UserRepository
+from app.utils.security import ACCESS_TOKEN_EXPIRE_MINUTES
+
+logger = get_logger(__name__)
+
+# Re-read this much before the previous refresh: updated_at is the start of
+# the writing transaction, which may commit after a refresh has run
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+
+class TokenRevocations:
+    """Current token_version of users whose version was bumped recently.
+
+    With STATELESS_AUTH a token is trusted without a query only if its "ver"
+    claim is at least the version recorded here. A bump older than the token
+    lifetime can be forgotten: every token issued before it has expired. So
+    the map holds only users renamed or deactivated within that window.
+
+    refresh() reads users changed since the previous run through the
+    updated_at index. UserService also records its own bumps with note(), so
+    on the worker that made the change it applies at once.
+    """
+
+    def __init__(self, window: timedelta):
+        self.window = window
+        # Guards the map and the watermark — refresh() runs in a worker thread
+        self._lock = threading.Lock()
+        # user id -> (token_version, updated_at)
+        self._versions: dict[uuid.UUID, tuple[int, datetime]] = {}
+        # Database time of the previous refresh — the next one reads from just
+        # before it, however quiet the time in between was
+        self._read_until: Optional[datetime] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._read_until is not None
+
+    def is_current(self, user_id: uuid.UUID, version: int) -> bool:
+        # Nothing is trusted before the first refresh
+        if not self.ready:
+            return False
+        entry = self._versions.get(user_id)
+        return entry is None or version >= entry[0]
+
+    def note(self, user_id: uuid.UUID, version: int) -> None:
+        with self._lock:
+            self._remember(user_id, version, datetime.now(timezone.utc))
+
+    def refresh(self) -> None:
+        now = datetime.now(timezone.utc)
+        horizon = now - self.window
+        since = (
+            horizon if self._read_until is None else self._read_until - REFRESH_OVERLAP
+        )
+        with SessionLocal() as db:
+            rows, read_until = UserRepository(db).list_token_versions_since(
+                max(since, horizon)
+            )
+
+        with self._lock:
+            changed = 0
+            for user_id, version, updated_at in rows:
+                changed += self._remember(user_id, version, updated_at)
+            for user_id in [
+                user_id
+                for user_id, (_, updated_at) in self._versions.items()
+                if updated_at < horizon
+            ]:
+                del self._versions[user_id]
+            self._read_until = read_until
+        if changed:
+            logger.info(
+                "Token revocations: %s new, %s users tracked",
+                changed,
+                len(self._versions),
+            )
+
+    def _remember(self, user_id: uuid.UUID, version: int, updated_at: datetime) -> bool:
+        current = self._versions.get(user_id)
+        if current is not None and current[0] >= version:
+            return False
+        self._versions[user_id] = (version, updated_at)
+        return True
+
+
+token_revocations = TokenRevocations(timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
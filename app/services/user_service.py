@@ -1,46 +1,105 @@
 import uuid
 import math
+from typing import TYPE_CHECKING, Optional
 
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.exceptions import ConflictError, NotFoundError, UnauthorizedError
 from app.logger import get_logger
 from app.models import User
-from app.repositories.user_repository import UserRepository
-from app.schemas import AuthResponse, UserCreate, UserUpdate, PaginatedResponse
-from app.utils.security import create_access_token, hash_password, verify_password
+from app.repositories.user_repository import AsyncUserRepository, UserRepository
+from app.services.token_revocations import token_revocations
+from app.schemas import (
+    AuthResponse,
+    PaginatedResponse,
+    UserCreate,
+    UserSuggestion,
+    UserUpdate,
+)
+from app.utils.cache import TTLCache
+from app.utils.security import create_access_token, password_hasher
+
+if TYPE_CHECKING:
+    from app.services.username_index import UsernameIndex
 
 logger = get_logger(__name__)
 
+# user id -> UserResponse for get_current_user. UserService drops a user's
+# entry when it changes, so on this worker the change is seen at once.
+current_user_cache = TTLCache(
+    settings.CURRENT_USER_CACHE_SIZE, settings.CURRENT_USER_CACHE_TTL_SECONDS
+)
+
+
+def _issue_token(user: User) -> str:
+    if not settings.STATELESS_AUTH:
+        return create_access_token(str(user.id))
+    # Everything get_current_user returns, so it can answer without a query
+    return create_access_token(
+        str(user.id),
+        {
+            "ver": user.token_version,
+            "username": user.username,
+            "created_at": user.created_at.isoformat(),
+            "updated_at": user.updated_at.isoformat(),
+        },
+    )
+
+
+def _suggestions(pairs: list[tuple[uuid.UUID, str]]) -> list[UserSuggestion]:
+    return [
+        UserSuggestion(id=user_id, username=username) for user_id, username in pairs
+    ]
+
 
 class UserService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, usernames: Optional["UsernameIndex"] = None):
         self.repo = UserRepository(db)
+        # In-memory username index — None when USERNAME_INDEX is off
+        self.usernames = usernames
+
+    # register and login are async: bcrypt runs on password_hasher's pool and
+    # only the queries take a threadpool thread, so a login burst doesn't
+    # hold the threads other endpoints need
 
-    def register(self, data: UserCreate) -> AuthResponse:
+    async def register(self, data: UserCreate) -> AuthResponse:
         username = data.username.lower()
 
-        if self.repo.exists_by_username(username):
+        if await run_in_threadpool(self.repo.exists_by_username, username):
             raise ConflictError("Username already exists")
 
-        user = self.repo.create(
-            username=username,
-            password_hash=hash_password(data.password),
+        password_hash = await password_hasher.hash(data.password)
+        user = await run_in_threadpool(
+            self.repo.create, username=username, password_hash=password_hash
         )
+        if self.usernames is not None:
+            self.usernames.add(user.id, user.username)
 
         logger.info("User registered: %s", user.username)
-        token = create_access_token(str(user.id))
+        token = _issue_token(user)
         return AuthResponse(access_token=token, user=user)
 
-    def login(self, username: str, password: str) -> AuthResponse:
-        user = self.repo.get_by_username(username.lower())
+    async def login(self, username: str, password: str) -> AuthResponse:
+        user = await run_in_threadpool(self.repo.get_by_username, username.lower())
+        verified, new_hash = (
+            await password_hasher.verify_and_update(password, str(user.password_hash))
+            if user
+            else (False, None)
+        )
 
         # Same error for wrong username and wrong password (security)
-        if not user or not verify_password(password, str(user.password_hash)):
+        if not verified:
             logger.warning("Failed login attempt: %s", username)
             raise UnauthorizedError("Invalid username or password")
 
-        token = create_access_token(str(user.id))
+        if new_hash is not None:
+            # Stored at another bcrypt cost — the password is only known now
+            await run_in_threadpool(self.repo.update_password_hash, user, new_hash)
+
+        token = _issue_token(user)
         return AuthResponse(access_token=token, user=user)
 
     def get_by_id(self, user_id: uuid.UUID) -> User:
@@ -54,16 +113,25 @@ class UserService:
         username = data.username.lower()
         if self.repo.exists_by_username(username, exclude_user_id=user_id):
             raise ConflictError("Username already exists")
-        return self.repo.update_username(user, username)
+        old_username = user.username
+        user = self.repo.update_username(user, username)
+        current_user_cache.invalidate(user_id)
+        token_revocations.note(user_id, user.token_version)
+        if self.usernames is not None:
+            self.usernames.rename(user_id, old_username, user.username)
+        return user
 
     def deactivate_me(self, user_id: uuid.UUID) -> None:
         user = self.get_by_id(user_id)
         self.repo.deactivate(user)
+        current_user_cache.invalidate(user_id)
+        token_revocations.note(user_id, user.token_version)
+        if self.usernames is not None:
+            self.usernames.remove(user.username)
 
     def search(self, q: str, page: int, size: int) -> PaginatedResponse:
         offset = (page - 1) * size
-        items = self.repo.search(q, offset=offset, limit=size)
-        total = self.repo.count_search(q)
+        items, total = self.repo.search(q, offset=offset, limit=size)
         return PaginatedResponse(
             items=items,
             total=total,
@@ -71,3 +139,107 @@ class UserService:
             size=size,
             pages=math.ceil(total / size) if total > 0 else 1,
         )
+
+    def autocomplete(self, prefix: str, limit: int) -> list[UserSuggestion]:
+        prefix = prefix.lower()
+        if self.usernames is not None:
+            matches = self.usernames.complete(prefix, limit)
+            # None until the index is loaded, or when it is over its size bound
+            if matches is not None:
+                return _suggestions(matches)
+        return _suggestions(self.repo.autocomplete(prefix, limit))
+
+
+class AsyncUserService:
+    """UserService for the async stack (ASYNC_DB).
+
+    bcrypt runs on password_hasher's pool — on the event loop it would stall
+    every other request for the duration of a hash.
+    """
+
+    def __init__(self, db: AsyncSession, usernames: Optional["UsernameIndex"] = None):
+        self.repo = AsyncUserRepository(db)
+        self.usernames = usernames
+
+    async def register(self, data: UserCreate) -> AuthResponse:
+        username = data.username.lower()
+
+        if await self.repo.exists_by_username(username):
+            raise ConflictError("Username already exists")
+
+        user = await self.repo.create(
+            username=username,
+            password_hash=await password_hasher.hash(data.password),
+        )
+        if self.usernames is not None:
+            self.usernames.add(user.id, user.username)
+
+        logger.info("User registered: %s", user.username)
+        token = _issue_token(user)
+        return AuthResponse(access_token=token, user=user)
+
+    async def login(self, username: str, password: str) -> AuthResponse:
+        user = await self.repo.get_by_username(username.lower())
+        verified, new_hash = (
+            await password_hasher.verify_and_update(password, str(user.password_hash))
+            if user
+            else (False, None)
+        )
+
+        # Same error for wrong username and wrong password (security)
+        if not verified:
+            logger.warning("Failed login attempt: %s", username)
+            raise UnauthorizedError("Invalid username or password")
+
+        if new_hash is not None:
+            # Stored at another bcrypt cost — the password is only known now
+            await self.repo.update_password_hash(user, new_hash)
+
+        token = _issue_token(user)
+        return AuthResponse(access_token=token, user=user)
+
+    async def get_by_id(self, user_id: uuid.UUID) -> User:
+        user = await self.repo.get_by_id(user_id)
+        if not user:
+            raise NotFoundError("User not found")
+        return user
+
+    async def update_me(self, user_id: uuid.UUID, data: UserUpdate) -> User:
+        user = await self.get_by_id(user_id)
+        username = data.username.lower()
+        if await self.repo.exists_by_username(username, exclude_user_id=user_id):
+            raise ConflictError("Username already exists")
+        old_username = user.username
+        user = await self.repo.update_username(user, username)
+        current_user_cache.invalidate(user_id)
+        token_revocations.note(user_id, user.token_version)
+        if self.usernames is not None:
+            self.usernames.rename(user_id, old_username, user.username)
+        return user
+
+    async def deactivate_me(self, user_id: uuid.UUID) -> None:
+        user = await self.get_by_id(user_id)
+        await self.repo.deactivate(user)
+        current_user_cache.invalidate(user_id)
+        token_revocations.note(user_id, user.token_version)
+        if self.usernames is not None:
+            self.usernames.remove(user.username)
+
+    async def search(self, q: str, page: int, size: int) -> PaginatedResponse:
+        offset = (page - 1) * size
+        items, total = await self.repo.search(q, offset=offset, limit=size)
+        return PaginatedResponse(
+            items=items,
+            total=total,
+            page=page,
+            size=size,
+            pages=math.ceil(total / size) if total > 0 else 1,
+        )
+
+    async def autocomplete(self, prefix: str, limit: int) -> list[UserSuggestion]:
+        prefix = prefix.lower()
+        if self.usernames is not None:
+            matches = self.usernames.complete(prefix, limit)
+            if matches is not None:
+                return _suggestions(matches)
+        return _suggestions(await self.repo.autocomplete(prefix, limit))
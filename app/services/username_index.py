@@ -0,0 +1,131 @@
+import threading
+import uuid
+from bisect import bisect_left
+from typing import Optional
+
+from app.config import settings
+from app.db import SessionLocal
+from app.logger import get_logger
+from app.repositories.user_repository import UserRepository
+
+logger = get_logger(__name__)
+
+
+class UsernameIndex:
+    """Active usernames of all users, sorted, for prefix lookups in memory.
+
+    A prefix match is a bisect into the sorted names followed by a short
+    forward scan — microseconds, with no database round trip. Ids are kept
+    in a parallel list as 16-byte values to keep the per-user cost small.
+
+    UserService keeps the index current for changes made by this worker.
+    Changes made by other workers arrive with the next resync(), which reloads
+    everything from the database. Changes made while a resync is loading are
+    journaled and replayed on the fresh copy, so none are lost.
+
+    With more than max_users active users the index holds nothing and
+    complete() returns None: memory stays bounded and callers fall back to
+    the database.
+    """
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        # Guards the lists, `_ready` and `_journal`
+        self._lock = threading.Lock()
+        self._names: list[str] = []
+        self._ids: list[bytes] = []
+        self._ready = False
+        self._journal: Optional[list[tuple]] = None
+
+    def complete(
+        self, prefix: str, limit: int
+    ) -> Optional[list[tuple[uuid.UUID, str]]]:
+        """Up to `limit` (id, username) pairs whose username starts with `prefix`."""
+        with self._lock:
+            if not self._ready:
+                return None
+            matches = []
+            position = bisect_left(self._names, prefix)
+            while (
+                len(matches) < limit
+                and position < len(self._names)
+                and self._names[position].startswith(prefix)
+            ):
+                matches.append(
+                    (uuid.UUID(bytes=self._ids[position]), self._names[position])
+                )
+                position += 1
+            return matches
+
+    def add(self, user_id: uuid.UUID, username: str) -> None:
+        self._apply(("add", username, user_id.bytes))
+
+    def remove(self, username: str) -> None:
+        self._apply(("remove", username))
+
+    def rename(self, user_id: uuid.UUID, old: str, new: str) -> None:
+        with self._lock:
+            self._apply_locked(("remove", old))
+            self._apply_locked(("add", new, user_id.bytes))
+
+    def resync(self) -> None:
+        """Reload every active username from the database."""
+        with self._lock:
+            self._journal = []
+        try:
+            with SessionLocal() as db:
+                rows = UserRepository(db).list_active_usernames(self.max_users + 1)
+        except Exception:
+            with self._lock:
+                self._journal = None
+            raise
+        # Python string order, not the database collation — bisect needs it
+        rows.sort()
+
+        with self._lock:
+            journal, self._journal = self._journal, None
+            if len(rows) > self.max_users:
+                self._names, self._ids, self._ready = [], [], False
+                logger.warning(
+                    "Username index disabled: more than %s active users",
+                    self.max_users,
+                )
+                return
+            self._names = [username for username, _ in rows]
+            self._ids = [user_id.bytes for _, user_id in rows]
+            self._ready = True
+            for change in journal:
+                self._apply_locked(change)
+        logger.info("Username index loaded: %s users", len(self._names))
+
+    def _apply(self, change: tuple) -> None:
+        with self._lock:
+            self._apply_locked(change)
+
+    def _apply_locked(self, change: tuple) -> None:
+        if self._journal is not None:
+            self._journal.append(change)
+        if not self._ready:
+            return
+        # Changes are idempotent: a resync snapshot may or may not include them
+        username = change[1]
+        position = bisect_left(self._names, username)
+        present = position < len(self._names) and self._names[position] == username
+        if change[0] == "remove":
+            if present:
+                del self._names[position]
+                del self._ids[position]
+        elif present:
+            self._ids[position] = change[2]
+        elif len(self._names) >= self.max_users:
+            # Over the bound — answer from the database until the next resync
+            self._names, self._ids, self._ready = [], [], False
+            logger.warning(
+                "Username index disabled: more than %s active users", self.max_users
+            )
+        else:
+            self._names.insert(position, username)
+            self._ids.insert(position, change[2])
+
+
+username_index = UsernameIndex(settings.USERNAME_INDEX_MAX_USERS)
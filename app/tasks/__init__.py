@@ -0,0 +1,22 @@
+import asyncio
+from typing import Callable
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+async def run_periodically(
+    func: Callable[[], object], interval: float, run_first: bool = False
+) -> None:
+    # Jobs are sync (DB work), so run them in a thread to keep the event loop free
+    while True:
+        if run_first:
+            run_first = False
+        else:
+            await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(func)
+        except Exception:
+            # A failed run must not kill the loop — the next one will retry
+            logger.exception("Periodic task %s failed", func.__name__)
@@ -0,0 +1,73 @@
+"""Create upcoming monthly partitions of messages and detach expired ones.
+
+A row whose created_at falls outside every partition can't be inserted, so
+partitions are created PARTITION_MONTHS_AHEAD months in advance. With
+PARTITION_RETENTION_MONTHS set, partitions older than that are detached: the
+tables are kept, but the app no longer reads or vacuums them as part of
+messages. Their messages are taken out of the counters and chat lists in the
+same transaction. Runs periodically inside the app and can be started by hand or
+from cron:
+
+    python -m app.tasks.partitions
+"""
+
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.db import SessionLocal
+from app.logger import get_logger
+from app.repositories.partition_repository import (
+    PartitionRepository,
+    add_months,
+    month_start,
+)
+from app.services.message_service import MessageService
+
+logger = get_logger(__name__)
+
+# Arbitrary constant — lets only one worker run the job at a time
+PARTITION_LOCK_KEY = 7_301_002
+
+
+def maintain_message_partitions(today: Optional[date] = None) -> None:
+    current = month_start(today or datetime.now(timezone.utc).date())
+    db = SessionLocal()
+    try:
+        locked = db.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key)"),
+            {"key": PARTITION_LOCK_KEY},
+        ).scalar()
+        if not locked:
+            logger.info("Partition maintenance already running elsewhere, skipping")
+            return
+        # Partition DDL locks messages — give up rather than queue behind a long
+        # query and stall the requests queued behind us; the next run retries
+        db.execute(text("SET LOCAL lock_timeout = '5s'"))
+
+        repo = PartitionRepository(db)
+        created = repo.create_missing(
+            current, add_months(current, settings.PARTITION_MONTHS_AHEAD)
+        )
+        detached = []
+        messages = MessageService(db)
+        if settings.PARTITION_RETENTION_MONTHS > 0:
+            cutoff = add_months(current, -settings.PARTITION_RETENTION_MONTHS)
+            for month, name in sorted(repo.list_months().items()):
+                if month < cutoff:
+                    messages.detach_partition(name)
+                    detached.append(name)
+        db.commit()
+        logger.info(
+            "Partitions maintained: created %s, detached %s",
+            created or "none",
+            detached or "none",
+        )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    maintain_message_partitions()
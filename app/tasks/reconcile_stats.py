@@ -0,0 +1,75 @@
+"""Rebuild user_message_stats from messages.
+
+Counters are maintained transactionally, so this only repairs drift (manual
+data fixes, rows from before the table existed). Users are done in batches of
+STATS_RECONCILE_BATCH_SIZE, each its own short transaction that locks their
+counter rows while recounting them. Runs periodically inside the app — once
+per STATS_RECONCILE_INTERVAL_SECONDS across all workers, not once per worker —
+and can be started by hand or from cron:
+
+    python -m app.tasks.reconcile_stats
+"""
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.db import SessionLocal
+from app.logger import get_logger
+from app.repositories.job_run_repository import JobRunRepository
+from app.repositories.stats_repository import StatsRepository
+
+logger = get_logger(__name__)
+
+# Arbitrary constant — lets only one worker run the job at a time
+RECONCILE_LOCK_KEY = 7_301_001
+RECONCILE_JOB_NAME = "reconcile_stats"
+# Worker timers drift a little against each other; without the slack a worker
+# whose turn comes just short of an interval would skip and leave a gap of two
+RECONCILE_GAP_FRACTION = 0.9
+
+
+def reconcile_message_stats(force: bool = False) -> None:
+    """Recount every user's counters, unless a run started elsewhere within
+    the interval. `force` runs regardless (by hand)."""
+    db = SessionLocal()
+    try:
+        repo = StatsRepository(db)
+        runs = JobRunRepository(db)
+        after_id = None
+        total = 0
+        while True:
+            # Transaction-level lock, taken again for every batch: another
+            # worker that gets it in between finds this run claimed and skips
+            locked = db.execute(
+                text("SELECT pg_try_advisory_xact_lock(:key)"),
+                {"key": RECONCILE_LOCK_KEY},
+            ).scalar()
+            if not locked:
+                logger.info("Stats reconciliation already running elsewhere, skipping")
+                break
+            if after_id is None:
+                # Claimed with the first batch, so a worker that gets the lock
+                # between batches sees this run and doesn't start another
+                min_gap = (
+                    0
+                    if force
+                    else settings.STATS_RECONCILE_INTERVAL_SECONDS
+                    * RECONCILE_GAP_FRACTION
+                )
+                if not runs.claim(RECONCILE_JOB_NAME, min_gap):
+                    logger.info("Stats reconciled recently by another worker, skipping")
+                    return
+            fixed, after_id = repo.reconcile_batch(
+                after_id, settings.STATS_RECONCILE_BATCH_SIZE
+            )
+            total += fixed
+            if after_id is None:
+                runs.finish(RECONCILE_JOB_NAME)
+                break
+        logger.info("Stats reconciled: %s rows updated", total)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    reconcile_message_stats(force=True)
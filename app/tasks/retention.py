@@ -0,0 +1,69 @@
+"""Move read messages older than MESSAGE_RETENTION_DAYS out of messages.
+
+Depending on MESSAGE_RETENTION_POLICY they go to messages_archive (still
+readable with ?include_archived=true) or are deleted. Work is done in batches
+of MESSAGE_RETENTION_BATCH_SIZE, each its own short transaction, with a pause
+in between so the job never holds locks for long or floods the WAL. Runs
+periodically inside the app and can be started by hand or from cron:
+
+    python -m app.tasks.retention
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.db import SessionLocal
+from app.logger import get_logger
+from app.services.message_service import MessageService
+
+logger = get_logger(__name__)
+
+# Arbitrary constant — lets only one worker run the job at a time
+RETENTION_LOCK_KEY = 7_301_003
+
+
+def retire_old_messages() -> None:
+    if settings.MESSAGE_RETENTION_DAYS <= 0:
+        logger.info("Message retention is disabled (MESSAGE_RETENTION_DAYS=0)")
+        return
+    cutoff = datetime.now(timezone.utc) - timedelta(
+        days=settings.MESSAGE_RETENTION_DAYS
+    )
+    archive = settings.MESSAGE_RETENTION_POLICY == "archive"
+    batch_size = settings.MESSAGE_RETENTION_BATCH_SIZE
+    db = SessionLocal()
+    try:
+        service = MessageService(db)
+        after_id = 0
+        total = 0
+        while True:
+            # Transaction-level lock, taken again for every batch: another
+            # worker that gets it in between only repeats the scan
+            locked = db.execute(
+                text("SELECT pg_try_advisory_xact_lock(:key)"),
+                {"key": RETENTION_LOCK_KEY},
+            ).scalar()
+            if not locked:
+                logger.info("Message retention already running elsewhere, skipping")
+                break
+            retired, after_id = service.retire_read_messages(
+                cutoff, after_id, batch_size, archive
+            )
+            total += retired
+            if retired < batch_size:
+                break
+            time.sleep(settings.MESSAGE_RETENTION_BATCH_PAUSE_MS / 1000)
+        logger.info(
+            "Message retention: %s messages %s",
+            total,
+            "archived" if archive else "deleted",
+        )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    retire_old_messages()
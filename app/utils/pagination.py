@@ -1,5 +1,13 @@
+import base64
+import binascii
+import json
+from typing import Any, Callable, Optional, Sequence
+
 from fastapi import Query
 
+from app.exceptions import BadRequestError
+from app.schemas import CursorPage
+
 
 class PaginationParams:
     def __init__(
@@ -10,3 +18,90 @@ class PaginationParams:
         self.page = page
         self.size = size
         self.offset = (page - 1) * size
+
+
+class CursorParams:
+    def __init__(
+        self,
+        after: Optional[str] = Query(
+            default=None, description="Cursor — return items after this position"
+        ),
+        before: Optional[str] = Query(
+            default=None, description="Cursor — return items before this position"
+        ),
+    ):
+        if after is not None and before is not None:
+            raise BadRequestError("Use either 'after' or 'before', not both")
+        self.after = after
+        self.before = before
+
+    @property
+    def active(self) -> bool:
+        return self.after is not None or self.before is not None
+
+
+# Cursors are opaque to clients: a base64url-encoded JSON list of the sort key values
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise BadRequestError("Invalid cursor")
+    if not isinstance(values, list) or not values:
+        raise BadRequestError("Invalid cursor")
+    return values
+
+
+def decode_id_cursor(cursor: Optional[str]) -> Optional[int]:
+    if cursor is None:
+        return None
+    values = decode_cursor(cursor)
+    # bool is a subclass of int — reject it explicitly
+    if len(values) != 1 or type(values[0]) is not int:
+        raise BadRequestError("Invalid cursor")
+    return values[0]
+
+
+def build_cursor_page(
+    rows: Sequence,
+    size: int,
+    after: Optional[str],
+    before: Optional[str],
+    key: Callable[[Any], tuple] = lambda row: (row.id,),
+    from_end: bool = False,
+) -> CursorPage:
+    """Turn a keyset query result into a page.
+
+    `rows` must be fetched with limit size + 1 in traversal order: ascending for
+    `after` (or no cursor), descending for `before`. The extra row only tells
+    whether another page exists and is not returned.
+
+    With `from_end` the list is treated as a live tail (a chat): a request
+    without a cursor starts at the last page, and the newest page always returns
+    a `next_cursor` so clients can poll for items that arrive later.
+    """
+    has_more = len(rows) > size
+    items = list(rows[:size])
+    backwards = before is not None or (from_end and after is None)
+    if backwards:
+        items.reverse()
+
+    first = encode_cursor(*key(items[0])) if items else None
+    last = encode_cursor(*key(items[-1])) if items else None
+
+    if backwards:
+        # Anything before the `before` cursor has the cursor item after it
+        next_cursor = last or before
+        prev_cursor = first if has_more else None
+    else:
+        next_cursor = (last or after) if (has_more or from_end) else None
+        prev_cursor = first if after is not None else None
+
+    return CursorPage(
+        items=items, size=size, next_cursor=next_cursor, prev_cursor=prev_cursor
+    )
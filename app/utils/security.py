@@ -1,18 +1,81 @@
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.config import settings
+from app.exceptions import ServiceUnavailableError
+from app.logger import get_logger
+from app.metrics import PASSWORD_HASH_DURATION, timed
+
+logger = get_logger(__name__)
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
+# bcrypt's cost factor is log2 of its work: each step doubles the hash time
+BCRYPT_MIN_ROUNDS = 4
+BCRYPT_MAX_ROUNDS = 31
+# Cheap enough to time quickly, slow enough that timer noise doesn't matter
+BCRYPT_CALIBRATION_ROUNDS = 8
+
 # bcrypt is intentionally slow to make brute-force attacks expensive
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
+def configure_bcrypt_rounds(rounds: int) -> None:
+    """Hash with `rounds` from now on, and treat weaker hashes as stale.
+
+    needs_update() — and so verify_and_update() — is true for hashes below
+    min_rounds, so login rehashes them. Stronger hashes are kept: workers or
+    hosts set to different costs then converge on the highest one instead of
+    rewriting each other's hashes at every login.
+    """
+    pwd_context.update(
+        bcrypt__rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=BCRYPT_MAX_ROUNDS,
+    )
+
+
+def calibrate_bcrypt_rounds(target_ms: float, samples: int = 3) -> int:
+    """The bcrypt cost whose hash time on this machine is closest to `target_ms`.
+
+    Times the fastest of `samples` hashes at BCRYPT_CALIBRATION_ROUNDS and
+    extrapolates — each extra round doubles the time — instead of timing the
+    expensive costs themselves.
+    """
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=BCRYPT_CALIBRATION_ROUNDS)
+    elapsed = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.hash("calibration")
+        elapsed.append(time.perf_counter() - started)
+    sample_ms = min(elapsed) * 1000
+    rounds = BCRYPT_CALIBRATION_ROUNDS + round(math.log2(target_ms / sample_ms))
+    rounds = max(BCRYPT_MIN_ROUNDS, min(BCRYPT_MAX_ROUNDS, rounds))
+    logger.info(
+        "bcrypt calibrated: cost %s, about %.0f ms per hash",
+        rounds,
+        sample_ms * 2 ** (rounds - BCRYPT_CALIBRATION_ROUNDS),
+    )
+    return rounds
+
+
+def current_bcrypt_rounds() -> int:
+    return pwd_context.handler("bcrypt").default_rounds
+
+
+configure_bcrypt_rounds(settings.BCRYPT_ROUNDS)
+
+
 def hash_password(password: str) -> str:
     # bcrypt automatically generates a random salt — same password produces different hashes each time
     return pwd_context.hash(password)
@@ -22,17 +85,97 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def create_access_token(user_id: str) -> str:
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """Verify, and if the hash is stale return a new one at the current cost."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """bcrypt on its own bounded thread pool, awaited from the event loop.
+
+    Run inline, a burst of logins fills Starlette's shared threadpool with
+    ~250 ms hashes and every other sync endpoint waits behind them. Here at
+    most `workers` hashes run at once (bcrypt releases the GIL while it works,
+    so threads are enough) and requests wait on the loop, not in a thread.
+
+    At most `max_pending` calls may be running or queued; beyond that calls
+    fail with ServiceUnavailableError (503) instead of queueing for seconds.
+    `pending` is the current depth, running plus queued.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        # Guards `pending` and `_executor`
+        self._lock = threading.Lock()
+        # Created on first use, and again after shutdown()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run("verify", verify_password, password, hashed_password)
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> tuple[bool, Optional[str]]:
+        # Verify and rehash in one pool slot — the plaintext is only here
+        return await self._run(
+            "verify", verify_and_update_password, password, hashed_password
+        )
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    async def _run(self, operation: str, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise ServiceUnavailableError(
+                    "Too many logins in progress, retry shortly"
+                )
+            self.pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+            executor = self._executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, timed, PASSWORD_HASH_DURATION, operation, fn, *args
+            )
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+
+password_hasher = PasswordHasher(
+    settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING
+)
+
+
+def create_access_token(user_id: str, claims: Optional[dict[str, Any]] = None) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     # "sub" (subject) is a standard JWT claim — conventionally holds the user identifier
-    payload = {"sub": user_id, "exp": expire}
+    payload = {**(claims or {}), "sub": user_id, "exp": expire}
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def decode_access_token(token: str) -> str | None:
+def decode_access_token_claims(token: str) -> dict[str, Any] | None:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload.get("sub")
     except JWTError:
         # Covers all invalid cases: expired, wrong signature, malformed
         return None
+    return payload if payload.get("sub") else None
+
+
+def decode_access_token(token: str) -> str | None:
+    claims = decode_access_token_claims(token)
+    return claims["sub"] if claims else None
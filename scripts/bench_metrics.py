@@ -0,0 +1,81 @@
+"""Measure what the Prometheus instrumentation adds per request and per statement.
+
+Usage:
+    python -m scripts.bench_metrics [--requests 200000] [--multiprocess]
+
+Runs a minimal ASGI app with and without MetricsMiddleware and reports the
+difference per request, then times the SQL statement hooks feeding the
+statement histogram.
+--multiprocess measures the PROMETHEUS_MULTIPROC_DIR mode, where every value
+lives in a memory-mapped file shared by the workers.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+
+async def endpoint(scope, receive, send):
+    # What the router leaves in the scope for the middleware to read
+    scope["route"] = SimpleNamespace(path="/messages/{message_id}/read")
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def send(message):
+    pass
+
+
+async def receive():
+    return {"type": "http.request"}
+
+
+async def per_request(app, requests: int) -> float:
+    scope = {"type": "http", "method": "POST", "path": "/messages/1/read"}
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+def per_statement(query_stats, statements: int) -> float:
+    # Outside a request, so only the histogram is fed
+    context = SimpleNamespace()
+    statement = "SELECT messages.id FROM messages WHERE messages.id = %(id)s"
+    started = time.perf_counter()
+    for _ in range(statements):
+        query_stats._before_cursor_execute(None, None, statement, None, context, False)
+        query_stats._after_cursor_execute(None, None, statement, None, context, False)
+    return (time.perf_counter() - started) / statements
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--multiprocess", action="store_true")
+    args = parser.parse_args()
+
+    if args.multiprocess:
+        # Read by prometheus_client when it is imported
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp()
+    from app import metrics, query_stats
+
+    query_stats.time_statements(metrics.observe_statement)
+
+    bare = asyncio.run(per_request(endpoint, args.requests))
+    instrumented = asyncio.run(
+        per_request(metrics.MetricsMiddleware(endpoint), args.requests)
+    )
+    mode = "multiprocess" if args.multiprocess else "single process"
+    print(f"{mode}:")
+    print(f"  request overhead    {(instrumented - bare) * 1e6:6.2f} µs")
+    print(
+        f"  statement overhead  {per_statement(query_stats, args.requests) * 1e6:6.2f} µs"
+    )
+
+
+if __name__ == "__main__":
+    main()
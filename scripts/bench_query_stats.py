@@ -0,0 +1,93 @@
+"""Measure what per-request SQL accounting adds per request and per statement.
+
+Usage:
+    python -m scripts.bench_query_stats [--requests 200000]
+
+Runs a minimal ASGI app with and without QueryStatsMiddleware and reports the
+difference per request, then times the statement hooks inside a request and
+outside of one (background tasks), where they only check the context variable,
+and inside a request again with the Prometheus histogram fed as well.
+"""
+
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app import metrics, query_stats
+
+STATEMENT = "SELECT messages.id FROM messages WHERE messages.id = %(id)s"
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def send(message):
+    pass
+
+
+async def receive():
+    return {"type": "http.request"}
+
+
+async def per_request(app, requests: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/messages/inbox"}
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+def per_statement(statements: int) -> float:
+    context = SimpleNamespace()
+    started = time.perf_counter()
+    for _ in range(statements):
+        query_stats._before_cursor_execute(None, None, STATEMENT, None, context, False)
+        query_stats._after_cursor_execute(None, None, STATEMENT, None, context, False)
+    return (time.perf_counter() - started) / statements
+
+
+async def per_statement_in_request(statements: int) -> float:
+    elapsed = 0.0
+
+    async def run_statements(scope, receive, send):
+        nonlocal elapsed
+        elapsed = per_statement(statements)
+        await endpoint(scope, receive, send)
+
+    # Every statement repeats the first: no N+1 report for this one
+    middleware = query_stats.QueryStatsMiddleware(run_statements, slow_query_ms=200)
+    await middleware({"type": "http", "method": "GET", "path": "/"}, receive, send)
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+
+    bare = asyncio.run(per_request(endpoint, args.requests))
+    accounted = asyncio.run(
+        per_request(
+            query_stats.QueryStatsMiddleware(
+                endpoint, slow_query_ms=200, repeat_threshold=5
+            ),
+            args.requests,
+        )
+    )
+    in_request = asyncio.run(per_statement_in_request(args.requests))
+    print(f"  request overhead              {(accounted - bare) * 1e6:6.2f} µs")
+    print(f"  statement overhead            {in_request * 1e6:6.2f} µs")
+    print(
+        f"  statement outside a request   {per_statement(args.requests) * 1e6:6.2f} µs"
+    )
+    # METRICS on as well: the same single timing also feeds the histogram
+    query_stats.time_statements(metrics.observe_statement)
+    in_request = asyncio.run(per_statement_in_request(args.requests))
+    print(f"  statement, with metrics       {in_request * 1e6:6.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Measure what a rate limit check costs per request.
+
+Usage:
+    python -m scripts.bench_rate_limiter [--checks 100000] [--keys 10000]
+
+Times RateLimiter.check on spread-out keys that stay under the limit, the
+path every request takes. The postgres mode needs the rate_limit_hits table
+(alembic upgrade head); its bench:* rows are deleted afterwards.
+"""
+
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+
+from app.db import SessionLocal
+from app.services.rate_limiter import RateLimiter
+
+
+def bench(limiter: RateLimiter, checks: int, keys: int) -> list[float]:
+    timings = []
+    for i in range(checks):
+        key = f"bench:{i % keys}"
+        started = time.perf_counter()
+        limiter.check(key, limit=checks)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(name: str, timings: list[float]) -> None:
+    timings.sort()
+    print(
+        f"{name:<10} {len(timings):>8} checks  "
+        f"mean {statistics.fmean(timings) * 1e6:8.1f} µs  "
+        f"p50 {timings[len(timings) // 2] * 1e6:8.1f} µs  "
+        f"p99 {timings[int(len(timings) * 0.99)] * 1e6:8.1f} µs"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checks", type=int, default=100_000)
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument(
+        "--postgres-checks",
+        type=int,
+        default=5_000,
+        help="Checks for the postgres mode, 0 to skip it",
+    )
+    args = parser.parse_args()
+
+    report("memory", bench(RateLimiter(window=60), args.checks, args.keys))
+    if args.postgres_checks > 0:
+        limiter = RateLimiter(window=60, shared=True)
+        try:
+            report("postgres", bench(limiter, args.postgres_checks, args.keys))
+        finally:
+            with SessionLocal() as db:
+                db.execute(text("DELETE FROM rate_limit_hits WHERE key LIKE 'bench:%'"))
+                db.commit()
+
+
+if __name__ == "__main__":
+    main()
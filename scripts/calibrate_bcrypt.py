@@ -0,0 +1,35 @@
+"""Find the bcrypt cost that takes about --target-ms per hash on this machine.
+
+Usage:
+    python -m scripts.calibrate_bcrypt [--target-ms 250]
+
+Run it on the hardware the app is deployed on and set BCRYPT_ROUNDS to the
+result. Pinning the cost fleet-wide keeps every user's hash at the same
+cost: with per-worker calibration (BCRYPT_TARGET_MS), users who log in through
+a faster host move up to its cost and stay there.
+"""
+
+import argparse
+import time
+
+from passlib.context import CryptContext
+
+from app.utils.security import calibrate_bcrypt_rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target-ms", type=float, default=250)
+    args = parser.parse_args()
+
+    rounds = calibrate_bcrypt_rounds(args.target_ms)
+    # Check the extrapolation with one real hash at the chosen cost
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+    started = time.perf_counter()
+    context.hash("calibration")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"BCRYPT_ROUNDS={rounds}  # {elapsed_ms:.0f} ms per hash")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Print EXPLAIN ANALYZE for the hot repository queries.
+
+Usage:
+    python -m scripts.explain_hot_queries [--verbose]
+
+The statements are captured from the real repository methods, so the plans
+always match what the app sends. Run on a seeded database (scripts/seed.py)
+before and after `alembic upgrade` to compare plans.
+"""
+
+import argparse
+from typing import Callable
+
+from sqlalchemy import event, text
+
+from app.db import SessionLocal, engine
+from app.repositories.message_repository import MessageRepository
+from app.repositories.user_repository import UserRepository
+
+# Offset of page 500 with the default page size
+DEEP_PAGE_OFFSET = 499 * 20
+
+
+def capture_last_statement(fn: Callable[[], object]) -> tuple[str, dict]:
+    captured = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+    return captured[-1]
+
+
+def explain(fn: Callable[[], object]) -> list[str]:
+    statement, parameters = capture_last_statement(fn)
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        raw.close()
+
+
+def pick_samples(db) -> dict:
+    # The busiest accounts are the worst case for every per-user query
+    receiver_id = db.execute(
+        text(
+            "SELECT receiver_id FROM messages GROUP BY receiver_id "
+            "ORDER BY count(*) DESC LIMIT 1"
+        )
+    ).scalar()
+    return {
+        "receiver_id": receiver_id,
+        # Last id of page 499 — `after` this cursor is the same rows as page 500
+        "deep_cursor_id": db.execute(
+            text(
+                "SELECT id FROM messages WHERE receiver_id = :receiver_id "
+                "ORDER BY id OFFSET :offset LIMIT 1"
+            ),
+            {"receiver_id": receiver_id, "offset": DEEP_PAGE_OFFSET - 1},
+        ).scalar(),
+        # A week-old message of the receiver — cursor queries near the live end
+        # of the inbox, where clients page and poll
+        "recent_cursor_id": db.execute(
+            text(
+                "SELECT max(id) FROM messages WHERE receiver_id = :receiver_id "
+                "AND created_at < now() - interval '7 days'"
+            ),
+            {"receiver_id": receiver_id},
+        ).scalar(),
+        "rare_word": db.execute(
+            text(
+                "SELECT split_part(text, ' ', 3) FROM messages "
+                "WHERE receiver_id = :receiver_id LIMIT 1"
+            ),
+            {"receiver_id": receiver_id},
+        ).scalar(),
+        "sender_id": db.execute(
+            text(
+                "SELECT sender_id FROM messages GROUP BY sender_id "
+                "ORDER BY count(*) DESC LIMIT 1"
+            )
+        ).scalar(),
+        "username": db.execute(
+            text("SELECT username FROM users WHERE is_active ORDER BY random() LIMIT 1")
+        ).scalar(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--verbose", action="store_true", help="Print full plans, not summaries"
+    )
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        samples = pick_samples(db)
+        messages = MessageRepository(db)
+        users = UserRepository(db)
+        receiver_id = samples["receiver_id"]
+        sender_id = samples["sender_id"]
+
+        queries = {
+            "inbox, page 1": lambda: messages.get_inbox(receiver_id, None, 0, 20),
+            "inbox unread, page 1": lambda: messages.get_inbox(
+                receiver_id, True, 0, 20
+            ),
+            "inbox, page 500": lambda: messages.get_inbox(
+                receiver_id, None, DEEP_PAGE_OFFSET, 20
+            ),
+            "inbox, cursor at page 500": lambda: messages.get_inbox_keyset(
+                receiver_id, None, samples["deep_cursor_id"], None, 21
+            ),
+            "inbox, cursor a week back": lambda: messages.get_inbox_keyset(
+                receiver_id, None, samples["recent_cursor_id"], None, 21
+            ),
+            "inbox, before a week-old cursor": lambda: messages.get_inbox_keyset(
+                receiver_id, None, None, samples["recent_cursor_id"], 21
+            ),
+            "inbox with archive, page 1": lambda: messages.get_inbox_keyset(
+                receiver_id, None, None, None, 21, include_archived=True
+            ),
+            # Every seeded text is "seed message <n>": one word in all of the
+            # user's messages, one in a single message
+            "search, common word": lambda: messages.search(
+                receiver_id, "message", None, None, 21
+            ),
+            "search, rare word": lambda: messages.search(
+                receiver_id, samples["rare_word"], None, None, 21
+            ),
+            "count inbox unread": lambda: messages.count_inbox(receiver_id, True),
+            "outbox, page 1": lambda: messages.get_outbox(sender_id, 0, 20),
+            "thread, latest page": lambda: messages.get_thread_keyset(
+                receiver_id, sender_id, None, None, 21
+            ),
+            "count outbox": lambda: messages.count_outbox(sender_id),
+            "login lookup": lambda: users.get_by_username(samples["username"]),
+            "user search, username": lambda: users.search(
+                samples["username"][1:], 0, 20
+            ),
+            "user search, id prefix": lambda: users.search(str(receiver_id)[:8], 0, 20),
+        }
+
+        for name, fn in queries.items():
+            plan = explain(fn)
+            print(f"== {name}")
+            if args.verbose:
+                print("\n".join(plan))
+            else:
+                scans = [line.strip() for line in plan if "Scan" in line]
+                print("\n".join(scans))
+                print(plan[-1].strip())
+            print()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
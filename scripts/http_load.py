@@ -0,0 +1,136 @@
+"""Drive API traffic at a running server and report throughput.
+
+Usage:
+    uvicorn app.main:app                  # sync handlers
+    ASYNC_DB=true uvicorn app.main:app    # async handlers on asyncpg
+    python -m scripts.http_load [--base-url URL] [--concurrency N] [--seconds S]
+        [--scenario read|send|login]
+
+Registers a few users, exchanges some messages between them, then keeps
+`concurrency` requests in flight for `seconds`. The `read` scenario picks from
+the endpoints a client polls most: inbox, unread count and the current user.
+The `send` scenario posts single messages between random users. The `login`
+scenario logs the users in over and over — run it next to `read` to see how a
+login storm affects everything else.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+
+import httpx
+
+PASSWORD = "LoadTest123"
+ENDPOINTS = (
+    "/messages/inbox?size=20",
+    "/messages/inbox?after=WzBd&size=20",
+    "/messages/unread-count",
+    "/users/me",
+)
+
+
+Account = tuple[str, dict, str]
+
+
+async def register(client: httpx.AsyncClient) -> Account:
+    username = f"load_{uuid.uuid4().hex[:12]}"
+    response = await client.post(
+        "/users/register", json={"username": username, "password": PASSWORD}
+    )
+    response.raise_for_status()
+    body = response.json()
+    headers = {"Authorization": f"Bearer {body['access_token']}"}
+    return body["user"]["id"], headers, username
+
+
+async def prepare(client: httpx.AsyncClient, users: int) -> list[Account]:
+    accounts = [await register(client) for _ in range(users)]
+    for _, headers, _ in accounts:
+        receiver_ids = [user_id for user_id, _, _ in random.sample(accounts, 5)]
+        response = await client.post(
+            "/messages/batch",
+            json={"text": "load test", "receiver_ids": receiver_ids},
+            headers=headers,
+        )
+        response.raise_for_status()
+    return accounts
+
+
+def read_request(accounts: list[Account]) -> tuple[str, str, dict]:
+    _, headers, _ = random.choice(accounts)
+    return "GET", random.choice(ENDPOINTS), {"headers": headers}
+
+
+def send_request(accounts: list[Account]) -> tuple[str, str, dict]:
+    (_, headers, _), (receiver_id, _, _) = random.sample(accounts, 2)
+    body = {"receiver_id": receiver_id, "text": "load test"}
+    return "POST", "/messages/", {"headers": headers, "json": body}
+
+
+def login_request(accounts: list[Account]) -> tuple[str, str, dict]:
+    _, _, username = random.choice(accounts)
+    body = {"username": username, "password": PASSWORD}
+    return "POST", "/users/login", {"json": body}
+
+
+SCENARIOS = {"read": read_request, "send": send_request, "login": login_request}
+
+
+async def run(
+    base_url: str, users: int, concurrency: int, seconds: float, scenario: str
+) -> None:
+    make_request = SCENARIOS[scenario]
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=120, limits=limits
+    ) as client:
+        accounts = await prepare(client, users)
+
+        latencies: list[float] = []
+        errors = 0
+        deadline = time.perf_counter() + seconds
+
+        async def worker() -> None:
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                method, url, kwargs = make_request(accounts)
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, url, **kwargs)
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) >= 2 else [0] * 99
+    print(
+        f"scenario={scenario} concurrency={concurrency} "
+        f"requests={len(latencies)} errors={errors} "
+        f"rps={len(latencies) / elapsed:.0f} "
+        f"p50={cuts[49] * 1000:.0f}ms p99={cuts[98] * 1000:.0f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="read")
+    args = parser.parse_args()
+    asyncio.run(
+        run(args.base_url, args.users, args.concurrency, args.seconds, args.scenario)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Fill the database with synthetic users and messages for benchmarks.
+
+Usage:
+    python -m scripts.seed --users 10000 --messages 1000000
+
+Message senders/receivers are skewed: a small group of "heavy" users gets a large
+share of the traffic, like popular accounts in a real messenger. Everything is
+generated inside Postgres with generate_series, so millions of rows take seconds.
+
+Messages are spread over the last year with created_at growing with the id, as
+in real traffic. Missing monthly partitions of messages are created first.
+"""
+
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db import engine
+from app.repositories.partition_repository import PartitionRepository
+from app.utils.security import hash_password
+
+SEED_PASSWORD = "Password1"
+SPAN_DAYS = 365
+
+
+def seed(
+    users: int,
+    messages: int,
+    heavy_users: float,
+    heavy_share: float,
+    read_share: float,
+) -> None:
+    # One bcrypt hash for everyone — hashing per user would dominate seeding time
+    password_hash = hash_password(SEED_PASSWORD)
+
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                """
+                INSERT INTO users (id, username, is_active, password_hash)
+                SELECT gen_random_uuid(), 'user' || n, n % 20 <> 0, :password_hash
+                FROM generate_series(1, :users) AS n
+                ON CONFLICT (username) DO NOTHING
+                """
+            ),
+            {"users": users, "password_hash": password_hash},
+        )
+        conn.execute(
+            text(
+                """
+                CREATE TEMP TABLE seed_users ON COMMIT DROP AS
+                SELECT row_number() OVER (ORDER BY username) AS n, id FROM users
+                """
+            )
+        )
+        conn.execute(text("CREATE UNIQUE INDEX ON seed_users (n)"))
+        total = conn.execute(text("SELECT count(*) FROM seed_users")).scalar()
+        heavy = max(1, int(total * heavy_users))
+
+        partitions = PartitionRepository(Session(bind=conn))
+        if partitions.is_partitioned():
+            today = datetime.now(timezone.utc).date()
+            partitions.create_missing(today - timedelta(days=SPAN_DAYS), today)
+
+        conn.execute(
+            text(
+                """
+                INSERT INTO messages (text, sender_id, receiver_id, is_read, created_at)
+                SELECT
+                    'seed message ' || g,
+                    s.id,
+                    r.id,
+                    random() < :read_share,
+                    now() - (1 - g::float / :messages) * interval '1 day' * :span_days
+                FROM (
+                    SELECT
+                        g,
+                        1 + floor(random() * :total)::int AS sender_n,
+                        CASE WHEN random() < :heavy_share
+                            THEN 1 + floor(random() * :heavy)::int
+                            ELSE 1 + floor(random() * :total)::int
+                        END AS receiver_n
+                    FROM generate_series(1, :messages) AS g
+                ) AS pick
+                JOIN seed_users s ON s.n = pick.sender_n
+                JOIN seed_users r ON r.n = pick.receiver_n
+                ORDER BY g
+                """
+            ),
+            {
+                "messages": messages,
+                "total": total,
+                "heavy": heavy,
+                "heavy_share": heavy_share,
+                "read_share": read_share,
+                "span_days": SPAN_DAYS,
+            },
+        )
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE users"))
+        conn.execute(text("VACUUM ANALYZE messages"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument(
+        "--heavy-users",
+        type=float,
+        default=0.001,
+        help="Fraction of users that receive the heavy share of messages",
+    )
+    parser.add_argument(
+        "--heavy-share",
+        type=float,
+        default=0.3,
+        help="Share of messages sent to the heavy users",
+    )
+    parser.add_argument("--read-share", type=float, default=0.8)
+    args = parser.parse_args()
+    seed(
+        args.users,
+        args.messages,
+        args.heavy_users,
+        args.heavy_share,
+        args.read_share,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Open many /ws sockets against a running server and measure delivery latency.
+
+Usage:
+    REALTIME_BRIDGE=true uvicorn app.main:app --workers 4
+    python -m scripts.ws_load [--base-url URL] [--sockets N] [--messages N]
+
+Registers throwaway users, connects one socket per user, sends messages over
+HTTP between random pairs and reports how long each message.created event took
+to reach its receiver. With several workers most sockets sit in a different
+process than the request that sent the message, so the run goes through the
+LISTEN/NOTIFY bridge.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+
+import httpx
+import websockets
+
+PASSWORD = "LoadTest123"
+
+
+async def register(
+    client: httpx.AsyncClient, semaphore: asyncio.Semaphore
+) -> tuple[str, str]:
+    async with semaphore:
+        response = await client.post(
+            "/users/register",
+            json={"username": f"load_{uuid.uuid4().hex[:12]}", "password": PASSWORD},
+        )
+    response.raise_for_status()
+    body = response.json()
+    return body["user"]["id"], body["access_token"]
+
+
+async def listen(
+    url: str, token: str, latencies: list[float], ready: asyncio.Event
+) -> None:
+    async with websockets.connect(f"{url}/ws?token={token}") as socket:
+        ready.set()
+        async for raw in socket:
+            event = json.loads(raw)
+            if event["type"] != "message.created":
+                continue
+            # The text carries the send time — only the receiver's copy counts
+            sent_at, receiver_token = event["data"]["text"].split(" ", 1)
+            if receiver_token == token[-16:]:
+                latencies.append(time.perf_counter() - float(sent_at))
+
+
+async def run(base_url: str, sockets: int, messages: int, concurrency: int) -> None:
+    ws_url = base_url.replace("http", "ws", 1)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        users = await asyncio.gather(
+            *(register(client, semaphore) for _ in range(sockets))
+        )
+        print(f"Registered {len(users)} users")
+
+        latencies: list[float] = []
+        ready = [asyncio.Event() for _ in users]
+        listeners = [
+            asyncio.create_task(listen(ws_url, token, latencies, event))
+            for (_, token), event in zip(users, ready)
+        ]
+        await asyncio.gather(*(event.wait() for event in ready))
+        print(f"Connected {len(listeners)} sockets")
+
+        async def send() -> None:
+            (_, sender_token), (receiver_id, receiver_token) = random.sample(users, 2)
+            async with semaphore:
+                response = await client.post(
+                    "/messages/",
+                    json={
+                        "receiver_id": receiver_id,
+                        "text": f"{time.perf_counter()} {receiver_token[-16:]}",
+                    },
+                    headers={"Authorization": f"Bearer {sender_token}"},
+                )
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(send() for _ in range(messages)))
+        elapsed = time.perf_counter() - started
+
+        # Give in-flight events a moment to arrive
+        deadline = time.perf_counter() + 5
+        while len(latencies) < messages and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+
+        for listener in listeners:
+            listener.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+
+    print(f"Sent {messages} messages in {elapsed:.2f}s ({messages / elapsed:.0f}/s)")
+    print(f"Delivered {len(latencies)}/{messages}")
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100)
+        print(
+            f"Latency ms: p50={cuts[49] * 1000:.1f} "
+            f"p99={cuts[98] * 1000:.1f} max={max(latencies) * 1000:.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--sockets", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=2_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.base_url, args.sockets, args.messages, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,21 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from app.exceptions import ServiceUnavailableError
 from app.utils.security import (
+    PasswordHasher,
+    calibrate_bcrypt_rounds,
+    configure_bcrypt_rounds,
+    current_bcrypt_rounds,
+    verify_and_update_password,
     hash_password,
     verify_password,
     create_access_token,
     decode_access_token,
+    decode_access_token_claims,
 )
 
 USER_ID = "b4ec85dc-47fb-4f37-bb43-bfb8c53952a7"
@@ -78,3 +91,84 @@ def test_decode_access_token_tampered_token():
     token = create_access_token(USER_ID)
     tampered = token[:-5] + "XXXXX"
     assert decode_access_token(tampered) is None
+
+
+def test_decode_access_token_claims_returns_extra_claims():
+    token = create_access_token(USER_ID, {"ver": 2, "sub": "someone-else"})
+
+    claims = decode_access_token_claims(token)
+
+    assert claims["ver"] == 2
+    # Extra claims can't override the subject
+    assert claims["sub"] == USER_ID
+
+
+# --- bcrypt cost ---
+
+
+def test_verify_and_update_rehashes_weaker_costs_only():
+    original = current_bcrypt_rounds()
+    configure_bcrypt_rounds(4)
+    try:
+        weaker = hash_password("Password1")
+        assert verify_and_update_password("Password1", weaker) == (True, None)
+
+        configure_bcrypt_rounds(5)
+        verified, new_hash = verify_and_update_password("Password1", weaker)
+        assert verified is True
+        assert new_hash.startswith("$2b$05$")
+        assert verify_and_update_password("WrongPassword1", weaker) == (False, None)
+
+        # A host set to a lower cost keeps the stronger hash as it is
+        configure_bcrypt_rounds(4)
+        assert verify_and_update_password("Password1", new_hash) == (True, None)
+    finally:
+        configure_bcrypt_rounds(original)
+
+
+def test_calibrate_bcrypt_rounds_adds_a_round_per_doubling():
+    # Sample hashes at cost 8 take 10 ms: 40 ms is two doublings away
+    with patch("app.utils.security.time.perf_counter", side_effect=[0, 0.01] * 3):
+        assert calibrate_bcrypt_rounds(40) == 10
+    with patch("app.utils.security.time.perf_counter", side_effect=[0, 0.01] * 3):
+        assert calibrate_bcrypt_rounds(0.001) == 4
+
+
+# --- PasswordHasher ---
+
+
+def test_password_hasher_runs_off_the_event_loop():
+    hasher = PasswordHasher(workers=1, max_pending=10)
+    threads = []
+
+    def fake_verify(password, hashed):
+        threads.append(threading.current_thread())
+        return True
+
+    with patch("app.utils.security.verify_password", side_effect=fake_verify):
+        assert asyncio.run(hasher.verify("Password1", "hashed")) is True
+    hasher.shutdown()
+
+    assert threads[0] is not threading.main_thread()
+    assert hasher.pending == 0
+
+
+def test_password_hasher_rejects_when_queue_is_full():
+    hasher = PasswordHasher(workers=1, max_pending=1)
+    release = threading.Event()
+
+    def slow_hash(password):
+        release.wait()
+        return "hashed"
+
+    async def burst():
+        first = asyncio.ensure_future(hasher.hash("one"))
+        await asyncio.sleep(0)
+        with pytest.raises(ServiceUnavailableError):
+            await hasher.hash("two")
+        release.set()
+        return await first
+
+    with patch("app.utils.security.hash_password", side_effect=slow_hash):
+        assert asyncio.run(burst()) == "hashed"
+    hasher.shutdown()
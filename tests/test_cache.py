@@ -0,0 +1,148 @@
+import uuid
+from unittest.mock import MagicMock, patch
+
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import create_engine, select
+
+from app.db import RoutingSession
+from app.dependencies import get_current_user
+from app.models import User
+from app.utils.cache import TTLCache
+from app.utils.security import create_access_token
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_returns_value_until_ttl_passes():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=30, clock=clock)
+    cache.set("a", 1)
+
+    clock.now = 29
+    assert cache.get("a") == 1
+    clock.now = 30
+    assert cache.get("a") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_zero_ttl_disables_the_cache():
+    cache = TTLCache(maxsize=10, ttl=0)
+    cache.set("a", 1)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_invalidate_drops_the_entry():
+    cache = TTLCache(maxsize=10, ttl=30)
+    cache.set("a", 1)
+
+    cache.invalidate("a")
+
+    assert cache.get("a") is None
+
+
+def test_set_after_invalidate_is_dropped():
+    cache = TTLCache(maxsize=10, ttl=30)
+    generation = cache.generation
+    # The load started before the invalidation, so its value may be stale
+    cache.invalidate("a")
+
+    cache.set("a", "stale", generation=generation)
+    assert cache.get("a") is None
+
+    cache.set("a", "fresh", generation=cache.generation)
+    assert cache.get("a") == "fresh"
+
+
+def test_get_current_user_does_not_cache_a_user_invalidated_during_the_load():
+    user_id = uuid.uuid4()
+    user = MagicMock(id=user_id, username="dima", is_active=True)
+    user.created_at = user.updated_at = "2026-01-01T00:00:00Z"
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=create_access_token(str(user_id))
+    )
+    cache = TTLCache(maxsize=10, ttl=30)
+
+    def load_then_deactivate(_user_id):
+        # deactivate_me commits and invalidates after this row was read
+        cache.invalidate(user_id)
+        return user
+
+    with (
+        patch("app.dependencies.current_user_cache", cache),
+        patch("app.dependencies.UserRepository") as repo_class,
+    ):
+        repo_class.return_value.get_active_by_id.side_effect = load_then_deactivate
+        get_current_user(credentials, db=MagicMock(used_replica=False))
+
+    assert cache.get(user_id) is None
+
+
+def test_get_current_user_queries_once_per_ttl():
+    user_id = uuid.uuid4()
+    user = MagicMock(id=user_id, username="dima", is_active=True)
+    user.created_at = user.updated_at = "2026-01-01T00:00:00Z"
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=create_access_token(str(user_id))
+    )
+    cache = TTLCache(maxsize=10, ttl=30)
+
+    with (
+        patch("app.dependencies.current_user_cache", cache),
+        patch("app.dependencies.UserRepository") as repo_class,
+    ):
+        repo_class.return_value.get_active_by_id.return_value = user
+        first = get_current_user(credentials, db=MagicMock(used_replica=False))
+        second = get_current_user(credentials, db=MagicMock(used_replica=False))
+
+    assert first == second
+    assert first.id == user_id
+    repo_class.return_value.get_active_by_id.assert_called_once()
+
+
+def test_get_current_user_does_not_cache_a_replica_read():
+    user_id = uuid.uuid4()
+    user = MagicMock(id=user_id, username="dima", is_active=True)
+    user.created_at = user.updated_at = "2026-01-01T00:00:00Z"
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=create_access_token(str(user_id))
+    )
+    cache = TTLCache(maxsize=10, ttl=30)
+    db = RoutingSession(
+        bind=create_engine("sqlite://"), replica=create_engine("sqlite://")
+    )
+
+    def load_from_replica(_user_id):
+        db.get_bind(clause=select(User))
+        return user
+
+    with (
+        patch("app.dependencies.current_user_cache", cache),
+        patch("app.dependencies.UserRepository") as repo_class,
+    ):
+        repo_class.return_value.get_active_by_id.side_effect = load_from_replica
+        assert get_current_user(credentials, db=db).id == user_id
+
+    assert db.used_replica
+    assert cache.get(user_id) is None
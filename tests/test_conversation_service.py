@@ -0,0 +1,59 @@
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.exceptions import BadRequestError
+from app.services.conversation_service import ConversationService
+from app.utils.pagination import encode_cursor
+
+
+def make_service():
+    service = ConversationService(db=MagicMock())
+    service.repo = MagicMock()
+    return service
+
+
+def make_conversation():
+    conversation = MagicMock()
+    conversation.peer_id = uuid.uuid4()
+    conversation.last_message_at = datetime.now(timezone.utc)
+    return conversation
+
+
+# --- list ---
+
+
+def test_list_first_page():
+    service = make_service()
+    user_id = uuid.uuid4()
+    conversations = [make_conversation() for _ in range(3)]
+    service.repo.list_keyset.return_value = conversations
+
+    result = service.list(user_id, after=None, before=None, size=2)
+
+    service.repo.list_keyset.assert_called_once_with(user_id, None, None, 3)
+    assert result.items == conversations[:2]
+    assert result.next_cursor is not None
+    assert result.prev_cursor is None
+
+
+def test_list_decodes_cursor():
+    service = make_service()
+    service.repo.list_keyset.return_value = []
+    last_message_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    peer_id = uuid.uuid4()
+    cursor = encode_cursor(last_message_at.isoformat(), str(peer_id))
+
+    service.list(uuid.uuid4(), after=cursor, before=None, size=20)
+
+    after = service.repo.list_keyset.call_args.args[1]
+    assert after == (last_message_at, peer_id)
+
+
+def test_list_invalid_cursor():
+    service = make_service()
+
+    with pytest.raises(BadRequestError):
+        service.list(uuid.uuid4(), after=encode_cursor(1), before=None, size=20)
@@ -0,0 +1,44 @@
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import exc as sa_exc
+
+from app.db import InstrumentedQueuePool, pool_stats
+
+
+def make_pool(**kwargs):
+    return InstrumentedQueuePool(MagicMock, **kwargs)
+
+
+def test_pool_stats_count_checkouts_and_usage():
+    pool = make_pool(pool_size=2, max_overflow=1)
+
+    first = pool.connect()
+    second = pool.connect()
+    third = pool.connect()
+    third.close()
+    stats = pool_stats(pool)
+
+    assert stats["checkouts"] == 3
+    assert stats["checked_out"] == 2
+    # Three connections are open for a pool of two, one of them idle
+    assert stats["overflow"] == 1
+    assert stats["idle"] == 1
+    assert stats["timeouts"] == 0
+    assert stats["checkout_ms_max"] >= 0
+    first.close()
+    second.close()
+
+
+def test_pool_stats_count_timeouts():
+    pool = make_pool(pool_size=1, max_overflow=0, timeout=0.01)
+    held = pool.connect()
+
+    with pytest.raises(sa_exc.TimeoutError):
+        pool.connect()
+    stats = pool_stats(pool)
+
+    assert stats["timeouts"] == 1
+    assert stats["checkouts"] == 2
+    assert stats["checkout_ms_max"] >= 10
+    held.close()
@@ -0,0 +1,88 @@
+from unittest.mock import MagicMock
+
+from sqlalchemy import create_engine, select, text, update
+from sqlalchemy.exc import OperationalError
+
+from app.db import ReplicaSet, RoutingSession
+from app.models import User
+
+
+def make_session():
+    primary = create_engine("sqlite://")
+    replica = create_engine("sqlite://")
+    return RoutingSession(bind=primary, replica=replica), primary, replica
+
+
+def test_plain_selects_go_to_the_replica():
+    session, primary, replica = make_session()
+
+    assert session.get_bind(clause=select(User)) is replica
+    assert session.get_bind(clause=select(User.id).where(User.id == 1)) is replica
+    assert session.used_replica
+
+
+def test_first_write_pins_the_session_to_the_primary():
+    session, primary, replica = make_session()
+    assert session.get_bind(clause=select(User)) is replica
+
+    assert session.get_bind(clause=update(User).values(is_active=False)) is primary
+    # Reads after the write see it
+    assert session.get_bind(clause=select(User)) is primary
+
+
+def test_locking_and_text_statements_go_to_the_primary():
+    session, primary, _ = make_session()
+    assert session.get_bind(clause=select(User).with_for_update()) is primary
+
+    session, primary, _ = make_session()
+    assert session.get_bind(clause=text("SELECT 1")) is primary
+
+
+def test_without_replica_everything_goes_to_the_primary():
+    primary = create_engine("sqlite://")
+    session = RoutingSession(bind=primary)
+
+    assert session.get_bind(clause=select(User)) is primary
+    assert not session.used_replica
+    assert not session.used_replica
+
+
+def make_replica(lag):
+    replica = MagicMock()
+    conn = replica.connect.return_value.__enter__.return_value
+    if isinstance(lag, Exception):
+        replica.connect.side_effect = lag
+    else:
+        conn.execute.return_value.scalar.return_value = lag
+    return replica
+
+
+def test_replica_set_serves_only_healthy_replicas_in_turn():
+    fresh, lagging, down = (
+        make_replica(0.2),
+        make_replica(30.0),
+        make_replica(OperationalError("SELECT", {}, Exception("refused"))),
+    )
+    other = make_replica(0.0)
+    replicas = ReplicaSet([fresh, lagging, down, other], [], max_lag=5)
+    # Nothing is trusted before the first check
+    assert replicas.pick() is None
+
+    replicas.check()
+
+    assert [replicas.pick() for _ in range(4)] == [fresh, other, fresh, other]
+    assert [r["healthy"] for r in replicas.status()] == [True, False, False, True]
+    assert replicas.lag == [0.2, 30.0, None, 0.0]
+
+
+def test_replica_set_falls_back_to_primary_and_recovers():
+    replica = make_replica(60.0)
+    replicas = ReplicaSet([replica], [], max_lag=5)
+    replicas.check()
+    assert replicas.pick() is None
+
+    conn = replica.connect.return_value.__enter__.return_value
+    conn.execute.return_value.scalar.return_value = 1.0
+    replicas.check()
+
+    assert replicas.pick() is replica
@@ -0,0 +1,105 @@
+import uuid
+from unittest.mock import patch
+
+import pytest
+
+from app.exceptions import ServiceUnavailableError
+from app.services.message_ingest import MessageIngest
+
+
+def make_ingest(queue_size=10, max_batch=10):
+    return MessageIngest(queue_size=queue_size, max_batch=max_batch, max_delay=0)
+
+
+def submit(ingest, text="hello"):
+    return ingest.submit(text, uuid.uuid4(), uuid.uuid4())
+
+
+@pytest.fixture
+def sync_service():
+    # Echo the text back so results can be matched to their sends
+    with (
+        patch("app.services.message_ingest.SessionLocal"),
+        patch("app.services.message_ingest.MessageService") as service_class,
+    ):
+        service = service_class.return_value
+        service.create_queued.side_effect = lambda rows: [r["text"] for r in rows]
+        yield service
+
+
+def test_queued_sends_are_written_in_one_batch(sync_service):
+    ingest = make_ingest()
+    ingest._accepting = True
+    futures = [submit(ingest, text) for text in ("a", "b", "c")]
+
+    ingest.start()
+    ingest.stop()
+
+    assert [f.result(timeout=1) for f in futures] == ["a", "b", "c"]
+    sync_service.create_queued.assert_called_once()
+
+
+def test_batches_are_capped_at_max_batch(sync_service):
+    ingest = make_ingest(max_batch=2)
+    ingest._accepting = True
+    futures = [submit(ingest, str(i)) for i in range(5)]
+
+    ingest.start()
+    ingest.stop()
+
+    assert [f.result(timeout=1) for f in futures] == ["0", "1", "2", "3", "4"]
+    assert sync_service.create_queued.call_count == 3
+
+
+def test_failed_batch_fails_every_send(sync_service):
+    sync_service.create_queued.side_effect = RuntimeError("db down")
+    ingest = make_ingest()
+    ingest._accepting = True
+    futures = [submit(ingest), submit(ingest)]
+
+    ingest.start()
+    ingest.stop()
+
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=1)
+
+
+def test_full_queue_rejects_send():
+    ingest = make_ingest(queue_size=1)
+    ingest._accepting = True
+    submit(ingest)
+
+    with pytest.raises(ServiceUnavailableError):
+        submit(ingest)
+
+
+def test_send_after_stop_is_rejected(sync_service):
+    ingest = make_ingest()
+    ingest.start()
+    ingest.stop()
+
+    with pytest.raises(ServiceUnavailableError):
+        submit(ingest)
+
+
+def test_stop_is_idempotent(sync_service):
+    ingest = make_ingest()
+    ingest.start()
+    ingest.stop()
+    ingest.stop()
+
+    assert not ingest._thread.is_alive()
+
+
+def test_write_uses_one_session_per_batch(sync_service):
+    ingest = make_ingest()
+    ingest._accepting = True
+    submit(ingest)
+    submit(ingest)
+
+    with patch("app.services.message_ingest.SessionLocal") as session_local:
+        ingest.start()
+        ingest.stop()
+
+    session_local.assert_called_once_with()
@@ -1,18 +1,39 @@
+import asyncio
 import uuid
-from unittest.mock import MagicMock
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from prometheus_client import REGISTRY
 
-from app.services.message_service import MessageService
+from app.exceptions import BadRequestError, ForbiddenError
+from app.schemas import MessageBatchCreate, MessageBulkRead, MessageResponse
+from app.services.message_service import AsyncMessageService, MessageService
+from app.utils.pagination import encode_cursor
 
 
 def make_service():
     service = MessageService(db=MagicMock())
     service.repo = MagicMock()
     service.user_repo = MagicMock()
+    service.stats_repo = MagicMock()
+    service.conversation_repo = MagicMock()
+    service.partition_repo = MagicMock()
+    service.events = MagicMock()
+    # No stats row by default — totals fall back to count queries
+    service.stats_repo.get.return_value = None
     return service
 
 
+def make_stats(inbox_total=0, inbox_unread=0, sent_total=0):
+    stats = MagicMock()
+    stats.inbox_total = inbox_total
+    stats.inbox_unread = inbox_unread
+    stats.sent_total = sent_total
+    return stats
+
+
 def make_user_id():
     return uuid.uuid4()
 
@@ -44,6 +65,70 @@ def test_create_success():
     assert result == message
 
 
+def test_create_updates_counters():
+    service = make_service()
+    service.user_repo.get_by_id.return_value = MagicMock(is_active=True)
+    sender_id, receiver_id = make_user_id(), make_user_id()
+
+    service.create(MagicMock(receiver_id=receiver_id, text="hello"), sender_id)
+
+    deltas = service.stats_repo.apply.call_args.args[0]
+    assert deltas[sender_id]["sent_total"] == 1
+    assert deltas[receiver_id]["inbox_total"] == 1
+    assert deltas[receiver_id]["inbox_unread"] == 1
+
+
+def test_create_updates_conversation_and_commits_once():
+    service = make_service()
+    service.user_repo.get_by_id.return_value = MagicMock(is_active=True)
+    message = make_message()
+    service.repo.create.return_value = message
+
+    service.create(MagicMock(receiver_id=uuid.uuid4(), text="hello"), make_user_id())
+
+    service.conversation_repo.on_messages_created.assert_called_once_with([message])
+    service.events.message_created.assert_called_once_with([message])
+    service.db.commit.assert_called_once()
+
+
+def test_create_with_ingest_queues_the_send():
+    service = make_service()
+    service.ingest = MagicMock()
+    service.user_repo.get_by_id.return_value = MagicMock(is_active=True)
+    sender_id, receiver_id = make_user_id(), make_user_id()
+
+    result = service.create(MagicMock(receiver_id=receiver_id, text="hi"), sender_id)
+
+    service.ingest.submit.assert_called_once_with("hi", sender_id, receiver_id)
+    assert result == service.ingest.submit.return_value.result.return_value
+    # The request's connection goes back to the pool while the writer works
+    service.db.rollback.assert_called_once()
+    service.repo.create.assert_not_called()
+    service.db.commit.assert_not_called()
+
+
+def test_create_queued_writes_batch_in_one_transaction():
+    service = make_service()
+    sender_id, receiver_a, receiver_b = make_user_id(), make_user_id(), make_user_id()
+    rows = [
+        {"text": "a", "sender_id": sender_id, "receiver_id": receiver_a},
+        {"text": "b", "sender_id": sender_id, "receiver_id": receiver_b},
+    ]
+    messages = [make_batch_message(receiver_a), make_batch_message(receiver_b)]
+    service.repo.insert_rows.return_value = messages
+
+    result = service.create_queued(rows)
+
+    assert [r.receiver_id for r in result] == [receiver_a, receiver_b]
+    deltas = service.stats_repo.apply.call_args.args[0]
+    assert deltas[sender_id]["sent_total"] == 2
+    assert deltas[receiver_a]["inbox_unread"] == 1
+    service.repo.insert_rows.assert_called_once_with(rows)
+    service.conversation_repo.on_messages_created.assert_called_once_with(messages)
+    service.events.message_created.assert_called_once_with(messages)
+    service.db.commit.assert_called_once()
+
+
 def test_create_receiver_not_found():
     service = make_service()
     service.user_repo.get_by_id.return_value = None
@@ -66,6 +151,56 @@ def test_create_receiver_inactive():
     assert "Receiver not found" in str(exc_info.value)
 
 
+# --- create_batch ---
+
+
+def make_batch_message(receiver_id):
+    return MessageResponse(
+        id=1,
+        text="hello",
+        sender_id=uuid.uuid4(),
+        receiver_id=receiver_id,
+        is_read=False,
+        created_at=datetime.now(),
+        updated_at=datetime.now(),
+    )
+
+
+def test_create_batch_reports_rejected_receivers():
+    service = make_service()
+    active, inactive = make_user_id(), make_user_id()
+    sender_id = make_user_id()
+    service.user_repo.get_active_ids.return_value = {active}
+    service.repo.create_many.return_value = [make_batch_message(active)]
+
+    result = service.create_batch(
+        MessageBatchCreate(text="hello", receiver_ids=[active, inactive, active]),
+        sender_id,
+    )
+
+    service.repo.create_many.assert_called_once_with("hello", sender_id, [active])
+    assert result.rejected == [inactive]
+    assert len(result.items) == 1
+    deltas = service.stats_repo.apply.call_args.args[0]
+    assert deltas[sender_id]["sent_total"] == 1
+    service.db.commit.assert_called_once()
+
+
+def test_create_batch_all_rejected():
+    service = make_service()
+    receiver_id = make_user_id()
+    service.user_repo.get_active_ids.return_value = set()
+
+    result = service.create_batch(
+        MessageBatchCreate(text="hello", receiver_ids=[receiver_id]), make_user_id()
+    )
+
+    assert result.items == []
+    assert result.rejected == [receiver_id]
+    service.repo.create_many.assert_not_called()
+    service.events.message_created.assert_not_called()
+
+
 # --- get_inbox ---
 
 
@@ -166,10 +301,100 @@ def test_delete_success():
     service = make_service()
     user_id = make_user_id()
     service.repo.get_by_id.return_value = make_message(sender_id=user_id, is_read=False)
+    deleted_before = REGISTRY.get_sample_value("messages_deleted_total")
 
     service.delete(message_id=1, user_id=user_id)
 
     service.repo.delete.assert_called_once()
+    deltas = service.stats_repo.apply.call_args.args[0]
+    assert deltas[user_id]["sent_total"] == -1
+    service.events.message_deleted.assert_called_once()
+    service.db.commit.assert_called_once()
+    assert REGISTRY.get_sample_value("messages_deleted_total") == deleted_before + 1
+
+
+def test_delete_last_message_replaces_conversation_preview():
+    service = make_service()
+    user_id = make_user_id()
+    message = make_message(sender_id=user_id)
+    service.repo.get_by_id.return_value = message
+    service.conversation_repo.get.return_value = MagicMock(last_message_id=1)
+    previous = make_message()
+    service.repo.get_last_between.return_value = previous
+
+    service.delete(message_id=1, user_id=user_id)
+
+    service.conversation_repo.replace_last_message.assert_called_once_with(
+        user_id, message.receiver_id, 1, previous
+    )
+
+
+def test_delete_older_message_keeps_conversation_preview():
+    service = make_service()
+    user_id = make_user_id()
+    service.repo.get_by_id.return_value = make_message(sender_id=user_id)
+    service.conversation_repo.get.return_value = MagicMock(last_message_id=2)
+
+    service.delete(message_id=1, user_id=user_id)
+
+    service.conversation_repo.replace_last_message.assert_not_called()
+
+
+# --- retention ---
+
+
+def test_retire_read_messages_drops_totals_and_returns_last_id():
+    service = make_service()
+    sender_id, receiver_id = make_user_id(), make_user_id()
+    service.repo.retire_read_before.return_value = [
+        (7, sender_id, receiver_id),
+        (9, sender_id, receiver_id),
+    ]
+    cutoff = datetime.now(timezone.utc)
+
+    result = service.retire_read_messages(cutoff, 5, 100, archive=True)
+
+    assert result == (2, 9)
+    service.repo.retire_read_before.assert_called_once_with(cutoff, 5, 100, True)
+    deltas = service.stats_repo.apply.call_args.args[0]
+    assert deltas[sender_id]["sent_total"] == -2
+    assert deltas[receiver_id]["inbox_total"] == -2
+    assert deltas[receiver_id]["inbox_unread"] == 0
+    service.db.commit.assert_called_once()
+
+
+def test_retire_read_messages_with_nothing_left_keeps_position():
+    service = make_service()
+    service.repo.retire_read_before.return_value = []
+
+    result = service.retire_read_messages(datetime.now(timezone.utc), 5, 100, False)
+
+    assert result == (0, 5)
+
+
+def test_detach_partition_takes_its_messages_out_of_counters_and_chats():
+    service = make_service()
+    alice, bob = sorted((make_user_id(), make_user_id()))
+    service.partition_repo.message_counts.return_value = [
+        (alice, bob, 3, 2),
+        (bob, alice, 1, 0),
+    ]
+    service.partition_repo.conversations_ending_in.return_value = [(alice, bob, 42)]
+    earlier = MagicMock(id=17)
+    service.repo.get_last_between.return_value = earlier
+
+    service.detach_partition("messages_p2026_07")
+
+    service.partition_repo.detach.assert_called_once_with("messages_p2026_07")
+    deltas = service.stats_repo.apply.call_args.args[0]
+    assert deltas[alice] == {"sent_total": -3, "inbox_total": -1, "inbox_unread": 0}
+    assert deltas[bob] == {"sent_total": -1, "inbox_total": -3, "inbox_unread": -2}
+    service.conversation_repo.decrement_unread.assert_called_once_with(bob, {alice: 2})
+    service.conversation_repo.replace_last_message.assert_called_once_with(
+        alice, bob, 42, earlier
+    )
+    # The maintenance task commits the whole run
+    service.db.commit.assert_not_called()
 
 
 # --- read_message ---
@@ -195,3 +420,261 @@ def test_read_message_success():
 
     service.repo.mark_as_read.assert_called_once_with(message)
     assert result == message
+    deltas = service.stats_repo.apply.call_args.args[0]
+    assert list(deltas.values())[0]["inbox_unread"] == -1
+    service.events.messages_read.assert_called_once()
+
+
+def test_read_message_already_read_is_noop():
+    service = make_service()
+    message = make_message(is_read=True)
+    service.repo.get_by_id_and_receiver.return_value = message
+
+    result = service.read_message(message_id=1, user_id=make_user_id())
+
+    assert result == message
+    service.repo.mark_as_read.assert_not_called()
+    service.stats_repo.apply.assert_not_called()
+    service.events.messages_read.assert_not_called()
+
+
+def test_get_thread_passes_both_users():
+    service = make_service()
+    user_id, peer_id = make_user_id(), make_user_id()
+    service.repo.get_thread_keyset.return_value = []
+
+    service.get_thread(user_id, peer_id, after=None, before=encode_cursor(5), size=10)
+
+    service.repo.get_thread_keyset.assert_called_once_with(
+        user_id, peer_id, None, 5, 11, False
+    )
+
+
+# --- read_many ---
+
+
+def test_read_many_updates_counters_per_sender():
+    service = make_service()
+    user_id = make_user_id()
+    sender_a, sender_b = make_user_id(), make_user_id()
+    rows = [(1, sender_a), (2, sender_b), (3, sender_a)]
+    service.repo.mark_many_as_read.return_value = rows
+
+    result = service.read_many(user_id, MessageBulkRead(up_to_id=10))
+
+    assert result == 3
+    service.repo.mark_many_as_read.assert_called_once_with(
+        user_id, ids=None, up_to_id=10, sender_id=None
+    )
+    deltas = service.stats_repo.apply.call_args.args[0]
+    assert deltas[user_id]["inbox_unread"] == -3
+    service.conversation_repo.decrement_unread.assert_called_once_with(
+        user_id, {sender_a: 2, sender_b: 1}
+    )
+    service.events.messages_read.assert_called_once_with(user_id, rows)
+    service.db.commit.assert_called_once()
+
+
+def test_read_many_nothing_changed():
+    service = make_service()
+    service.repo.mark_many_as_read.return_value = []
+
+    result = service.read_many(make_user_id(), MessageBulkRead(ids=[1, 2]))
+
+    assert result == 0
+    service.stats_repo.apply.assert_not_called()
+    service.db.commit.assert_not_called()
+
+
+# --- counters ---
+
+
+def test_get_inbox_total_from_stats():
+    service = make_service()
+    service.repo.get_inbox.return_value = []
+    service.stats_repo.get.return_value = make_stats(inbox_total=10, inbox_unread=3)
+
+    unread = service.get_inbox(make_user_id(), unread_only=True, page=1, size=20)
+    read = service.get_inbox(make_user_id(), unread_only=False, page=1, size=20)
+
+    assert unread.total == 3
+    assert read.total == 7
+    service.repo.count_inbox.assert_not_called()
+
+
+def test_get_outbox_total_from_stats():
+    service = make_service()
+    service.repo.get_outbox.return_value = []
+    service.stats_repo.get.return_value = make_stats(sent_total=4)
+
+    result = service.get_outbox(make_user_id(), page=1, size=20)
+
+    assert result.total == 4
+    service.repo.count_outbox.assert_not_called()
+
+
+def test_get_unread_count():
+    service = make_service()
+    service.stats_repo.get.return_value = make_stats(inbox_unread=5)
+    assert service.get_unread_count(make_user_id()) == 5
+
+
+def test_get_unread_count_without_stats_row():
+    service = make_service()
+    assert service.get_unread_count(make_user_id()) == 0
+
+
+# --- cursor mode ---
+
+
+def test_get_inbox_cursor_decodes_cursor():
+    service = make_service()
+    user_id = make_user_id()
+    service.repo.get_inbox_keyset.return_value = []
+
+    service.get_inbox_cursor(
+        user_id, unread_only=None, after=encode_cursor(10), before=None, size=20
+    )
+
+    service.repo.get_inbox_keyset.assert_called_once_with(
+        user_id, None, 10, None, 21, False
+    )
+    service.repo.count_inbox.assert_not_called()
+
+
+def test_get_inbox_after_reads_forward_from_watermark():
+    service = make_service()
+    user_id = make_user_id()
+
+    service.get_inbox_after(user_id, after_id=42, size=20)
+
+    service.repo.get_inbox_keyset.assert_called_once_with(user_id, None, 42, None, 20)
+
+
+def test_get_outbox_cursor_has_next_page():
+    service = make_service()
+    messages = [make_message() for _ in range(3)]
+    for i, message in enumerate(messages, start=1):
+        message.id = i
+    service.repo.get_outbox_keyset.return_value = messages
+
+    result = service.get_outbox_cursor(make_user_id(), after=None, before=None, size=2)
+
+    assert result.items == messages[:2]
+    assert result.next_cursor == encode_cursor(2)
+    service.repo.count_outbox.assert_not_called()
+
+
+def test_get_inbox_page_mode_returns_next_cursor():
+    service = make_service()
+    message = make_message()
+    message.id = 7
+    service.repo.get_inbox.return_value = [message]
+    service.repo.count_inbox.return_value = 5
+
+    result = service.get_inbox(make_user_id(), unread_only=None, page=1, size=1)
+
+    assert result.next_cursor == encode_cursor(7)
+    assert result.prev_cursor is None
+
+
+# --- search ---
+
+
+def make_search_row(message_id, rank):
+    now = datetime.now(timezone.utc)
+    message = MessageResponse(
+        id=message_id,
+        text="lunch tomorrow",
+        sender_id=uuid.uuid4(),
+        receiver_id=uuid.uuid4(),
+        is_read=False,
+        created_at=now,
+        updated_at=now,
+    )
+    return message, rank
+
+
+def test_search_pages_by_rank_and_id():
+    service = make_service()
+    user_id = make_user_id()
+    service.repo.search.return_value = [
+        make_search_row(9, 0.5),
+        make_search_row(4, 0.25),
+        make_search_row(7, 0.1),
+    ]
+
+    result = service.search(
+        user_id, "lunch", after=encode_cursor(0.75, 12), before=None, size=2
+    )
+
+    service.repo.search.assert_called_once_with(user_id, "lunch", (0.75, 12), None, 3)
+    assert [hit.id for hit in result.items] == [9, 4]
+    assert result.items[0].rank == 0.5
+    assert result.next_cursor == encode_cursor(0.25, 4)
+
+
+def test_search_rejects_id_only_cursor():
+    service = make_service()
+
+    with pytest.raises(BadRequestError):
+        service.search(
+            make_user_id(), "lunch", after=encode_cursor(3), before=None, size=20
+        )
+
+    service.repo.search.assert_not_called()
+
+
+# --- async service ---
+
+
+def make_async_service():
+    session = MagicMock()
+    db = MagicMock()
+    db.run_sync = AsyncMock(side_effect=lambda fn: fn(session))
+    return AsyncMessageService(db), session
+
+
+def test_async_service_runs_sync_logic_on_the_session():
+    service, session = make_async_service()
+    user_id = make_user_id()
+    data = MessageBulkRead(up_to_id=10)
+
+    with patch("app.services.message_service.MessageService") as sync_service:
+        sync_service.read_many.return_value = 3
+        result = asyncio.run(service.read_many(user_id, data))
+
+    assert result == 3
+    sync_service.assert_called_once_with(session)
+    sync_service.read_many.assert_called_once_with(
+        sync_service.return_value, user_id, data
+    )
+    service.db.run_sync.assert_awaited_once()
+
+
+def test_async_create_with_ingest_awaits_the_writer():
+    service, _ = make_async_service()
+    service.db.rollback = AsyncMock()
+    service.ingest = MagicMock()
+    response = make_batch_message(make_user_id())
+    future = Future()
+    future.set_result(response)
+    service.ingest.submit.return_value = future
+    data = MagicMock(receiver_id=make_user_id(), text="hi")
+
+    with patch("app.services.message_service.MessageService") as sync_service:
+        result = asyncio.run(service.create(data, make_user_id()))
+
+    assert result == response
+    sync_service.check_receiver.assert_called_once()
+    sync_service.create.assert_not_called()
+    service.db.rollback.assert_awaited_once()
+
+
+def test_async_service_propagates_errors():
+    service, _ = make_async_service()
+
+    with patch("app.services.message_service.MessageService") as sync_service:
+        sync_service.delete.side_effect = ForbiddenError("nope")
+        with pytest.raises(ForbiddenError):
+            asyncio.run(service.delete(1, make_user_id()))
@@ -0,0 +1,65 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from app import metrics, query_stats
+from app.main import app as main_app
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        return {"id": item_id}
+
+    labels = {"method": "GET", "route": "/items/{item_id}"}
+    before = sample("http_requests_total", status="200", **labels)
+    observed_before = sample("http_request_duration_seconds_count", **labels)
+    unmatched_before = sample(
+        "http_requests_total", method="GET", route="unmatched", status="404"
+    )
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/no/such/path")
+
+    assert sample("http_requests_total", status="200", **labels) == before + 2
+    assert (
+        sample("http_request_duration_seconds_count", **labels) == observed_before + 2
+    )
+    assert (
+        sample("http_requests_total", method="GET", route="unmatched", status="404")
+        == unmatched_before + 1
+    )
+    assert sample("http_requests_in_flight") == 0
+
+
+def test_statements_are_timed_by_operation():
+    query_stats.time_statements(metrics.observe_statement)
+    engine = create_engine("sqlite://")
+    before = sample("db_statement_duration_seconds_count", operation="SELECT")
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("  select 2"))
+
+    assert (
+        sample("db_statement_duration_seconds_count", operation="SELECT") == before + 2
+    )
+
+
+def test_metrics_endpoint_serves_prometheus_text():
+    response = TestClient(main_app).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert "messages_created_total" in response.text
@@ -1,4 +1,14 @@
-from app.utils.pagination import PaginationParams
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.exceptions import BadRequestError
+from app.utils.pagination import (
+    PaginationParams,
+    build_cursor_page,
+    decode_id_cursor,
+    encode_cursor,
+)
 
 
 def make_pagination(page: int, size: int) -> PaginationParams:
@@ -30,3 +40,79 @@ def test_third_page_offset():
 def test_offset_with_large_page():
     p = make_pagination(page=5, size=100)
     assert p.offset == 400
+
+
+# --- cursors ---
+
+
+def make_row(row_id: int):
+    row = MagicMock()
+    row.id = row_id
+    return row
+
+
+def test_cursor_roundtrip():
+    assert decode_id_cursor(encode_cursor(42)) == 42
+
+
+def test_cursor_is_opaque_string():
+    cursor = encode_cursor(42)
+    assert "42" not in cursor
+
+
+def test_decode_cursor_none():
+    assert decode_id_cursor(None) is None
+
+
+def test_decode_cursor_garbage():
+    with pytest.raises(BadRequestError):
+        decode_id_cursor("not-a-cursor!")
+
+
+def test_decode_cursor_wrong_type():
+    with pytest.raises(BadRequestError):
+        decode_id_cursor(encode_cursor("42"))
+
+
+# --- build_cursor_page ---
+
+
+def test_first_page_has_next_cursor_only():
+    rows = [make_row(i) for i in (1, 2, 3)]
+    page = build_cursor_page(rows, size=2, after=None, before=None)
+    assert [r.id for r in page.items] == [1, 2]
+    assert decode_id_cursor(page.next_cursor) == 2
+    assert page.prev_cursor is None
+
+
+def test_last_page_after_cursor():
+    rows = [make_row(5)]
+    page = build_cursor_page(rows, size=2, after=encode_cursor(4), before=None)
+    assert [r.id for r in page.items] == [5]
+    assert page.next_cursor is None
+    assert decode_id_cursor(page.prev_cursor) == 5
+
+
+def test_before_cursor_reverses_rows():
+    # rows for `before` come back in descending order
+    rows = [make_row(i) for i in (9, 8, 7)]
+    page = build_cursor_page(rows, size=2, after=None, before=encode_cursor(10))
+    assert [r.id for r in page.items] == [8, 9]
+    assert decode_id_cursor(page.next_cursor) == 9
+    assert decode_id_cursor(page.prev_cursor) == 8
+
+
+def test_from_end_without_cursor_returns_last_page():
+    # the newest rows come first when reading from the end
+    rows = [make_row(i) for i in (9, 8, 7)]
+    page = build_cursor_page(rows, size=2, after=None, before=None, from_end=True)
+    assert [r.id for r in page.items] == [8, 9]
+    assert decode_id_cursor(page.next_cursor) == 9
+    assert decode_id_cursor(page.prev_cursor) == 8
+
+
+def test_from_end_after_cursor_keeps_position_when_empty():
+    cursor = encode_cursor(9)
+    page = build_cursor_page([], size=2, after=cursor, before=None, from_end=True)
+    assert page.items == []
+    assert page.next_cursor == cursor
@@ -0,0 +1,80 @@
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+
+from app.repositories.partition_repository import (
+    PartitionRepository,
+    add_months,
+    partition_name,
+)
+from app.tasks.partitions import maintain_message_partitions
+
+
+def test_add_months_crosses_year_boundaries():
+    assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert add_months(date(2026, 5, 1), 0) == date(2026, 5, 1)
+
+
+def test_partition_name():
+    assert partition_name(date(2026, 3, 1)) == "messages_p2026_03"
+
+
+def test_detach_rejects_other_tables():
+    repo = PartitionRepository(db=None)
+
+    with pytest.raises(ValueError):
+        repo.detach("users")
+
+
+@pytest.fixture
+def repo():
+    with (
+        patch("app.tasks.partitions.SessionLocal") as session_local,
+        patch("app.tasks.partitions.PartitionRepository") as repo_class,
+        patch("app.tasks.partitions.MessageService") as service_class,
+    ):
+        session_local.return_value.execute.return_value.scalar.return_value = True
+        repo = repo_class.return_value
+        # Detaching goes through the service, which fixes counters and chats
+        repo.detach = service_class.return_value.detach_partition
+        yield repo
+
+
+def test_maintenance_creates_upcoming_months(repo):
+    repo.create_missing.return_value = []
+
+    with patch("app.tasks.partitions.settings") as settings:
+        settings.PARTITION_MONTHS_AHEAD = 3
+        settings.PARTITION_RETENTION_MONTHS = 0
+        maintain_message_partitions(today=date(2026, 11, 17))
+
+    repo.create_missing.assert_called_once_with(date(2026, 11, 1), date(2027, 2, 1))
+    repo.detach.assert_not_called()
+
+
+def test_maintenance_detaches_months_past_retention(repo):
+    repo.create_missing.return_value = []
+    repo.list_months.return_value = {
+        date(2026, 7, 1): "messages_p2026_07",
+        date(2026, 8, 1): "messages_p2026_08",
+        date(2026, 9, 1): "messages_p2026_09",
+        date(2026, 10, 1): "messages_p2026_10",
+    }
+
+    with patch("app.tasks.partitions.settings") as settings:
+        settings.PARTITION_MONTHS_AHEAD = 3
+        settings.PARTITION_RETENTION_MONTHS = 2
+        maintain_message_partitions(today=date(2026, 10, 17))
+
+    detached = [call.args[0] for call in repo.detach.call_args_list]
+    assert detached == ["messages_p2026_07"]
+
+
+def test_maintenance_skips_when_another_worker_holds_the_lock(repo):
+    with patch("app.tasks.partitions.SessionLocal") as session_local:
+        session_local.return_value.execute.return_value.scalar.return_value = False
+        maintain_message_partitions(today=date(2026, 10, 17))
+
+    repo.create_missing.assert_not_called()
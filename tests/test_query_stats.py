@@ -0,0 +1,68 @@
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app import query_stats
+
+
+def make_client(**options):
+    query_stats.time_statements()
+    engine = create_engine("sqlite://")
+    app = FastAPI()
+    app.add_middleware(query_stats.QueryStatsMiddleware, **options)
+
+    # Sync handlers run in the threadpool: the request must follow them there
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int, repeat: int = 1):
+        with engine.connect() as conn:
+            for _ in range(repeat):
+                conn.execute(text("SELECT :id"), {"id": item_id})
+        return {"id": item_id}
+
+    return TestClient(app), engine
+
+
+def test_server_timing_counts_the_request_statements():
+    client, engine = make_client()
+
+    response = client.get("/items/1", params={"repeat": 3})
+
+    timing = response.headers["server-timing"]
+    assert timing.startswith('db;desc="3 statements";dur=')
+    # Outside a request nothing is counted, and nothing breaks
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert (
+        client.get("/items/1")
+        .headers["server-timing"]
+        .startswith('db;desc="1 statement";')
+    )
+
+
+def test_slow_statements_are_logged_with_their_route(caplog):
+    # Every statement is slower than a nanosecond
+    client, _ = make_client(slow_query_ms=1e-6)
+
+    with caplog.at_level(logging.WARNING, logger="app.query_stats"):
+        client.get("/items/7")
+
+    assert len(caplog.records) == 1
+    message = caplog.records[0].getMessage()
+    assert message.startswith("Slow query: ")
+    assert message.endswith(" ms on GET /items/{item_id}: SELECT ?")
+
+
+def test_repeated_statement_is_flagged_once_as_likely_n_plus_one(caplog):
+    client, _ = make_client(repeat_threshold=5)
+
+    with caplog.at_level(logging.WARNING, logger="app.query_stats"):
+        client.get("/items/1", params={"repeat": 4})
+        assert caplog.records == []
+        client.get("/items/1", params={"repeat": 6})
+
+    assert [record.getMessage() for record in caplog.records] == [
+        "Likely N+1: statement run 6 times (6 in total) on GET /items/{item_id}: "
+        "SELECT ?"
+    ]
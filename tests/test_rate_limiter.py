@@ -0,0 +1,112 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.config import settings
+from app.exceptions import TooManyRequestsError
+from app.services.rate_limiter import RateLimiter, limit_login, note_failed_login
+
+
+class FakeClock:
+    def __init__(self, now: float = 6000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_allows_up_to_the_limit_then_rejects_with_retry_after():
+    clock = FakeClock()
+    limiter = RateLimiter(window=60, clock=clock)
+
+    for _ in range(3):
+        limiter.check("login:ip:1.2.3.4", limit=3)
+    with pytest.raises(TooManyRequestsError) as exc_info:
+        limiter.check("login:ip:1.2.3.4", limit=3)
+
+    # The rejected hit counts too: 4 * (1 - t/60) + 1 <= 3 only from 30
+    # seconds into the next window
+    assert exc_info.value.retry_after == 90
+    # Other keys have their own counters
+    limiter.check("login:ip:5.6.7.8", limit=3)
+
+
+def test_previous_window_weighs_less_as_time_passes():
+    clock = FakeClock()
+    limiter = RateLimiter(window=60, clock=clock)
+    for _ in range(4):
+        limiter.check("send:a", limit=4)
+
+    # A quarter into the next window 3 of the 4 old hits still count
+    clock.now = 6075
+    limiter.check("send:a", limit=4)
+    with pytest.raises(TooManyRequestsError) as exc_info:
+        limiter.check("send:a", limit=4)
+    # 4 * (1 - t/60) + 2 <= 3 from t = 45, 30 seconds from now
+    assert exc_info.value.retry_after == 30
+
+    clock.now = 6110
+    limiter.check("send:a", limit=4)
+
+
+def test_failed_logins_lock_a_username_only_while_they_continue():
+    clock = FakeClock()
+    limiter = RateLimiter(window=60, clock=clock)
+
+    async def attempt(ip, password_ok):
+        await limit_login(ip, "victim")
+        if not password_ok:
+            await note_failed_login("victim")
+
+    with (
+        patch("app.services.rate_limiter.rate_limiter", limiter),
+        patch.object(settings, "LOGIN_RATE_LIMIT_PER_USERNAME", 3),
+    ):
+        # Wrong passwords from many addresses
+        for i in range(3):
+            asyncio.run(attempt(f"10.0.0.{i}", password_ok=False))
+        # The attacker keeps trying, and so does the owner: neither counts
+        for i in range(20):
+            with pytest.raises(TooManyRequestsError):
+                asyncio.run(attempt(f"10.0.1.{i}", password_ok=False))
+        with pytest.raises(TooManyRequestsError) as exc_info:
+            asyncio.run(attempt("192.0.2.1", password_ok=True))
+
+        # Once the attacker stops, the owner gets in when the window has slid by
+        clock.now += exc_info.value.retry_after
+        asyncio.run(attempt("192.0.2.1", password_ok=True))
+
+
+def test_idle_keys_are_forgotten():
+    clock = FakeClock()
+    limiter = RateLimiter(window=60, clock=clock)
+    limiter.check("send:a", limit=1)
+
+    clock.now = 6130
+    limiter.check("send:b", limit=1)
+
+    assert list(limiter._counters) == ["send:b"]
+
+
+def test_zero_limit_disables_the_check():
+    limiter = RateLimiter(window=60, clock=FakeClock())
+    for _ in range(100):
+        limiter.check("send:a", limit=0)
+
+
+def test_shared_mode_counts_in_the_database():
+    limiter = RateLimiter(window=60, shared=True, clock=FakeClock(6030))
+    repo = MagicMock()
+    repo.hit.return_value = (2, 4)
+
+    with (
+        patch("app.services.rate_limiter.SessionLocal"),
+        patch("app.services.rate_limiter.RateLimitRepository", return_value=repo),
+    ):
+        # 4 * 0.5 + 2 hits are within a limit of 4, but not of 3
+        limiter.check("send:a", limit=4)
+        with pytest.raises(TooManyRequestsError):
+            limiter.check("send:a", limit=3)
+
+    repo.hit.assert_called_with("send:a", 6000, 60)
@@ -0,0 +1,231 @@
+import asyncio
+import uuid
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.dependencies import get_websocket_user
+from app.main import app
+from app.realtime import events, waiter
+from app.realtime.events import EventPublisher, encode, publish
+from app.realtime.hub import Hub, hub
+from app.schemas import UserResponse
+
+
+def make_user_response():
+    return UserResponse(
+        id=uuid.uuid4(),
+        username="dima",
+        is_active=True,
+        created_at=datetime.now(),
+        updated_at=datetime.now(),
+    )
+
+
+def make_event(*user_ids, data=None):
+    return {
+        "type": "message.created",
+        "user_ids": [str(u) for u in user_ids],
+        "data": data or {},
+    }
+
+
+def make_session():
+    session = MagicMock()
+    session.info = {}
+    return session
+
+
+# --- hub ---
+
+
+def test_hub_dispatches_only_to_addressed_users():
+    test_hub = Hub()
+    user_a, user_b = uuid.uuid4(), uuid.uuid4()
+    sub_a = test_hub.subscribe(user_a, max_queue=10)
+    sub_b = test_hub.subscribe(user_b, max_queue=10)
+
+    test_hub.dispatch(make_event(user_a))
+
+    assert sub_a.queue.qsize() == 1
+    assert sub_b.queue.empty()
+
+
+def test_hub_overflow_marks_subscription_and_wakes_it():
+    test_hub = Hub()
+    user_id = uuid.uuid4()
+    sub = test_hub.subscribe(user_id, max_queue=2)
+
+    for _ in range(3):
+        test_hub.dispatch(make_event(user_id))
+
+    assert sub.overflowed
+    assert sub.queue.get_nowait() is not None
+    assert sub.queue.get_nowait() is None
+
+
+def test_hub_unsubscribe():
+    test_hub = Hub()
+    sub = test_hub.subscribe(uuid.uuid4(), max_queue=10)
+
+    test_hub.unsubscribe(sub)
+
+    assert test_hub.connection_count() == 0
+
+
+# --- events ---
+
+
+def test_publish_dedupes_user_ids():
+    session = make_session()
+    user_id = uuid.uuid4()
+
+    publish(session, "message.created", [user_id, user_id], {})
+
+    assert session.info[events.PENDING_KEY][0]["user_ids"] == [str(user_id)]
+
+
+def test_messages_read_sends_one_event_per_sender():
+    session = make_session()
+    reader, sender_a, sender_b = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+    EventPublisher(session).messages_read(
+        reader, [(3, sender_a), (1, sender_b), (2, sender_a)]
+    )
+
+    pending = session.info[events.PENDING_KEY]
+    assert len(pending) == 2
+    by_sender = {e["data"]["sender_id"]: e for e in pending}
+    assert by_sender[str(sender_a)]["data"]["ids"] == [2, 3]
+    assert set(by_sender[str(sender_b)]["user_ids"]) == {str(reader), str(sender_b)}
+
+
+def test_encode_oversized_payload_asks_for_resync():
+    event = make_event(uuid.uuid4(), data={"text": "x" * 10000})
+
+    encoded = encode(event)
+
+    assert len(encoded) < events.MAX_NOTIFY_PAYLOAD
+    assert '"resync":true' in encoded
+
+
+def test_after_commit_dispatches_pending_events(monkeypatch):
+    dispatched = []
+    monkeypatch.setattr(events.hub, "dispatch_threadsafe", dispatched.append)
+    session = make_session()
+    publish(session, "message.created", [uuid.uuid4()], {"id": 1})
+
+    events._dispatch_after_commit(session)
+
+    assert [e["data"] for e in dispatched] == [{"id": 1}]
+    assert events.PENDING_KEY not in session.info
+
+
+def test_rollback_discards_pending_events(monkeypatch):
+    dispatched = []
+    monkeypatch.setattr(events.hub, "dispatch_threadsafe", dispatched.append)
+    session = make_session()
+    publish(session, "message.created", [uuid.uuid4()], {"id": 1})
+
+    events._discard_after_rollback(session)
+    events._dispatch_after_commit(session)
+
+    assert dispatched == []
+
+
+# --- long poll ---
+
+
+def run_wait(monkeypatch, fetched, after_wait=None, timeout=1.0):
+    """Run wait_for_inbox with the DB fetch stubbed out by successive results."""
+    results = iter(fetched)
+    calls = []
+
+    def fetch(receiver_id, after_id, size):
+        calls.append(after_id)
+        return next(results)
+
+    monkeypatch.setattr(waiter, "_fetch_inbox_after", fetch)
+    user_id = uuid.uuid4()
+
+    async def scenario():
+        hub.attach(asyncio.get_running_loop())
+        if after_wait is not None:
+            asyncio.get_running_loop().call_later(
+                0.01, hub.dispatch, after_wait(user_id)
+            )
+        return await waiter.wait_for_inbox(user_id, 5, 20, timeout)
+
+    return asyncio.run(scenario()), calls
+
+
+def test_wait_returns_at_once_when_messages_exist(monkeypatch):
+    result, calls = run_wait(monkeypatch, [["m6"]])
+
+    assert result == ["m6"]
+    assert calls == [5]
+    assert hub.connection_count() == 0
+
+
+def test_wait_refetches_after_new_message_event(monkeypatch):
+    def new_message(user_id):
+        return make_event(user_id, data={"receiver_id": str(user_id)})
+
+    result, calls = run_wait(monkeypatch, [[], ["m6"]], after_wait=new_message)
+
+    assert result == ["m6"]
+    assert calls == [5, 5]
+
+
+def test_wait_ignores_own_outgoing_messages(monkeypatch):
+    def own_message(user_id):
+        return make_event(user_id, data={"receiver_id": str(uuid.uuid4())})
+
+    result, calls = run_wait(monkeypatch, [[]], after_wait=own_message, timeout=0.05)
+
+    assert result == []
+    assert calls == [5]
+
+
+def test_wait_times_out_without_second_query(monkeypatch):
+    result, calls = run_wait(monkeypatch, [[]], timeout=0.01)
+
+    assert result == []
+    assert calls == [5]
+    assert hub.connection_count() == 0
+
+
+# --- /ws ---
+
+
+@pytest.fixture
+def ws_client():
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_ws_delivers_events_for_current_user(ws_client):
+    user = make_user_response()
+    app.dependency_overrides[get_websocket_user] = lambda: user
+
+    with ws_client, ws_client.websocket_connect("/ws") as websocket:
+        # The subscription is registered right after accept — wait for it
+        ws_client.portal.call(asyncio.sleep, 0.05)
+        hub.dispatch_threadsafe(make_event(user.id, data={"id": 7}))
+
+        event = websocket.receive_json()
+
+    assert event == {"type": "message.created", "data": {"id": 7}}
+
+
+def test_ws_rejects_unauthenticated(ws_client):
+    app.dependency_overrides[get_websocket_user] = lambda: None
+
+    with pytest.raises(WebSocketDisconnect) as exc_info:
+        with ws_client, ws_client.websocket_connect("/ws") as websocket:
+            websocket.receive_json()
+
+    assert exc_info.value.code == 1008
@@ -0,0 +1,52 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.tasks.reconcile_stats import RECONCILE_JOB_NAME, reconcile_message_stats
+
+
+@pytest.fixture
+def repos():
+    with (
+        patch("app.tasks.reconcile_stats.SessionLocal") as session_local,
+        patch("app.tasks.reconcile_stats.StatsRepository") as stats_class,
+        patch("app.tasks.reconcile_stats.JobRunRepository") as runs_class,
+        patch("app.tasks.reconcile_stats.settings") as settings,
+    ):
+        session_local.return_value.execute.return_value.scalar.return_value = True
+        settings.STATS_RECONCILE_INTERVAL_SECONDS = 3600
+        settings.STATS_RECONCILE_BATCH_SIZE = 2
+        yield stats_class.return_value, runs_class.return_value
+
+
+def test_run_claims_once_then_reconciles_every_batch(repos):
+    stats, runs = repos
+    runs.claim.return_value = True
+    stats.reconcile_batch.side_effect = [(1, "b"), (0, "d"), (0, None)]
+
+    reconcile_message_stats()
+
+    runs.claim.assert_called_once_with(RECONCILE_JOB_NAME, 3600 * 0.9)
+    after_ids = [c.args[0] for c in stats.reconcile_batch.call_args_list]
+    assert after_ids == [None, "b", "d"]
+    runs.finish.assert_called_once_with(RECONCILE_JOB_NAME)
+
+
+def test_run_skips_when_another_worker_ran_within_the_interval(repos):
+    stats, runs = repos
+    runs.claim.return_value = False
+
+    reconcile_message_stats()
+
+    stats.reconcile_batch.assert_not_called()
+    runs.finish.assert_not_called()
+
+
+def test_forced_run_ignores_the_interval(repos):
+    stats, runs = repos
+    runs.claim.return_value = True
+    stats.reconcile_batch.return_value = (0, None)
+
+    reconcile_message_stats(force=True)
+
+    runs.claim.assert_called_once_with(RECONCILE_JOB_NAME, 0)
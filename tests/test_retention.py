@@ -0,0 +1,51 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.tasks.retention import retire_old_messages
+
+
+@pytest.fixture
+def service():
+    with (
+        patch("app.tasks.retention.SessionLocal") as session_local,
+        patch("app.tasks.retention.MessageService") as service_class,
+        patch("app.tasks.retention.time.sleep"),
+        patch("app.tasks.retention.settings") as settings,
+    ):
+        session_local.return_value.execute.return_value.scalar.return_value = True
+        settings.MESSAGE_RETENTION_DAYS = 365
+        settings.MESSAGE_RETENTION_POLICY = "archive"
+        settings.MESSAGE_RETENTION_BATCH_SIZE = 2
+        settings.MESSAGE_RETENTION_BATCH_PAUSE_MS = 0
+        yield service_class.return_value, settings
+
+
+def test_batches_continue_from_the_last_id_until_one_is_short(service):
+    service, _ = service
+    service.retire_read_messages.side_effect = [(2, 10), (2, 14), (1, 15)]
+
+    retire_old_messages()
+
+    after_ids = [c.args[1] for c in service.retire_read_messages.call_args_list]
+    assert after_ids == [0, 10, 14]
+    assert all(c.args[3] is True for c in service.retire_read_messages.call_args_list)
+
+
+def test_delete_policy_does_not_archive(service):
+    service, settings = service
+    settings.MESSAGE_RETENTION_POLICY = "delete"
+    service.retire_read_messages.return_value = (0, 0)
+
+    retire_old_messages()
+
+    assert service.retire_read_messages.call_args.args[3] is False
+
+
+def test_disabled_retention_touches_nothing(service):
+    service, settings = service
+    settings.MESSAGE_RETENTION_DAYS = 0
+
+    retire_old_messages()
+
+    service.retire_read_messages.assert_not_called()
@@ -1,10 +1,31 @@
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
+from app.config import settings
 from app.main import app
-from app.dependencies import get_user_service, get_message_service, get_current_user
-from app.schemas import AuthResponse, UserResponse, MessageResponse
+from app.routers import messages_async, users_async
+from app.dependencies import (
+    get_async_message_service,
+    get_async_user_service,
+    get_current_user_async,
+    get_user_service,
+    get_message_service,
+    get_conversation_service,
+    get_current_user,
+    get_current_user_detached,
+)
+from app.exceptions import UnauthorizedError
+from app.schemas import (
+    AuthResponse,
+    CursorPage,
+    MessageBatchResponse,
+    MessageSearchHit,
+    UserResponse,
+    UserSuggestion,
+    MessageResponse,
+)
 import uuid
 from datetime import datetime
 
@@ -52,6 +73,11 @@ def mock_message_service():
     return MagicMock()
 
 
+@pytest.fixture
+def mock_conversation_service():
+    return MagicMock()
+
+
 @pytest.fixture
 def client(mock_user_service, mock_message_service):
     app.dependency_overrides[get_user_service] = lambda: mock_user_service
@@ -61,11 +87,15 @@ def client(mock_user_service, mock_message_service):
 
 
 @pytest.fixture
-def auth_client(mock_user_service, mock_message_service):
+def auth_client(mock_user_service, mock_message_service, mock_conversation_service):
     current_user = make_user_response()
     app.dependency_overrides[get_user_service] = lambda: mock_user_service
     app.dependency_overrides[get_message_service] = lambda: mock_message_service
+    app.dependency_overrides[get_conversation_service] = lambda: (
+        mock_conversation_service
+    )
     app.dependency_overrides[get_current_user] = lambda: current_user
+    app.dependency_overrides[get_current_user_detached] = lambda: current_user
     yield TestClient(app), current_user
     app.dependency_overrides.clear()
 
@@ -74,7 +104,7 @@ def auth_client(mock_user_service, mock_message_service):
 
 
 def test_register_returns_201(client, mock_user_service):
-    mock_user_service.register.return_value = make_auth_response()
+    mock_user_service.register = AsyncMock(return_value=make_auth_response())
 
     response = client.post(
         "/users/register", json={"username": "dima", "password": "Password1"}
@@ -87,7 +117,9 @@ def test_register_returns_201(client, mock_user_service):
 def test_register_username_taken_returns_400(client, mock_user_service):
     from app.exceptions import ConflictError
 
-    mock_user_service.register.side_effect = ConflictError("Username already exists")
+    mock_user_service.register = AsyncMock(
+        side_effect=ConflictError("Username already exists")
+    )
 
     response = client.post(
         "/users/register", json={"username": "dima", "password": "Password1"}
@@ -100,7 +132,7 @@ def test_register_username_taken_returns_400(client, mock_user_service):
 
 
 def test_login_returns_200(client, mock_user_service):
-    mock_user_service.login.return_value = make_auth_response()
+    mock_user_service.login = AsyncMock(return_value=make_auth_response())
 
     response = client.post(
         "/users/login", json={"username": "dima", "password": "Password1"}
@@ -110,6 +142,25 @@ def test_login_returns_200(client, mock_user_service):
     assert "access_token" in response.json()
 
 
+def test_login_over_rate_limit_returns_429(client, mock_user_service, monkeypatch):
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_PER_USERNAME", 2)
+    body = {"username": f"limited-{uuid.uuid4().hex[:8]}", "password": "Password1"}
+
+    # Successful logins don't count against the username
+    mock_user_service.login = AsyncMock(return_value=make_auth_response())
+    for _ in range(3):
+        assert client.post("/users/login", json=body).status_code == 200
+
+    mock_user_service.login = AsyncMock(side_effect=UnauthorizedError("Invalid"))
+    for _ in range(2):
+        assert client.post("/users/login", json=body).status_code == 401
+    response = client.post("/users/login", json=body)
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert mock_user_service.login.await_count == 2
+
+
 # --- get_me ---
 
 
@@ -146,6 +197,67 @@ def test_create_message_returns_201(auth_client, mock_message_service):
     assert response.status_code == 201
 
 
+def test_create_message_over_rate_limit_returns_429(
+    auth_client, mock_message_service, monkeypatch
+):
+    client, _ = auth_client
+    monkeypatch.setattr(settings, "MESSAGE_RATE_LIMIT_PER_SENDER", 1)
+    mock_message_service.create.return_value = make_message_response()
+    body = {"text": "hello", "receiver_id": str(uuid.uuid4())}
+
+    assert client.post("/messages/", json=body).status_code == 201
+    response = client.post("/messages/", json=body)
+
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+    mock_message_service.create.assert_called_once()
+
+
+# --- conversations ---
+
+
+def test_autocomplete_returns_suggestions(auth_client, mock_user_service):
+    client, _ = auth_client
+    user_id = uuid.uuid4()
+    mock_user_service.autocomplete.return_value = [
+        UserSuggestion(id=user_id, username="dima")
+    ]
+
+    response = client.get("/users/autocomplete", params={"prefix": "di", "limit": 5})
+
+    assert response.status_code == 200
+    assert response.json() == [{"id": str(user_id), "username": "dima"}]
+    mock_user_service.autocomplete.assert_called_once_with("di", 5)
+
+
+def test_list_conversations_returns_200(auth_client, mock_conversation_service):
+    client, current_user = auth_client
+    mock_conversation_service.list.return_value = CursorPage(items=[], size=20)
+
+    response = client.get("/conversations/", params={"size": 20})
+
+    assert response.status_code == 200
+    mock_conversation_service.list.assert_called_once_with(
+        current_user.id, None, None, 20
+    )
+
+
+def test_create_message_batch_returns_201(auth_client, mock_message_service):
+    client, _ = auth_client
+    rejected_id = uuid.uuid4()
+    mock_message_service.create_batch.return_value = MessageBatchResponse(
+        items=[make_message_response()], rejected=[rejected_id]
+    )
+
+    response = client.post(
+        "/messages/batch",
+        json={"text": "hello", "receiver_ids": [str(uuid.uuid4()), str(rejected_id)]},
+    )
+
+    assert response.status_code == 201
+    assert response.json()["rejected"] == [str(rejected_id)]
+
+
 # --- health ---
 
 
@@ -165,3 +277,209 @@ def test_health_returns_200(client):
     fastapi_app.dependency_overrides.pop(get_db, None)
 
     assert response.status_code == 200
+
+
+def test_bulk_read_returns_updated_count(auth_client, mock_message_service):
+    client, _ = auth_client
+    mock_message_service.read_many.return_value = 5
+
+    response = client.post("/messages/read", json={"up_to_id": 42})
+
+    assert response.status_code == 200
+    assert response.json() == {"updated": 5}
+
+
+def test_unread_count_returns_200(auth_client, mock_message_service):
+    client, current_user = auth_client
+    mock_message_service.get_unread_count.return_value = 3
+
+    response = client.get("/messages/unread-count")
+
+    assert response.status_code == 200
+    assert response.json() == {"unread": 3}
+    mock_message_service.get_unread_count.assert_called_once_with(current_user.id)
+
+
+def test_health_pool_reports_sync_pool(client):
+    response = client.get("/health/pool")
+
+    assert response.status_code == 200
+    assert {"size", "checked_out", "overflow", "timeouts"} <= set(
+        response.json()["sync"]
+    )
+
+
+# --- cursor pagination ---
+
+
+def test_inbox_with_cursor_uses_cursor_mode(auth_client, mock_message_service):
+    client, current_user = auth_client
+    mock_message_service.get_inbox_cursor.return_value = CursorPage(
+        items=[make_message_response()], size=20, next_cursor=None, prev_cursor="WzFd"
+    )
+
+    response = client.get("/messages/inbox", params={"after": "WzBd"})
+
+    assert response.status_code == 200
+    assert "total" not in response.json()
+    mock_message_service.get_inbox.assert_not_called()
+
+
+def test_inbox_with_archive_uses_cursor_mode(auth_client, mock_message_service):
+    client, current_user = auth_client
+    mock_message_service.get_inbox_cursor.return_value = CursorPage(
+        items=[], size=20, next_cursor=None, prev_cursor=None
+    )
+
+    response = client.get("/messages/inbox", params={"include_archived": "true"})
+
+    assert response.status_code == 200
+    mock_message_service.get_inbox_cursor.assert_called_once_with(
+        current_user.id, None, None, None, 20, True
+    )
+    mock_message_service.get_inbox.assert_not_called()
+
+
+def test_search_returns_ranked_hits(auth_client, mock_message_service):
+    client, current_user = auth_client
+    hit = MessageSearchHit(**make_message_response().model_dump(), rank=0.5)
+    mock_message_service.search.return_value = CursorPage(
+        items=[hit], size=20, next_cursor=None, prev_cursor=None
+    )
+
+    response = client.get("/messages/search", params={"q": "lunch"})
+
+    assert response.status_code == 200
+    assert response.json()["items"][0]["rank"] == 0.5
+    mock_message_service.search.assert_called_once_with(
+        current_user.id, "lunch", None, None, 20
+    )
+
+
+def test_search_without_query_returns_422(auth_client):
+    client, _ = auth_client
+
+    response = client.get("/messages/search", params={"q": ""})
+
+    assert response.status_code == 422
+
+
+def test_create_message_queue_full_returns_503(auth_client, mock_message_service):
+    from app.exceptions import ServiceUnavailableError
+
+    client, _ = auth_client
+    mock_message_service.create.side_effect = ServiceUnavailableError("Queue full")
+
+    response = client.post(
+        "/messages/", json={"text": "hello", "receiver_id": str(uuid.uuid4())}
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_inbox_wait_returns_new_messages(auth_client, monkeypatch):
+    client, current_user = auth_client
+    wait = AsyncMock(return_value=[make_message_response()])
+    monkeypatch.setattr("app.routers.messages.wait_for_inbox", wait)
+
+    response = client.get("/messages/inbox/wait", params={"after_id": 5, "timeout": 1})
+
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    wait.assert_awaited_once_with(current_user.id, 5, 20, 1)
+
+
+def test_inbox_wait_requires_after_id(auth_client):
+    client, _ = auth_client
+
+    response = client.get("/messages/inbox/wait")
+
+    assert response.status_code == 422
+
+
+def test_thread_returns_200(auth_client, mock_message_service):
+    client, current_user = auth_client
+    peer_id = uuid.uuid4()
+    mock_message_service.get_thread.return_value = CursorPage(
+        items=[make_message_response()], size=20
+    )
+
+    response = client.get(f"/messages/with/{peer_id}")
+
+    assert response.status_code == 200
+    mock_message_service.get_thread.assert_called_once_with(
+        current_user.id, peer_id, None, None, 20, False
+    )
+
+
+def test_outbox_with_both_cursors_returns_400(auth_client):
+    client, _ = auth_client
+    response = client.get("/messages/outbox", params={"after": "a", "before": "b"})
+    assert response.status_code == 400
+
+
+# --- async routers (ASYNC_DB) ---
+
+
+@pytest.fixture
+def async_client():
+    # Mounted on a separate app — the main app picks one stack at import time
+    async_app = FastAPI()
+    async_app.include_router(users_async.router)
+    async_app.include_router(messages_async.router)
+    async_app.exception_handlers.update(app.exception_handlers)
+    user_service, message_service = AsyncMock(), AsyncMock()
+    current_user = make_user_response()
+    async_app.dependency_overrides[get_async_user_service] = lambda: user_service
+    async_app.dependency_overrides[get_async_message_service] = lambda: message_service
+    async_app.dependency_overrides[get_current_user_async] = lambda: current_user
+    return TestClient(async_app), user_service, message_service, current_user
+
+
+def test_async_register_returns_201(async_client):
+    client, user_service, _, _ = async_client
+    user_service.register.return_value = make_auth_response()
+
+    response = client.post(
+        "/users/register", json={"username": "dima", "password": "Password1"}
+    )
+
+    assert response.status_code == 201
+    user_service.register.assert_awaited_once()
+
+
+def test_async_inbox_with_cursor_uses_cursor_mode(async_client):
+    client, _, message_service, current_user = async_client
+    message_service.get_inbox_cursor.return_value = CursorPage(
+        items=[make_message_response()], size=20
+    )
+
+    response = client.get("/messages/inbox", params={"after": "WzBd"})
+
+    assert response.status_code == 200
+    message_service.get_inbox_cursor.assert_awaited_once_with(
+        current_user.id, None, "WzBd", None, 20, False
+    )
+    message_service.get_inbox.assert_not_awaited()
+
+
+def test_async_delete_forbidden_returns_403(async_client):
+    from app.exceptions import ForbiddenError
+
+    client, _, message_service, _ = async_client
+    message_service.delete.side_effect = ForbiddenError("Only the sender")
+
+    response = client.delete("/messages/1")
+
+    assert response.status_code == 403
+
+
+def test_async_messages_without_token_returns_401():
+    async_app = FastAPI()
+    async_app.include_router(messages_async.router)
+    async_app.dependency_overrides[get_async_message_service] = AsyncMock
+
+    response = TestClient(async_app).get("/messages/inbox")
+
+    assert response.status_code == 401
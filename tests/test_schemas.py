@@ -1,6 +1,6 @@
 import pytest
 from pydantic import ValidationError
-from app.schemas import UserCreate, UserUpdate, MessageCreate
+from app.schemas import UserCreate, UserUpdate, MessageCreate, MessageBulkRead
 import uuid
 
 
@@ -69,3 +69,28 @@ def test_message_valid():
 def test_message_too_long():
     with pytest.raises(ValidationError):
         MessageCreate(text="x" * 4097, receiver_id=uuid.uuid4())
+
+
+# --- MessageBulkRead ---
+
+
+def test_bulk_read_ids():
+    data = MessageBulkRead(ids=[1, 2, 3])
+    assert data.ids == [1, 2, 3]
+
+
+def test_bulk_read_watermark_with_sender():
+    sender_id = uuid.uuid4()
+    data = MessageBulkRead(up_to_id=10, sender_id=sender_id)
+    assert data.up_to_id == 10
+    assert data.sender_id == sender_id
+
+
+def test_bulk_read_requires_ids_or_watermark():
+    with pytest.raises(ValidationError):
+        MessageBulkRead()
+
+
+def test_bulk_read_rejects_both():
+    with pytest.raises(ValidationError):
+        MessageBulkRead(ids=[1], up_to_id=10)
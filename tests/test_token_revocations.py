@@ -0,0 +1,113 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+from app.dependencies import _known_user
+from app.services.token_revocations import REFRESH_OVERLAP, TokenRevocations
+
+WINDOW = timedelta(hours=24)
+
+
+def refresh(revocations, rows, as_of=None):
+    with (
+        patch("app.services.token_revocations.SessionLocal"),
+        patch("app.services.token_revocations.UserRepository") as repo_class,
+    ):
+        repo_class.return_value.list_token_versions_since.return_value = (
+            rows,
+            as_of or datetime.now(timezone.utc),
+        )
+        revocations.refresh()
+    return repo_class.return_value.list_token_versions_since
+
+
+def test_nothing_is_trusted_before_first_refresh():
+    assert TokenRevocations(WINDOW).is_current(uuid.uuid4(), 0) is False
+
+
+def test_bumped_version_revokes_older_tokens():
+    revocations = TokenRevocations(WINDOW)
+    user_id = uuid.uuid4()
+    refresh(revocations, [(user_id, 2, datetime.now(timezone.utc))])
+
+    assert revocations.is_current(user_id, 1) is False
+    assert revocations.is_current(user_id, 2) is True
+    assert revocations.is_current(uuid.uuid4(), 0) is True
+
+
+def test_note_applies_before_the_next_refresh():
+    revocations = TokenRevocations(WINDOW)
+    refresh(revocations, [])
+    user_id = uuid.uuid4()
+
+    revocations.note(user_id, 1)
+
+    assert revocations.is_current(user_id, 0) is False
+
+
+def test_refresh_reads_from_just_before_the_previous_refresh():
+    revocations = TokenRevocations(WINDOW)
+    first = datetime.now(timezone.utc) - timedelta(minutes=10)
+    refresh(revocations, [], as_of=first)
+
+    # Nothing changed: the next refresh still starts from the previous one,
+    # not from the start of the token lifetime
+    second = first + timedelta(minutes=5)
+    refresh(revocations, [], as_of=second)
+    query = refresh(revocations, [])
+
+    assert query.call_args.args[0] == second - REFRESH_OVERLAP
+
+
+def test_bumps_older_than_token_lifetime_are_forgotten():
+    revocations = TokenRevocations(WINDOW)
+    user_id = uuid.uuid4()
+    revocations.note(user_id, 1)
+    revocations._versions[user_id] = (1, datetime.now(timezone.utc) - 2 * WINDOW)
+
+    refresh(revocations, [])
+
+    assert revocations.is_current(user_id, 0) is True
+
+
+# --- get_current_user with STATELESS_AUTH ---
+
+
+def make_claims(user_id, ver=0):
+    return {
+        "sub": str(user_id),
+        "ver": ver,
+        "username": "dima",
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "updated_at": "2026-01-01T00:00:00+00:00",
+    }
+
+
+@pytest.fixture
+def stateless():
+    revocations = TokenRevocations(WINDOW)
+    refresh(revocations, [])
+    with (
+        patch("app.dependencies.settings") as settings,
+        patch("app.dependencies.token_revocations", revocations),
+    ):
+        settings.STATELESS_AUTH = True
+        yield revocations
+
+
+def test_known_user_comes_from_token_claims(stateless):
+    user_id = uuid.uuid4()
+
+    user = _known_user(make_claims(user_id))
+
+    assert user.id == user_id
+    assert user.username == "dima"
+
+
+def test_known_user_with_revoked_version_needs_database(stateless):
+    user_id = uuid.uuid4()
+    stateless.note(user_id, 1)
+
+    assert _known_user(make_claims(user_id, ver=0)) is None
@@ -1,9 +1,17 @@
+import asyncio
+import threading
 import uuid
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
-from app.services.user_service import UserService
+from app.db import Base
+from app.models import User
+from app.repositories.user_repository import uuid_prefix_range
+from app.services.user_service import AsyncUserService, UserService
 
 
 def make_service():
@@ -12,6 +20,12 @@ def make_service():
     return service
 
 
+def make_async_service():
+    service = AsyncUserService(db=MagicMock())
+    service.repo = AsyncMock()
+    return service
+
+
 def make_user_create(username="dima", password="Password1"):
     data = MagicMock()
     data.username = username
@@ -36,7 +50,7 @@ def test_register_username_taken():
     service.repo.exists_by_username.return_value = True
 
     with pytest.raises(Exception) as exc_info:
-        service.register(make_user_create())
+        asyncio.run(service.register(make_user_create()))
 
     assert "already exists" in str(exc_info.value)
 
@@ -46,7 +60,7 @@ def test_register_success():
     service.repo.exists_by_username.return_value = False
     service.repo.create.return_value = make_db_user()
 
-    result = service.register(make_user_create())
+    result = asyncio.run(service.register(make_user_create()))
 
     assert result.access_token is not None
     assert result.user is not None
@@ -61,7 +75,7 @@ def test_login_user_not_found():
     service.repo.get_by_username.return_value = None
 
     with pytest.raises(Exception) as exc_info:
-        service.login("dima", "Password1")
+        asyncio.run(service.login("dima", "Password1"))
 
     assert "Invalid username or password" in str(exc_info.value)
 
@@ -70,9 +84,11 @@ def test_login_wrong_password():
     service = make_service()
     service.repo.get_by_username.return_value = make_db_user()
 
-    with patch("app.services.user_service.verify_password", return_value=False):
+    with patch(
+        "app.utils.security.verify_and_update_password", return_value=(False, None)
+    ):
         with pytest.raises(Exception) as exc_info:
-            service.login("dima", "WrongPassword1")
+            asyncio.run(service.login("dima", "WrongPassword1"))
 
     assert "Invalid username or password" in str(exc_info.value)
 
@@ -81,11 +97,60 @@ def test_login_success():
     service = make_service()
     service.repo.get_by_username.return_value = make_db_user()
 
-    with patch("app.services.user_service.verify_password", return_value=True):
-        result = service.login("dima", "Password1")
+    with patch(
+        "app.utils.security.verify_and_update_password", return_value=(True, None)
+    ):
+        result = asyncio.run(service.login("dima", "Password1"))
 
     assert result.access_token is not None
     assert result.user is not None
+    service.repo.update_password_hash.assert_not_called()
+
+
+def test_login_rehashes_password_stored_at_another_cost():
+    service = make_service()
+    user = make_db_user()
+    service.repo.get_by_username.return_value = user
+
+    with patch(
+        "app.utils.security.verify_and_update_password",
+        return_value=(True, "rehashed"),
+    ):
+        asyncio.run(service.login("dima", "Password1"))
+
+    service.repo.update_password_hash.assert_called_once_with(user, "rehashed")
+
+
+def test_login_rehash_runs_no_query_on_the_event_loop():
+    # A real session: commit expires the user, and a lazy load of its
+    # attributes while building the response would block the event loop
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine, tables=[User.__table__])
+    query_threads = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda *args: query_threads.append(threading.current_thread()),
+    )
+    db = sessionmaker(bind=engine)()
+    db.add(User(username="dima", password_hash="old"))
+    db.commit()
+    db.expunge_all()
+    query_threads.clear()
+
+    with patch(
+        "app.utils.security.verify_and_update_password",
+        return_value=(True, "rehashed"),
+    ):
+        result = asyncio.run(UserService(db).login("dima", "Password1"))
+
+    assert result.user.username == "dima"
+    assert query_threads
+    assert threading.main_thread() not in query_threads
 
 
 # --- update_me ---
@@ -126,6 +191,31 @@ def test_update_me_success():
     assert result == updated_user
 
 
+def test_update_me_drops_cached_current_user():
+    service = make_service()
+    user = make_db_user()
+    service.repo.get_by_id.return_value = user
+    service.repo.exists_by_username.return_value = False
+
+    with patch("app.services.user_service.current_user_cache") as cache:
+        service.update_me(user.id, MagicMock(username="new_name"))
+
+    cache.invalidate.assert_called_once_with(user.id)
+
+
+def test_update_me_renames_in_username_index():
+    service = make_service()
+    service.usernames = MagicMock()
+    user = make_db_user(username="old_name")
+    service.repo.get_by_id.return_value = user
+    service.repo.exists_by_username.return_value = False
+    service.repo.update_username.return_value = make_db_user(username="new_name")
+
+    service.update_me(user.id, MagicMock(username="New_Name"))
+
+    service.usernames.rename.assert_called_once_with(user.id, "old_name", "new_name")
+
+
 # --- deactivate_me ---
 
 
@@ -149,13 +239,23 @@ def test_deactivate_me_success():
     service.repo.deactivate.assert_called_once_with(user)
 
 
+def test_deactivate_me_drops_cached_current_user():
+    service = make_service()
+    user = make_db_user()
+    service.repo.get_by_id.return_value = user
+
+    with patch("app.services.user_service.current_user_cache") as cache:
+        service.deactivate_me(user.id)
+
+    cache.invalidate.assert_called_once_with(user.id)
+
+
 # --- search ---
 
 
 def test_search_calls_repo_with_correct_offset():
     service = make_service()
-    service.repo.search.return_value = []
-    service.repo.count_search.return_value = 0
+    service.repo.search.return_value = ([], 0)
 
     service.search("dima", page=2, size=10)
 
@@ -165,8 +265,7 @@ def test_search_calls_repo_with_correct_offset():
 def test_search_returns_users():
     service = make_service()
     users = [make_db_user(), make_db_user()]
-    service.repo.search.return_value = users
-    service.repo.count_search.return_value = 2
+    service.repo.search.return_value = (users, 2)
 
     result = service.search("dima", page=1, size=20)
 
@@ -175,4 +274,121 @@ def test_search_returns_users():
     assert result.page == 1
     assert result.size == 20
     assert result.pages == 1
-    service.repo.count_search.assert_called_once_with("dima")
+    # The total comes with the page — no second query
+    service.repo.count_search.assert_not_called()
+
+
+def test_uuid_prefix_range_covers_ids_starting_with_query():
+    low, high = uuid_prefix_range("12DAC8BF-5d6d")
+
+    assert low == uuid.UUID("12dac8bf-5d6d-0000-0000-000000000000")
+    assert high == uuid.UUID("12dac8bf-5d6d-ffff-ffff-ffffffffffff")
+    assert uuid_prefix_range("12dac8bf5d6d") == (low, high)
+
+
+def test_uuid_prefix_range_rejects_usernames_and_short_prefixes():
+    assert uuid_prefix_range("dima") is None
+    assert uuid_prefix_range("12dac8b") is None
+    # Dashes must be where a UUID has them
+    assert uuid_prefix_range("12dac8b-f5d6d") is None
+
+
+# --- autocomplete ---
+
+
+def test_autocomplete_served_from_username_index():
+    service = make_service()
+    service.usernames = MagicMock()
+    user_id = uuid.uuid4()
+    service.usernames.complete.return_value = [(user_id, "dima")]
+
+    result = service.autocomplete("DI", limit=10)
+
+    assert [(s.id, s.username) for s in result] == [(user_id, "dima")]
+    service.usernames.complete.assert_called_once_with("di", 10)
+    service.repo.autocomplete.assert_not_called()
+
+
+def test_autocomplete_falls_back_to_database_until_index_loads():
+    service = make_service()
+    service.usernames = MagicMock()
+    service.usernames.complete.return_value = None
+    service.repo.autocomplete.return_value = [(uuid.uuid4(), "dima")]
+
+    result = service.autocomplete("di", limit=10)
+
+    assert [s.username for s in result] == ["dima"]
+    service.repo.autocomplete.assert_called_once_with("di", 10)
+
+
+# --- async service ---
+
+
+def test_async_register_username_taken():
+    service = make_async_service()
+    service.repo.exists_by_username.return_value = True
+
+    with pytest.raises(Exception) as exc_info:
+        asyncio.run(service.register(make_user_create()))
+
+    assert "already exists" in str(exc_info.value)
+    service.repo.create.assert_not_awaited()
+
+
+def test_async_register_hashes_off_the_event_loop():
+    service = make_async_service()
+    service.repo.exists_by_username.return_value = False
+    service.repo.create.return_value = make_db_user()
+    hashed_in = []
+
+    def fake_hash(password):
+        hashed_in.append(threading.current_thread())
+        return "hashed"
+
+    with patch("app.utils.security.hash_password", side_effect=fake_hash):
+        result = asyncio.run(service.register(make_user_create()))
+
+    assert result.access_token is not None
+    service.repo.create.assert_awaited_once_with(
+        username="dima", password_hash="hashed"
+    )
+    # asyncio.run drives the loop on the main thread
+    assert hashed_in[0] is not threading.main_thread()
+
+
+def test_async_login_wrong_password():
+    service = make_async_service()
+    service.repo.get_by_username.return_value = make_db_user()
+
+    with patch(
+        "app.utils.security.verify_and_update_password", return_value=(False, None)
+    ):
+        with pytest.raises(Exception) as exc_info:
+            asyncio.run(service.login("dima", "WrongPassword1"))
+
+    assert "Invalid username or password" in str(exc_info.value)
+    service.repo.update_password_hash.assert_not_called()
+
+
+def test_async_login_rehashes_password_stored_at_another_cost():
+    service = make_async_service()
+    user = make_db_user()
+    service.repo.get_by_username.return_value = user
+
+    with patch(
+        "app.utils.security.verify_and_update_password",
+        return_value=(True, "rehashed"),
+    ):
+        asyncio.run(service.login("dima", "Password1"))
+
+    service.repo.update_password_hash.assert_awaited_once_with(user, "rehashed")
+
+
+def test_async_search_calls_repo_with_correct_offset():
+    service = make_async_service()
+    service.repo.search.return_value = ([], 0)
+
+    result = asyncio.run(service.search("dima", page=2, size=10))
+
+    service.repo.search.assert_awaited_once_with("dima", offset=10, limit=10)
+    assert result.pages == 1
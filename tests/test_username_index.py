@@ -0,0 +1,73 @@
+import uuid
+from unittest.mock import patch
+
+from app.services.username_index import UsernameIndex
+
+
+def make_index(*usernames, max_users=100):
+    index = UsernameIndex(max_users)
+    rows = [(username, uuid.uuid4()) for username in usernames]
+    with (
+        patch("app.services.username_index.SessionLocal"),
+        patch("app.services.username_index.UserRepository") as repo_class,
+    ):
+        repo_class.return_value.list_active_usernames.return_value = rows
+        index.resync()
+    return index
+
+
+def usernames(matches):
+    return [username for _, username in matches]
+
+
+def test_complete_returns_prefix_matches_in_order():
+    index = make_index("dima", "anna", "dmitry", "dimas", "di")
+
+    assert usernames(index.complete("di", 10)) == ["di", "dima", "dimas"]
+    assert usernames(index.complete("dim", 1)) == ["dima"]
+    assert index.complete("x", 10) == []
+
+
+def test_complete_before_first_load_returns_none():
+    assert UsernameIndex(100).complete("di", 10) is None
+
+
+def test_add_rename_remove_keep_index_current():
+    index = make_index("anna")
+    user_id = uuid.uuid4()
+
+    index.add(user_id, "dima")
+    assert index.complete("dima", 10) == [(user_id, "dima")]
+
+    index.rename(user_id, "dima", "boris")
+    assert index.complete("dima", 10) == []
+    assert index.complete("bor", 10) == [(user_id, "boris")]
+
+    index.remove("boris")
+    assert index.complete("", 10)[0][1] == "anna"
+    assert len(index.complete("", 10)) == 1
+
+
+def test_resync_over_max_users_falls_back():
+    index = make_index("a", "b", "c", max_users=2)
+
+    assert index.complete("a", 10) is None
+
+
+def test_changes_during_resync_are_replayed():
+    index = make_index("anna")
+    user_id = uuid.uuid4()
+
+    def load(limit):
+        # Registered while the snapshot was being read, and not in it
+        index.add(user_id, "dima")
+        return [("anna", uuid.uuid4())]
+
+    with (
+        patch("app.services.username_index.SessionLocal"),
+        patch("app.services.username_index.UserRepository") as repo_class,
+    ):
+        repo_class.return_value.list_active_usernames.side_effect = load
+        index.resync()
+
+    assert index.complete("dima", 10) == [(user_id, "dima")]